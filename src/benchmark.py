@@ -0,0 +1,155 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+import argparse
+import inspect
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+# Use the mock game engine when running outside Blender
+try:
+    import bge
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock"))
+    import bge
+
+import config
+from body import Body
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etc", "benchmark.json")
+
+# Variants of each config which are timed. Each one is a dict of config overrides
+VARIANTS = {"": {}, "bank": {"muscle_bank": True}}
+
+
+def get_config_names():
+    """Return the names of all the configs defined in config.py"""
+
+    return sorted([name for name, cls in inspect.getmembers(config, inspect.isclass)
+                   if issubclass(cls, config.Config) and cls is not config.Config])
+
+
+def reference_tick(a_, b_):
+    """Fixed mix of the operations of a controller tick, Python arithmetics and small NumPy products, which does
+    not depend on the controller code. Its time measures the speed of the machine"""
+
+    x = 0.0
+    for i in range(200):
+        x += (i * 0.5 + x) * 1e-3
+    for i in range(20):
+        a_ = np.dot(b_, a_) * 0.5 + 1e-3
+        x += float(np.sum(np.sqrt(np.abs(a_))))
+
+    return x
+
+
+def time_body(config_name_, overrides_=None, n_ticks_=500, n_warmup_=20):
+    """Build a Body on a mock scene for a config and time Body.update() on n_ticks_ ticks, after n_warmup_ ticks.
+    The scene is stepped between the ticks but out of the timing. A reference tick is timed after each tick so that
+    both see the same load of the machine. Return a dict of per-tick statistics in microseconds and of the median
+    tick time relative to the reference one"""
+
+    conf = getattr(config, config_name_)()
+    conf.apply_overrides(overrides_ if overrides_ is not None else dict())
+    conf.logger = logging.getLogger(conf.logger_name)
+    scene = bge.make_scene(conf)
+    body = Body(scene, conf)
+
+    a = np.ones((16, 3))
+    b = np.eye(16) * 0.9
+    times = np.zeros(n_ticks_)
+    ref_times = np.zeros(n_ticks_)
+    for i in range(n_warmup_ + n_ticks_):
+        t_init = time.time()
+        body.update()
+        t_ref = time.time()
+        reference_tick(a, b)
+        if i >= n_warmup_:
+            times[i - n_warmup_] = t_ref - t_init
+            ref_times[i - n_warmup_] = time.time() - t_ref
+        scene.step()
+    times *= 1e6
+    ref_times *= 1e6
+
+    return {"mean_us": float(np.mean(times)), "median_us": float(np.median(times)),
+            "p95_us": float(np.percentile(times, 95)), "reference_us": float(np.median(ref_times)),
+            "relative": float(np.median(times) / np.median(ref_times)), "n_ticks": n_ticks_}
+
+
+def benchmark(config_names_=None, n_ticks_=500, baseline_path_=BASELINE_PATH, tolerance_=0.3, save_=False):
+    """Time all configs and variants and compare their tick times, relative to the reference tick timed in the same
+    run, to the baseline file. As the speed of the machine cancels out, the baseline holds on other hosts. Return
+    the list of regressions: the runs more than tolerance_ slower than their baseline. With save_, the baseline
+    file is replaced by the new timings"""
+
+    if config_names_ is None:
+        config_names_ = get_config_names()
+    baseline = dict()
+    if os.path.isfile(baseline_path_):
+        f = open(baseline_path_, 'r')
+        baseline = json.load(f)
+        f.close()
+
+    results = dict()
+    regressions = []
+    for name in config_names_:
+        for variant in sorted(VARIANTS.keys()):
+            key = name + ("+" + variant if variant else "")
+            results[key] = time_body(name, VARIANTS[variant], n_ticks_)
+            results[key]["host"] = platform.node()
+            line = key + ": " + "{0:0.1f}".format(results[key]["median_us"]) + " us/tick (p95 " + \
+                "{0:0.1f}".format(results[key]["p95_us"]) + " us), " + "{0:0.2f}".format(results[key]["relative"]) + \
+                " reference ticks"
+            if key in baseline and "relative" in baseline[key]:
+                ratio = results[key]["relative"] / baseline[key]["relative"]
+                line += ", x" + "{0:0.2f}".format(ratio) + " vs baseline"
+                if ratio > 1 + tolerance_:
+                    regressions.append(key)
+                    line += " REGRESSION"
+            logging.info(line)
+
+    if save_:
+        f = open(baseline_path_, 'w')
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.close()
+        logging.info("Baseline saved in " + baseline_path_)
+
+    return regressions
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Time Body.update() per tick for each config with a mock game "
+                                                 "engine and compare to a baseline, relative to a reference tick")
+    parser.add_argument("configs", nargs="*", help="Config names (default: all the configs of config.py)")
+    parser.add_argument("-n", "--ticks", type=int, default=500, help="Number of timed ticks per config")
+    parser.add_argument("-b", "--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.3, help="Relative slowdown of a regression")
+    parser.add_argument("--save", action="store_true", help="Save the timings as the new baseline")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    regressions = benchmark(args.configs if args.configs else None, args.ticks, args.baseline, args.tolerance,
+                            args.save)
+    sys.exit(1 if regressions else 0)
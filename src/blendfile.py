@@ -0,0 +1,199 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+import re
+import struct
+
+# Game engine flags and constraint types of Blender 2.77 (DNA_object_types.h, DNA_constraint_types.h)
+OB_MESH = 1
+OB_DYNAMIC = 1
+CONSTRAINT_TYPE_RIGIDBODYJOINT = 17
+CONSTRAINT_RB_HINGE = 2
+
+
+class BlendFile:
+    """
+    Minimal reader of uncompressed .blend files. It indexes the file blocks and decodes the SDNA so that struct
+    fields can be read by name, without Blender. Only the fields needed to describe the rigid bodies, their mesh
+    bounds and their rigid body joints are used in this project.
+    Usage:
+            blend = BlendFile("mdl/dog_vert.blend")
+            for o in blend.get_blocks("OB"):
+                name = blend.get(o, "Object", "id")
+                loc = blend.get(o, "Object", "loc")
+    """
+
+    def __init__(self, path_):
+        """Read the file, its blocks headers and its SDNA"""
+
+        f = open(path_, 'rb')
+        self.data = f.read()
+        f.close()
+        if self.data[:7] != b"BLENDER":
+            raise ValueError(path_ + " is not an uncompressed .blend file")
+        self.ptr_size = 8 if self.data[7:8] == b"-" else 4
+        self.endian = "<" if self.data[8:9] == b"v" else ">"
+        self.ptr_fmt = self.endian + ("Q" if self.ptr_size == 8 else "I")
+
+        # Blocks: code, old memory address, SDNA index, count and data offset
+        self.blocks = []
+        self.addresses = dict()
+        offset = 12
+        header_size = 16 + self.ptr_size
+        while offset < len(self.data):
+            code = self.data[offset:offset + 4].rstrip(b"\0").decode("latin1")
+            size = struct.unpack(self.endian + "i", self.data[offset + 4:offset + 8])[0]
+            address = struct.unpack(self.ptr_fmt, self.data[offset + 8:offset + 8 + self.ptr_size])[0]
+            block = {"code": code, "address": address, "offset": offset + header_size, "size": size}
+            self.blocks.append(block)
+            self.addresses[address] = block
+            if code == "DNA1":
+                self.read_sdna(offset + header_size)
+            elif code == "ENDB":
+                break
+            offset += header_size + size
+        self.layouts = dict()
+
+    def read_sdna(self, offset_):
+        """Decode the names, types, type lengths and structs of the SDNA block"""
+
+        def read_strings(o_, n_):
+            strings = []
+            for i in range(n_):
+                end = self.data.index(b"\0", o_)
+                strings.append(self.data[o_:end].decode("latin1"))
+                o_ = end + 1
+            return strings, (o_ + 3) & ~3
+
+        # "SDNA", then "NAME" and the number of names
+        n = struct.unpack(self.endian + "i", self.data[offset_ + 8:offset_ + 12])[0]
+        self.names, o = read_strings(offset_ + 12, n)
+        n = struct.unpack(self.endian + "i", self.data[o + 4:o + 8])[0]
+        self.types, o = read_strings(o + 8, n)
+        self.type_lengths = struct.unpack(self.endian + str(n) + "h", self.data[o + 4:o + 4 + 2 * n])
+        o = (o + 4 + 2 * n + 3) & ~3
+        n = struct.unpack(self.endian + "i", self.data[o + 4:o + 8])[0]
+        o += 8
+        self.structs = dict()
+        for i in range(n):
+            type_idx, n_fields = struct.unpack(self.endian + "hh", self.data[o:o + 4])
+            o += 4
+            fields = []
+            for j in range(n_fields):
+                field_type, field_name = struct.unpack(self.endian + "hh", self.data[o:o + 4])
+                o += 4
+                fields.append((self.types[field_type], self.names[field_name]))
+            self.structs[self.types[type_idx]] = fields
+
+    def get_layout(self, struct_):
+        """Return a dict with field names as keys and (offset, type, declaration, size) as values"""
+
+        if struct_ not in self.layouts:
+            layout = dict()
+            offset = 0
+            for field_type, field_name in self.structs[struct_]:
+                n = 1
+                for dim in re.findall(r"\[(\d+)\]", field_name):
+                    n *= int(dim)
+                if field_name.startswith("*") or field_name.startswith("(*"):
+                    size = self.ptr_size * n
+                else:
+                    size = self.type_lengths[self.types.index(field_type)] * n
+                key = re.sub(r"\[.*", "", field_name).lstrip("*(").rstrip(")")
+                layout[key] = (offset, field_type, field_name, size)
+                offset += size
+            self.layouts[struct_] = layout
+
+        return self.layouts[struct_]
+
+    def get_blocks(self, code_):
+        """Return the data offsets of the blocks with the given code"""
+
+        return [b["offset"] for b in self.blocks if b["code"] == code_]
+
+    def get(self, offset_, struct_, field_):
+        """Read a field of a struct stored at offset_. Pointers are returned as addresses, char arrays as strings,
+        numeric arrays as tuples and nested structs as their offset"""
+
+        offset, field_type, field_name, size = self.get_layout(struct_)[field_]
+        o = offset_ + offset
+        if field_name.startswith("*"):
+            return struct.unpack(self.ptr_fmt, self.data[o:o + self.ptr_size])[0]
+        if field_type == "char":
+            return self.data[o:o + size].split(b"\0")[0].decode("latin1")
+        if field_type in self.structs:
+            return o
+        fmt = {"float": "f", "double": "d", "int": "i", "short": "h"}[field_type]
+        n = size // struct.calcsize(fmt)
+        values = struct.unpack(self.endian + fmt * n, self.data[o:o + size])
+
+        return values if n > 1 else values[0]
+
+    def deref(self, address_):
+        """Return the data offset of the block stored at a memory address or None"""
+
+        if address_ in self.addresses:
+            return self.addresses[address_]["offset"]
+
+        return None
+
+
+def get_morphology(path_):
+    """Return the rigid bodies of a .blend model as a dict with the object names as keys. Each body gives its
+    location, euler rotation, scale, mass, linear and angular damping, dynamic flag, local mesh bounds and its
+    rigid body joints as a list of dicts with the target name, the joint type and the pivot in local coordinates"""
+
+    blend = BlendFile(path_)
+    bodies = dict()
+    for o in blend.get_blocks("OB"):
+        if blend.get(o, "Object", "type") != OB_MESH:
+            continue
+        name = blend.get(blend.get(o, "Object", "id"), "ID", "name")[2:]
+
+        # Mesh bounds in local coordinates
+        mesh = blend.deref(blend.get(o, "Object", "data"))
+        n_vert = blend.get(mesh, "Mesh", "totvert")
+        vert = blend.deref(blend.get(mesh, "Mesh", "mvert"))
+        vert_size = blend.type_lengths[blend.types.index("MVert")]
+        coords = [struct.unpack(blend.endian + "3f", blend.data[vert + i * vert_size:vert + i * vert_size + 12])
+                  for i in range(n_vert)]
+        bounds = [[min([c[k] for c in coords]) for k in range(3)], [max([c[k] for c in coords]) for k in range(3)]]
+
+        # Rigid body joints
+        joints = []
+        address = blend.get(blend.get(o, "Object", "constraints"), "ListBase", "first")
+        while address:
+            con = blend.deref(address)
+            if blend.get(con, "bConstraint", "type") == CONSTRAINT_TYPE_RIGIDBODYJOINT:
+                joint = blend.deref(blend.get(con, "bConstraint", "data"))
+                target = blend.deref(blend.get(joint, "bRigidBodyJointConstraint", "tar"))
+                if target is not None:
+                    joints.append({"target": blend.get(blend.get(target, "Object", "id"), "ID", "name")[2:],
+                                   "type": blend.get(joint, "bRigidBodyJointConstraint", "type"),
+                                   "pivot": [blend.get(joint, "bRigidBodyJointConstraint", k)
+                                             for k in ["pivX", "pivY", "pivZ"]]})
+            address = blend.get(con, "bConstraint", "next")
+
+        bodies[name] = {"loc": list(blend.get(o, "Object", "loc")), "rot": list(blend.get(o, "Object", "rot")),
+                        "scale": list(blend.get(o, "Object", "size")), "mass": blend.get(o, "Object", "mass"),
+                        "damping": blend.get(o, "Object", "damping"),
+                        "rdamping": blend.get(o, "Object", "rdamping"),
+                        "dynamic": bool(blend.get(o, "Object", "gameflag") & OB_DYNAMIC),
+                        "bounds": bounds, "joints": joints}
+
+    return bodies
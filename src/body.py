@@ -17,114 +17,20 @@
 
 import math
 import logging
+import os
+import time
+import numpy as np
 from mathutils import Vector as vec
 
+import bge
+
 from brain import Brain
+from forces import ForceAccumulator
+from profiler import TickProfiler
 from muscle import *
-
-
-class Leg:
-    """This class represents a generic leg and its current behaviour in the control process"""
-
-    def __init__(self, scene_, config_):
-        """Class initialization"""
-
-        self.n_iter = 0
-        self.scene = scene_
-        self.config = config_
-        self.logger = config_.logger
-
-        # Create the muscles objects
-        self.muscles = []
-        self.brain_sig = []
-        self.muscle_type = self.config.muscle_type + "(self.scene, muscle_config)"
-
-    def get_power(self):
-        """Return the time-step power developped by all the leg muscles"""
-
-        power = 0
-        for m in self.muscles:
-            power += m.get_power()
-
-        return power
-
-    def update(self, ctrl_sig_):
-        """Update control signals and forces"""
-
-        self.n_iter += 1
-        self.logger.debug("Leg iteration: " + str(self.n_iter))
-
-
-class Backleg(Leg):
-    """This class represents a generic backleg and its current behaviour in the control process"""
-
-    def __init__(self, scene_, config_, orien_):
-        """Class initialization"""
-
-        Leg.__init__(self, scene_, config_)
-        self.orien = orien_
-
-        # Create the muscles objects following config
-        self.muscles = []
-        self.brain_sig = []
-        if self.orien == "L":
-            for muscle_config in self.config.back_leg_L_muscles:
-                self.muscles.append(eval(self.muscle_type))
-                self.brain_sig.append(muscle_config["brain_sig"])
-        else:  # R
-            for muscle_config in self.config.back_leg_R_muscles:
-                self.muscles.append(eval(self.muscle_type))
-                self.brain_sig.append(muscle_config["brain_sig"])
-
-    def update(self, ctrl_sig_):
-        """Update control signals and forces"""
-
-        for i in range(len(self.muscles)):
-            if self.brain_sig[i] is None:
-                ctrl_sig = 0
-            else:
-                ctrl_sig = ctrl_sig_[self.brain_sig[i]]
-            self.muscles[i].update(ctrl_sig=ctrl_sig)
-
-        self.n_iter += 1
-        self.logger.debug("Backleg " + self.orien + " iteration " + str(self.n_iter) + ": Control signal = " +
-            str(self.brain_sig))
-
-
-class Foreleg(Leg):
-    """This class represents a generic foreleg and its current behaviour in the control process"""
-
-    def __init__(self, scene_, config_, orien_):
-        """Class initialization"""
-
-        Leg.__init__(self, scene_, config_)
-        self.orien = orien_
-
-        # Create the muscles objects following config
-        self.muscles = []
-        self.brain_sig = []
-        if self.orien == "L":
-            for muscle_config in self.config.front_leg_L_muscles:
-                self.muscles.append(eval(self.muscle_type))
-                self.brain_sig.append(muscle_config["brain_sig"])
-        else:  # R
-            for muscle_config in self.config.front_leg_R_muscles:
-                self.muscles.append(eval(self.muscle_type))
-                self.brain_sig.append(muscle_config["brain_sig"])
-
-    def update(self, ctrl_sig_):
-        """Update control signals and forces"""
-
-        for i in range(len(self.muscles)):
-            if self.brain_sig[i] is None:
-                ctrl_sig = 0
-            else:
-                ctrl_sig = ctrl_sig_[self.brain_sig[i]]
-            self.muscles[i].update(ctrl_sig=ctrl_sig)
-
-        self.n_iter += 1
-        self.logger.debug("Foreleg " + self.orien + " iteration " + str(self.n_iter) + ": Control signal = " +
-            str(self.brain_sig))
+from state import SceneState
+from telemetry import Telemetry
+from replay import ControlTrace
 
 
 class Body:
@@ -137,7 +43,8 @@ class Body:
         self.scene = scene_
         self.config = config_
         self.logger = config_.logger
-        self.muscle_type = self.config.muscle_type + "(self.scene, muscle_config)"
+        self.state = SceneState(scene_)
+        self.muscle_class = get_muscle_class(self.config.muscle_type)
         self.name = self.config.body["name"]
 
         # Get body object
@@ -146,93 +53,351 @@ class Body:
             self.active = False
         else:
             self.body_obj = self.scene.objects[self.config.body["obj"]]
+            self.body_state = self.state.register(self.body_obj)
 
-        # Create and init variables for loss function
+        # Create and init the streaming accumulators of the loss function
         self.origin = self.body_obj.worldTransform * vec((0, 0, 0))
         self.position = self.origin
         self.dist = vec(self.position - self.origin).length
-        self.powers = []
+        self.tic_rate = bge.logic.getLogicTicRate()
+        self.mass = sum([obj.mass for obj in self.scene.objects if hasattr(obj, "mass")])
+        self.n_power = 0
+        self.power = 0.0
+        self.work = 0.0
         self.av_power = 0.0
+        self.peak_power = 0.0
         self.loss_fct = 0.0
 
-        # Create 4 legs
-        self.l_fo_leg = Foreleg(scene_, config_, "L")
-        self.r_fo_leg = Foreleg(scene_, config_, "R")
-        self.l_ba_leg = Backleg(scene_, config_, "L")
-        self.r_ba_leg = Backleg(scene_, config_, "R")
+        # Create the muscles of the limb graph or a vectorized bank of all of them
+        self.limbs = []
+        self.muscles = []
+        self.dispatch = []
+        self.bank = None
+        bank_class = get_bank_class(self.config.muscle_type)
+        if self.config.muscle_bank and bank_class is None:
+            self.logger.error("No muscle bank implements the " + str(self.config.muscle_type) + " model. " +
+                              "Muscles are created one by one instead!")
+        if self.config.muscle_bank and bank_class is HillMuscleBank:
+            self.bank = HillMuscleBank(scene_, self.get_muscles_config(), self.logger, self.state,
+                                       self.config.muscle_tables)
+        elif self.config.muscle_bank and bank_class is not None:
+            self.bank = bank_class(scene_, self.get_muscles_config(), self.logger, self.state)
+        else:
+            self.create_limbs()
+
+        # Sum the muscle actions per object to apply them with one force and one torque per object
+        self.forces = None
+        if self.config.force_accumulation:
+            self.forces = ForceAccumulator(self.state, self.tic_rate)
+            for m in self.muscles:
+                m.forces = self.forces
+            if self.bank is not None:
+                self.bank.forces = self.forces
+
+        # Create the brain object, or replay its control signals from a recorded trace
+        self.brain = None
+        self.trace = None
+        self.replay = False
+        if self.config.trace["mode"] == "replay":
+            if self.config.trace["path"] is not None and os.path.isfile(self.config.trace["path"]):
+                self.trace = ControlTrace.load(self.config.trace["path"])
+                self.replay = True
+            else:
+                self.logger.error("Control trace " + str(self.config.trace["path"]) + " doesn't exist. " +
+                                  "The brain is used instead!")
+        if self.replay:
+            n_ctrl = self.trace.n_channels
+        else:
+            self.brain = Brain(scene_, config_)
+            n_ctrl = self.brain.n_osc
+            if self.config.trace["mode"] == "record":
+                self.trace = ControlTrace(n_ctrl)
+
+        # Update periods in ticks and per-subsystem costs. Muscles apply their impulses at each tick
+        self.brain_period = max(1, int(self.config.update_periods["brain"]))
+        self.power_period = max(1, int(self.config.update_periods["power"]))
+        self.interpolate = self.config.brain_output == "interpolate"
+        self.ctrl_sig = [0.0] * n_ctrl
+        self.ctrl_prev = np.zeros(n_ctrl)
+        self.ctrl_next = np.zeros(n_ctrl)
+        if self.brain is not None:
+            self.ctrl_next[:] = self.brain.state[:, 0]
+        self.costs = {"brain": 0.0, "muscles": 0.0, "power": 0.0}
+        self.profiler = TickProfiler() if self.config.profile else None
+        self.timed = self.config.cost_report or self.profiler is not None
+
+        # Create the telemetry channels
+        self.telemetry = Telemetry(self.config.telemetry["level"], self.config.telemetry["size"],
+                                   self.config.telemetry["decimation"])
+        self.telemetry.add_channel("body", 7, 1, ["x", "y", "z", "v_x", "v_y", "v_z", "dist"])
+        self.telemetry.add_channel("ctrl_sig", n_ctrl, 1)
+        self.telemetry.add_channel("power", 3, 1, ["power", "av_power", "work"])
+        names = [m.name for m in self.get_muscles()]
+        if self.bank is not None:
+            names += self.bank.names
+        self.telemetry.add_channel("muscle_force", len(names), 2, names)
+        self.telemetry.add_channel("muscle_length", len(names), 2, names)
+        self.telemetry.add_channel("muscle_ctrl_sig", len(names), 2, names)
+
+    def create_limbs(self):
+        """Create the muscles of the limb graph of the config and flatten it in a dispatch list of each muscle and
+        its brain channel. A brain channel of -1 is a null control signal and -2 an uncontrolled muscle"""
+
+        brain_sig = []
+        for limb in self.config.get_limbs():
+            start = len(self.muscles)
+            for muscle_config in limb["muscles"]:
+                muscle = self.muscle_class(self.scene, muscle_config, self.state)
+                self.muscles.append(muscle)
+                if "brain_sig" not in muscle_config:
+                    brain_sig.append(-2)
+                elif muscle_config["brain_sig"] is None:
+                    brain_sig.append(-1)
+                else:
+                    brain_sig.append(muscle_config["brain_sig"])
+            self.limbs.append({"name": limb["name"], "start": start, "stop": len(self.muscles)})
+
+        self.dispatch = list(zip(self.muscles, brain_sig))
+
+    def get_muscles_config(self):
+        """Return the list of the parameters dicts of the muscles of all limbs"""
+
+        return self.config.get_muscles_config()
+
+    def get_muscles(self):
+        """Return the list of all the muscle objects of the limb graph"""
+
+        return self.muscles
+
+    def get_limb_power(self, name_):
+        """Return the time-step power developped by the muscles of a limb"""
 
-        # Create the brain object
-        self.brain = Brain(scene_, config_)
+        power = 0
+        for limb in self.limbs:
+            if limb["name"] == name_:
+                for m in self.muscles[limb["start"]:limb["stop"]]:
+                    power += m.get_power()
 
-        # Create the muscles objects following config
-        self.muscles = []
-        for muscle_config in self.config.body["muscles"]:
-            self.muscles.append(eval(self.muscle_type))
+        return power
 
     def compute_traveled_dist(self):
         """Return a float representing the distance between origin and the current position"""
 
         # Get current position
-        self.position = self.body_obj.worldTransform * vec((0, 0, 0))
+        self.position = vec(self.state.positions[self.body_state])
 
         # Get distance
         self.dist = vec(self.position - self.origin).length
 
-        return 
+        return
 
     def compute_power(self):
-        """Compute time-step power at each iteration"""
+        """Compute time-step power and update the work, average and peak power accumulators. With a power update
+        period of m ticks, the power sample stands for the m ticks of the work"""
 
         power = 0.0
 
-        # Get power from legs
-        power += self.l_ba_leg.get_power()
-        power += self.r_ba_leg.get_power()
-        power += self.l_fo_leg.get_power()
-        power += self.r_fo_leg.get_power()
-
-        # Get power from body muscles
+        # Get power from the muscles of all limbs
         for m in self.muscles:
             power += m.get_power()
 
-        # Append to powers list
-        self.powers.append(power)
+        # Get power from the muscle bank
+        if self.bank is not None:
+            power += self.bank.get_power()
 
-        return
+        # Update accumulators
+        self.power = power
+        self.n_power += 1
+        self.work += power * self.power_period / self.tic_rate
+        self.av_power += (power - self.av_power) / self.n_power
+        if self.n_power == 1 or power > self.peak_power:
+            self.peak_power = power
 
-    def get_loss_fct(self):
-        """Compute the body loss function. This should be called only at the end of the simulation
-        in order to avoid useless computation at each iteration"""
+        return
 
-        self.compute_traveled_dist()
-        self.av_power = sum(self.powers) / float(len(self.powers))
+    def get_cost_of_transport(self):
+        """Return the dimensionless cost of transport: muscles work divided by weight and traveled distance.
+        It is infinite as long as the body has not moved"""
 
-        self.loss_fct = math.tanh(self.dist / self.config.dist_ref) * \
-            math.tanh(self.config.power_ref / self.av_power)
+        if self.dist == 0.0 or self.mass == 0.0:
+            return float("inf")
 
-        return self.loss_fct
+        return self.work / (self.mass * 9.81 * self.dist)
 
-    def update(self):
-        """Update control signals and forces"""
+    def get_loss_fct(self):
+        """Compute the body loss function from the accumulators. It can be called at any time of the
+        simulation"""
 
-        # Update brain
-        self.brain.update()
-        ctrl_sig = [float(self.brain.state[0]), float(self.brain.state[1]), float(self.brain.state[2]),
-                    float(self.brain.state[3])]
+        if self.av_power == 0.0:
+            power_term = 1.0
+        else:
+            power_term = math.tanh(self.config.power_ref / self.av_power)
+        self.loss_fct = math.tanh(self.dist / self.config.dist_ref) * power_term
 
-        # Update the four legs
-        self.l_ba_leg.update(ctrl_sig)
-        self.r_ba_leg.update(ctrl_sig)
-        self.l_fo_leg.update(ctrl_sig)
-        self.r_fo_leg.update(ctrl_sig)
+        return self.loss_fct
 
-        # Update other muscles
-        for muscle in self.muscles:
-            muscle.update()
+    def get_stats(self):
+        """Return a dict with the current loss function and its distance and energy accumulators"""
+
+        return {"n_iter": self.n_iter, "dist": self.dist, "work": self.work, "av_power": self.av_power,
+                "peak_power": self.peak_power, "cost_of_transport": self.get_cost_of_transport(),
+                "loss": self.get_loss_fct()}
+
+    def get_costs(self):
+        """Return the update period, the total time and the time per tick of the brain, muscles and power
+        subsystems, or None if the ticks are not timed"""
+
+        if not self.timed:
+            return None
+
+        n_iter = max(1, self.n_iter)
+        periods = {"brain": self.brain_period, "muscles": 1, "power": self.power_period}
+
+        return dict([(name, {"period": periods[name], "time": self.costs[name],
+                             "time_per_tick": self.costs[name] / n_iter}) for name in self.costs])
+
+    def record_telemetry(self, ctrl_sig_):
+        """Record the body, brain and muscles samples of the current time-step"""
+
+        position = self.state.positions[self.body_state]
+        velocity = self.state.lin_vels[self.body_state]
+        self.telemetry.record("body", [position.x, position.y, position.z, velocity.x, velocity.y, velocity.z,
+                                       self.dist])
+        self.telemetry.record("ctrl_sig", ctrl_sig_)
+        self.telemetry.record("power", [self.power, self.av_power, self.work])
+
+        if self.telemetry.has_channel("muscle_force"):
+            forces = []
+            lengths = []
+            ctrl_sigs = []
+            for m in self.get_muscles():
+                if m.active and hasattr(m, "force"):
+                    direction = m.l.normalized()
+                    forces.append(m.force.dot(direction))
+                    lengths.append(m.l.length)
+                    ctrl_sigs.append(m.ctrl_sig if m.ctrl_sig is not None else 0.0)
+                else:
+                    forces.append(0.0)
+                    lengths.append(0.0)
+                    ctrl_sigs.append(0.0)
+            if self.bank is not None:
+                forces += np.einsum("ni,ni->n", self.bank.force, self.bank.dir).tolist()
+                lengths += self.bank.length.tolist()
+                ctrl_sigs += self.bank.ctrl_sig.tolist()
+            self.telemetry.record("muscle_force", forces)
+            self.telemetry.record("muscle_length", lengths)
+            self.telemetry.record("muscle_ctrl_sig", ctrl_sigs)
+
+    def save_telemetry(self, path_):
+        """Write the telemetry samples in a .npz file. Return the file path or None if telemetry is disabled"""
+
+        if self.telemetry.level <= 0:
+            return None
+
+        self.telemetry.flush(path_)
+        self.logger.info("Telemetry saved in " + path_)
+
+        return path_
+
+    def save_trace(self):
+        """Write the recorded control trace, by default next to the results file. Return the file path or None
+        if no trace is recorded"""
+
+        if self.trace is None or self.replay:
+            return None
+
+        path = self.config.trace["path"]
+        if path is None:
+            path = os.path.splitext(self.config.save_path)[0] + ".qct"
+        self.trace.save(path)
+        self.logger.info("Control trace saved in " + path)
+
+        return path
+
+    def update_muscles(self, dispatch_, ctrl_sig_):
+        """Update a list of (muscle, brain channel) pairs of the flattened limb graph"""
+
+        for muscle, sig in dispatch_:
+            if sig >= 0:
+                muscle.update(ctrl_sig=ctrl_sig_[sig])
+            elif sig == -1:
+                muscle.update(ctrl_sig=0)
+            else:
+                muscle.update()
 
-        # Update powers list
-        self.compute_power()
+    def update(self):
+        """Update control signals and forces. The phases are timed only for the cost report or the profiler"""
+
+        # Read the scene state once for this time-step
+        timed = self.timed
+        if timed:
+            t_state = time.time()
+        self.state.update()
+        self.telemetry.tick()
+
+        # Update brain every brain_period ticks, or read the replayed control signals. The brain is updated at the
+        # start of a period up to its end: "hold" applies this end-of-period output during the whole period (a
+        # look-ahead of brain_period - 1 ticks, none for a period of 1) and "interpolate" ramps from the previous
+        # output, the initial brain state for the first period
+        if timed:
+            t_brain = time.time()
+        if self.replay:
+            ctrl_sig = self.trace.read()
+        else:
+            phase = self.n_iter % self.brain_period
+            if phase == 0:
+                self.brain.update(self.brain_period)
+                if self.interpolate:
+                    self.ctrl_prev, self.ctrl_next = self.ctrl_next, self.ctrl_prev
+                    self.ctrl_next[:] = self.brain.state[:, 0]
+                else:
+                    self.ctrl_sig = self.brain.state[:, 0].tolist()
+            if self.interpolate:
+                frac = float(phase + 1) / self.brain_period
+                self.ctrl_sig = (self.ctrl_prev + frac * (self.ctrl_next - self.ctrl_prev)).tolist()
+            ctrl_sig = self.ctrl_sig
+            if self.trace is not None:
+                self.trace.write(ctrl_sig)
+        if timed:
+            t_muscles = time.time()
+            self.costs["brain"] += t_muscles - t_brain
+
+        # Update the muscles of all limbs in a single pass, or limb by limb when profiling
+        if self.profiler is None:
+            self.update_muscles(self.dispatch, ctrl_sig)
+        else:
+            for limb in self.limbs:
+                t_limb = time.time()
+                self.update_muscles(self.dispatch[limb["start"]:limb["stop"]], ctrl_sig)
+                self.profiler.add("limb:" + limb["name"], time.time() - t_limb)
+
+        # Update all muscles at once
+        if self.bank is not None:
+            self.bank.update(ctrl_sig)
+        if self.forces is not None:
+            self.forces.apply()
+        if timed:
+            t_power = time.time()
+            self.costs["muscles"] += t_power - t_muscles
+
+        # Update power every power_period ticks and distance accumulators
+        if self.n_iter % self.power_period == 0:
+            self.compute_power()
+        self.compute_traveled_dist()
+        if timed:
+            t_telemetry = time.time()
+            self.costs["power"] += t_telemetry - t_power
+
+        # Record telemetry samples
+        if self.telemetry.on:
+            self.record_telemetry(ctrl_sig)
+
+        # Count the phases durations in the tick profiler
+        if self.profiler is not None:
+            self.profiler.add("state", t_brain - t_state)
+            self.profiler.add("brain", t_muscles - t_brain)
+            self.profiler.add("muscles", t_power - t_muscles)
+            self.profiler.add("power", t_telemetry - t_power)
+            self.profiler.add("telemetry", time.time() - t_telemetry)
 
         self.n_iter += 1
-        self.logger.debug("Body " + self.name + " iteration " + str(self.n_iter))
-        self.logger.debug("Average power: " + "{0:0.2f}".format(self.av_power))
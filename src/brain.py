@@ -15,44 +15,534 @@
 ##
 
 
+import hashlib
 import logging
+import os
+import pickle
+import time
 import numpy as np
 
+# Brain types. Set with the "type" key of config.brain
+BRAIN_TYPES = ["matsuoka", "reservoir"]
+
+# Integrators available for the oscillators. Set with the "integrator" key of config.brain
+INTEGRATORS = ["euler", "semi_implicit", "rk4", "adaptive"]
+
+# Dormand-Prince 5(4) coefficients: stages matrix and difference between fifth and fourth order weights
+DP_A = [[0., 0., 0., 0., 0., 0.],
+        [1. / 5, 0., 0., 0., 0., 0.],
+        [3. / 40, 9. / 40, 0., 0., 0., 0.],
+        [44. / 45, -56. / 15, 32. / 9, 0., 0., 0.],
+        [19372. / 6561, -25360. / 2187, 64448. / 6561, -212. / 729, 0., 0.],
+        [9017. / 3168, -355. / 33, 46732. / 5247, 49. / 176, -5103. / 18656, 0.],
+        [35. / 384, 0., 500. / 1113, 125. / 192, -2187. / 6784, 11. / 84]]
+DP_E = [71. / 57600, 0., -71. / 16695, 71. / 1920, -17253. / 339200, 22. / 525, -1. / 40]
+
+# Default coupling of the 4 oscillators network. It is scaled by config.brain aa
+DEFAULT_COUPLING = np.array([[0, -1, -1, 1], [-1, 0, 1, -1], [-1, 1, 0, -1], [1, -1, -1, 0]], dtype=float)
+
+
+class SparseMatrix:
+    """Coupling matrix stored as (row, column, value) connections sorted by row. The product with a (n, n_batch)
+    state costs O(connections) NumPy operations, whatever the number of oscillators"""
+
+    def __init__(self, rows_, cols_, vals_, n_, n_batch_=1, scale_=None):
+        """Class initialization. scale_ is an optional (1, n_batch) gain applied per network"""
+
+        order = np.argsort(np.asarray(rows_, dtype=int), kind="mergesort")
+        self.rows = np.asarray(rows_, dtype=int)[order]
+        self.cols = np.asarray(cols_, dtype=int)[order]
+        self.vals = np.asarray(vals_, dtype=float)[order][:, np.newaxis]
+        self.n = n_
+        self.scale = scale_
+        self.nnz = len(self.rows)
+        self.nz_rows, self.starts = np.unique(self.rows, return_index=True)
+        self.prod = np.zeros((self.nnz, n_batch_))
+
+    def dot(self, y_, out_):
+        """Compute the product with y_ in out_"""
+
+        out_[:] = 0.
+        if self.nnz == 0:
+            return
+        np.take(y_, self.cols, axis=0, out=self.prod)
+        self.prod *= self.vals
+        if self.scale is not None:
+            self.prod *= self.scale
+        out_[self.nz_rows] = np.add.reduceat(self.prod, self.starts, axis=0)
+
+    def to_dense(self):
+        """Return the matrix as a dense array"""
+
+        dense = np.zeros((self.n, self.n))
+        np.add.at(dense, (self.rows, self.cols), self.vals[:, 0])
+
+        return dense
+
 
 class Matsuoka:
-    """This class represents the mouse brain and its current behaviour in the control process"""
+    """This class represents the mouse brain and its current behaviour in the control process. The oscillator
+    states have shape (n_osc, n_batch): several networks (one per individual or per duplicated robot) can be
+    integrated together in a single call. Each brain parameter can be a scalar or a list of n_batch values"""
 
-    def __init__(self, scene_, config_):
+    def __init__(self, scene_, config_, n_batch_=1):
         """Class initialization"""
 
         self.scene = scene_
         self.config = config_
+        self.n_batch = n_batch_
         self.h = self.config.brain["h"]
-        self.tau = self.config.brain["tau"]
-        self.T = self.config.brain["T"]
-        self.a = self.config.brain["a"]
-        self.b = self.config.brain["b"]
-        self.c = self.config.brain["c"]
+        self.tau = self.get_param("tau")
+        self.T = self.get_param("T")
+        self.a = self.get_param("a")
+        self.b = self.get_param("b")
+        self.c = self.get_param("c")
         self.aa = self.config.brain["aa"]
-        self.A = self.aa * np.array([[0, -1, -1, 1], [-1, 0, 1, -1], [-1, 1, 0, -1], [1, -1, -1, 0]])
         self.n_osc = self.config.brain["n_osc"]
-        self.x = np.zeros((self.n_osc, 1)) + np.array([[0.1], [0.1], [0.2], [0.2]])
-        self.v = np.zeros((self.n_osc, 1)) + np.array([[0.1], [0.1], [0.2], [0.2]])
-        self.y = np.zeros((self.n_osc, 1)) + np.array([[0.1], [0.1], [0.2], [0.2]])
-        self.g = lambda x: max(0., x)
+        self.A = self.get_coupling()
+        init = self.get_init()
+        self.x = np.tile(init, (1, self.n_batch))
+        self.v = np.tile(init, (1, self.n_batch))
+        self.y = np.tile(init, (1, self.n_batch))
         self.Record = 0
         self.time = []
         self.time_interval = self.config.brain["time_interval"]
-        self.iter_num = int(self.time_interval / self.h)
+        self.iter_num = max(1, int(round(self.time_interval / self.h)))
+        self.h_step = self.time_interval / self.iter_num
+
+        # Integrator selection
+        self.integrator = self.config.brain.get("integrator", "euler")
+        if self.integrator not in INTEGRATORS:
+            logging.getLogger(self.config.logger_name).error("Unknown brain integrator " + str(self.integrator) +
+                                                             ". Explicit Euler is used instead")
+            self.integrator = "euler"
+        self.rtol = self.config.brain.get("rtol", 1e-4)
+        self.atol = self.config.brain.get("atol", 1e-6)
+        self.h_max = self.config.brain.get("h_max", self.time_interval)
+        self.h_adapt = self.h
+        self.n_eval = 0  # number of derivatives evaluations, used for benchmarking
+
+        # Integration constants and buffers
+        shape = (self.n_osc, self.n_batch)
+        self.Ay = np.zeros(shape)
+        self.dx = np.zeros(shape)
+        self.dv = np.zeros(shape)
+        self.yt = np.zeros(shape)
+        self.xt = np.zeros(shape)
+        self.vt = np.zeros(shape)
+        n_stages = 0
+        if self.integrator == "rk4":
+            n_stages = 4
+        elif self.integrator == "adaptive":
+            n_stages = 7
+            self.x_err = np.zeros(shape)
+            self.v_err = np.zeros(shape)
+        self.kx = [np.zeros(shape) for i in range(n_stages)]
+        self.kv = [np.zeros(shape) for i in range(n_stages)]
+        self.steps = {"euler": self.step_euler, "semi_implicit": self.step_semi_implicit, "rk4": self.step_rk4}
+
+    def get_param(self, name_):
+        """Return a brain parameter as a float or, if one value per network is given, as a (1, n_batch) array"""
+
+        param = self.config.brain[name_]
+        if np.ndim(param) == 0:
+            return float(param)
+
+        return np.asarray(param, dtype=float).reshape((1, self.n_batch))
+
+    def get_coupling(self):
+        """Return the coupling matrix scaled by aa. If config.brain has a coupling list of (i, j, w) connections
+        (oscillator i receiving - w * y_j, as the network term is - A.y), a SparseMatrix is returned; otherwise
+        the default dense 4 oscillators network is used"""
+
+        if "coupling" in self.config.brain:
+            rows = [int(con[0]) for con in self.config.brain["coupling"]]
+            cols = [int(con[1]) for con in self.config.brain["coupling"]]
+            vals = [float(con[2]) for con in self.config.brain["coupling"]]
+            if np.ndim(self.aa) == 0:
+                return SparseMatrix(rows, cols, np.array(vals) * self.aa, self.n_osc, self.n_batch)
+            return SparseMatrix(rows, cols, vals, self.n_osc, self.n_batch, self.get_param("aa"))
+
+        if self.n_osc != DEFAULT_COUPLING.shape[0]:
+            raise ValueError("A coupling list is required in config.brain for a network of " + str(self.n_osc) +
+                             " oscillators")
+        if np.ndim(self.aa) == 0:
+            return self.aa * DEFAULT_COUPLING
+
+        return np.asarray(self.aa, dtype=float)[:, np.newaxis, np.newaxis] * DEFAULT_COUPLING
+
+    def get_init(self):
+        """Return the (n_osc, 1) initial state taken from config.brain init or alternating 0.1 and 0.2 for each
+        pair of oscillators"""
+
+        if "init" in self.config.brain:
+            return np.asarray(self.config.brain["init"], dtype=float).reshape((self.n_osc, 1))
+
+        return np.array([[0.1 if (i // 2) % 2 == 0 else 0.2] for i in range(self.n_osc)])
+
+    def coupling(self, y_, out_):
+        """Compute the coupling term A.y in out_"""
+
+        if isinstance(self.A, SparseMatrix):
+            self.A.dot(y_, out_)
+        elif self.A.ndim == 2:
+            np.dot(self.A, y_, out=out_)
+        else:
+            np.einsum("bij,jb->ib", self.A, y_, out=out_)
+
+    def derivatives(self, x_, v_, dx_, dv_):
+        """Compute the time derivatives of x and v in dx_ and dv_"""
+
+        # dx/dt = (- x + c - A.y - b * v) / tau
+        np.maximum(x_, 0., out=self.yt)
+        self.coupling(self.yt, self.Ay)
+        np.multiply(self.b, v_, out=dx_)
+        dx_ += self.Ay
+        dx_ += x_
+        np.subtract(self.c, dx_, out=dx_)
+        dx_ /= self.tau
+
+        # dv/dt = (- v + y) / T
+        np.subtract(self.yt, v_, out=dv_)
+        dv_ /= self.T
+        self.n_eval += 1
+
+    def step_euler(self, h_):
+        """Explicit Euler step"""
+
+        # dx = h * (- x + c - A.y - b * v) / tau
+        self.coupling(self.y, self.Ay)
+        np.multiply(self.b, self.v, out=self.dx)
+        self.dx += self.Ay
+        self.dx += self.x
+        np.subtract(self.c, self.dx, out=self.dx)
+        self.dx *= h_ / self.tau
+
+        # dv = h * (- v + y) / T
+        np.subtract(self.y, self.v, out=self.dv)
+        self.dv *= h_ / self.T
+
+        self.x += self.dx
+        self.v += self.dv
+        np.maximum(self.x, 0., out=self.y)
+        self.n_eval += 1
+
+    def step_semi_implicit(self, h_):
+        """Semi-implicit Euler step: the linear decay terms - x / tau and - v / T are integrated implicitly and
+        v is updated with the new output y. It stays stable for steps much larger than tau and T"""
+
+        # x = (x + h * (c - A.y - b * v) / tau) / (1 + h / tau)
+        self.coupling(self.y, self.Ay)
+        np.multiply(self.b, self.v, out=self.dx)
+        self.dx += self.Ay
+        np.subtract(self.c, self.dx, out=self.dx)
+        self.dx *= h_ / self.tau
+        self.x += self.dx
+        self.x /= 1. + h_ / self.tau
+        np.maximum(self.x, 0., out=self.y)
+
+        # v = (v + h * y / T) / (1 + h / T)
+        np.multiply(self.y, h_ / self.T, out=self.dv)
+        self.v += self.dv
+        self.v /= 1. + h_ / self.T
+        self.n_eval += 1
+
+    def step_rk4(self, h_):
+        """Classical fourth order Runge-Kutta step"""
+
+        kx = self.kx
+        kv = self.kv
+        self.derivatives(self.x, self.v, kx[0], kv[0])
+        for i, fact in [(1, 0.5), (2, 0.5), (3, 1.)]:
+            np.multiply(kx[i - 1], fact * h_, out=self.xt)
+            self.xt += self.x
+            np.multiply(kv[i - 1], fact * h_, out=self.vt)
+            self.vt += self.v
+            self.derivatives(self.xt, self.vt, kx[i], kv[i])
+
+        for k, state in [(kx, self.x), (kv, self.v)]:
+            k[1] += k[2]
+            k[1] *= 2.
+            k[0] += k[1]
+            k[0] += k[3]
+            k[0] *= h_ / 6.
+            state += k[0]
+        np.maximum(self.x, 0., out=self.y)
+
+    def step_adaptive(self, duration_):
+        """Integrate over duration_ with the Dormand-Prince 5(4) embedded Runge-Kutta pair. The step size is
+        adapted to keep the local error under atol + rtol * |state| and is kept from one call to the next"""
+
+        kx = self.kx
+        kv = self.kv
+        t = 0.
+        while t < duration_ * (1. - 1e-9):
+            h = min(self.h_adapt, self.h_max, duration_ - t)
+
+            # Stages
+            self.derivatives(self.x, self.v, kx[0], kv[0])
+            for i in range(1, 7):
+                self.xt[:] = self.x
+                self.vt[:] = self.v
+                for j in range(i):
+                    if DP_A[i][j] != 0.:
+                        self.xt += (h * DP_A[i][j]) * kx[j]
+                        self.vt += (h * DP_A[i][j]) * kv[j]
+                self.derivatives(self.xt, self.vt, kx[i], kv[i])
+
+            # The last stage point is the fifth order solution. Error is the difference with the fourth order one
+            self.x_err[:] = 0.
+            self.v_err[:] = 0.
+            for j in range(7):
+                if DP_E[j] != 0.:
+                    self.x_err += (h * DP_E[j]) * kx[j]
+                    self.v_err += (h * DP_E[j]) * kv[j]
+            scale_x = self.atol + self.rtol * np.maximum(np.abs(self.x), np.abs(self.xt))
+            scale_v = self.atol + self.rtol * np.maximum(np.abs(self.v), np.abs(self.vt))
+            err = np.sqrt(0.5 * (np.mean((self.x_err / scale_x) ** 2) + np.mean((self.v_err / scale_v) ** 2)))
+
+            # Accept or reject and adapt the step
+            if err <= 1.:
+                t += h
+                self.x[:] = self.xt
+                self.v[:] = self.vt
+            if err == 0.:
+                factor = 5.
+            else:
+                factor = min(5., max(0.2, 0.9 * err ** -0.2))
+            self.h_adapt = h * factor
+
+        np.maximum(self.x, 0., out=self.y)
+
+    def update(self, n_ticks_=1):
+        """Advance the oscillators by n_ticks_ time-steps. Fixed step integrators keep their number of steps per
+        update, with steps n_ticks_ times longer, while the adaptive one keeps its accuracy"""
+
+        if self.integrator == "adaptive":
+            self.step_adaptive(self.time_interval * n_ticks_)
+        else:
+            step = self.steps[self.integrator]
+            for i in range(self.iter_num):
+                step(self.h_step * n_ticks_)
+
+
+class Reservoir:
+    """
+    Echo state network brain: a leaky reservoir of tanh units with a sparse random recurrent matrix scaled to a
+    given spectral radius, driven by a sinusoidal input and read by a linear readout giving one control signal
+    per output. Buffers are preallocated and the recurrent product costs O(connections), so reservoirs of
+    thousands of units fit in a game logic tick.
+    Usage:
+            config.brain = {"name": "dog_reservoir_brain", "type": "reservoir", "n_osc": 4, "n_res": 500,
+                            "density": 0.02, "spectral_radius": 0.95, "leak": 0.3, "in_freq": 2.,
+                            "time_interval": 1e-3}
+            res = Reservoir(scene, config)
+            res.update()
+            y = res.y
+    """
+
+    def __init__(self, scene_, config_):
+        """Class initialization"""
+
+        self.scene = scene_
+        self.config = config_
+        self.n_out = self.config.brain["n_osc"]
+        self.n_res = self.config.brain.get("n_res", 500)
+        self.density = self.config.brain.get("density", 0.02)
+        self.spectral_radius = self.config.brain.get("spectral_radius", 0.95)
+        self.leak = self.config.brain.get("leak", 0.3)
+        self.in_scale = self.config.brain.get("in_scale", 1.)
+        self.in_freq = self.config.brain.get("in_freq", 2.)
+        self.bias_scale = self.config.brain.get("bias_scale", 0.2)
+        self.time_interval = self.config.brain["time_interval"]
+        self.t = 0.
+        rand = np.random.RandomState(self.config.brain.get("seed", 0))
+
+        # Sparse recurrent matrix with a fixed number of inputs per unit
+        fan_in = max(1, int(round(self.density * self.n_res)))
+        rows = np.repeat(np.arange(self.n_res), fan_in)
+        cols = rand.randint(0, self.n_res, rows.shape[0])
+        vals = rand.uniform(-1., 1., rows.shape[0])
+        self.W = SparseMatrix(rows, cols, vals, self.n_res)
+        rho = self.get_spectral_radius()
+        if rho > 0.:
+            self.W.vals *= self.spectral_radius / rho
+
+        # Input (sine and cosine of the drive phase), bias and readout weights
+        self.W_in = rand.uniform(-self.in_scale, self.in_scale, (self.n_res, 2))
+        self.bias = rand.uniform(-self.bias_scale, self.bias_scale, (self.n_res, 1))
+        if "readout" in self.config.brain:
+            self.W_out = np.asarray(self.config.brain["readout"], dtype=float).reshape((self.n_out, self.n_res))
+        else:
+            self.W_out = rand.normal(0., self.config.brain.get("readout_scale", 1.) / np.sqrt(self.n_res),
+                                     (self.n_out, self.n_res))
+
+        # State and buffers
+        self.x = np.zeros((self.n_res, 1))
+        self.u = np.zeros((2, 1))
+        self.pre = np.zeros((self.n_res, 1))
+        self.drive = np.zeros((self.n_res, 1))
+        self.y = np.zeros((self.n_out, 1))
+
+    def get_spectral_radius(self, n_iter_=100):
+        """Estimate the spectral radius of the recurrent matrix with the growth rate of a power iteration"""
+
+        v = np.random.RandomState(1).uniform(-1., 1., (self.n_res, 1))
+        v /= np.linalg.norm(v)
+        w = np.zeros((self.n_res, 1))
+        log_growth = 0.
+        n = 0
+        for i in range(n_iter_):
+            self.W.dot(v, w)
+            norm = np.linalg.norm(w)
+            if norm == 0.:
+                return 0.
+            v[:] = w / norm
+            # Skip the first iterations while v converges to the dominant eigenspace
+            if i >= n_iter_ // 2:
+                log_growth += np.log(norm)
+                n += 1
+
+        return float(np.exp(log_growth / n))
+
+    def update(self, n_ticks_=1):
+        """Update the reservoir state and the readout for n_ticks_ time-steps. The leak is raised so that the
+        reservoir time constant is kept"""
+
+        self.t += self.time_interval * n_ticks_
+        leak = 1. - (1. - self.leak) ** n_ticks_
+        phase = 2. * np.pi * self.in_freq * self.t
+        self.u[0, 0] = np.sin(phase)
+        self.u[1, 0] = np.cos(phase)
+
+        # x = (1 - leak) * x + leak * tanh(W.x + W_in.u + bias)
+        self.W.dot(self.x, self.pre)
+        np.dot(self.W_in, self.u, out=self.drive)
+        self.pre += self.drive
+        self.pre += self.bias
+        np.tanh(self.pre, out=self.pre)
+        self.x *= 1. - leak
+        self.pre *= leak
+        self.x += self.pre
+
+        np.dot(self.W_out, self.x, out=self.y)
+
+
+class CpgCache:
+    """
+    Limit cycle cache of an open-loop oscillator network. Without sensory feedback, the brain output only depends
+    on config.brain: the network is integrated once offline, the transient is stored tick by tick and one period
+    of the limit cycle is stored as a phase lookup table. Tables are saved on disk with a hash of the brain
+    parameters as name so that all the simulations and processes using the same parameters share them.
+    Usage:
+            cache = CpgCache(config, dirname)
+            if not cache.load():
+                cache.build()
+                cache.save()
+            y = cache.get(n_iter)
+    """
+
+    def __init__(self, config_, dirname_):
+        """Class initialization"""
+
+        self.config = config_
+        self.logger = config_.logger
+        self.dirname = dirname_
+        self.dt = self.config.brain["time_interval"]
+        self.transient_time = self.config.brain.get("cache_transient", 5.)
+        self.max_time = self.config.brain.get("cache_max_time", 20.)
+        self.key = self.get_key()
+        self.path = os.path.join(self.dirname, self.key + ".cpg")
+        self.transient = None
+        self.cycle = None
+        self.period = None
+
+    def get_key(self):
+        """Hash all the brain parameters but its name"""
+
+        desc = [(k, self.config.brain[k]) for k in sorted(self.config.brain.keys()) if k != "name"]
 
-    def update(self):
-        """Update control signals and forces"""
+        return hashlib.md5(repr(desc).encode("utf-8")).hexdigest()
 
-        for i in range(self.iter_num):
-            self.x += self.h * (- self.x + self.c - self.A.dot(self.y) - self.b * self.v) / self.tau
-            self.v += self.h * (- self.v + self.y) / self.T
-            for i in range(self.n_osc):
-                self.y[i] = self.g(self.x[i])
+    def load(self):
+        """Load the tables from disk. Return True if they were found"""
+
+        if not os.path.isfile(self.path):
+            return False
+
+        f = open(self.path, 'rb')
+        tables = pickle.load(f)
+        f.close()
+        self.transient = tables["transient"]
+        self.cycle = tables["cycle"]
+        self.period = tables["period"]
+        self.logger.info("CPG cache loaded from " + self.path)
+
+        return True
+
+    def save(self):
+        """Write the tables on disk. The file is renamed once written so that concurrent readers never see a
+        partial table"""
+
+        if not os.path.exists(self.dirname):
+            os.makedirs(self.dirname)
+        tmp_path = self.path + "." + str(os.getpid())
+        f = open(tmp_path, 'wb')
+        pickle.dump({"transient": self.transient, "cycle": self.cycle, "period": self.period}, f, 2)
+        f.close()
+        os.rename(tmp_path, self.path)
+        self.logger.info("CPG cache saved in " + self.path)
+
+    def build(self):
+        """Integrate the network, detect the limit cycle period and fill the tables"""
+
+        osc = Matsuoka(None, self.config)
+        n_transient = int(round(self.transient_time / self.dt))
+        n_max = int(round(self.max_time / self.dt))
+        ys = np.zeros((n_max, osc.n_osc))
+        xs = np.zeros(n_max)
+        for i in range(n_max):
+            osc.update()
+            ys[i] = osc.y[:, 0]
+            xs[i] = osc.x[0, 0]
+
+        # Period from the upward crossings of the first oscillator state through its mean after the transient
+        x = xs[n_transient:] - np.mean(xs[n_transient:])
+        ups = np.nonzero((x[:-1] < 0.) & (x[1:] >= 0.))[0]
+        crossings = ups - x[ups] / (x[ups + 1] - x[ups])
+        if len(crossings) >= 3:
+            periods = np.diff(crossings) * self.dt
+            self.period = float((crossings[-1] - crossings[0]) * self.dt / (len(crossings) - 1))
+            if np.std(periods) > 1e-2 * self.period:
+                self.logger.warning("CPG cache: irregular period (std = " + str(np.std(periods)) + " s)." +
+                                    " The network may not have reached its limit cycle")
+            n_cycle = int(np.ceil(self.period / self.dt)) + 1
+        else:
+            self.logger.warning("CPG cache: no oscillation detected, the brain state at the end of the transient " +
+                                "is used as a constant")
+            self.period = self.dt
+            n_cycle = 1
+
+        self.transient = ys[:n_transient].copy()
+        self.cycle = ys[n_transient:n_transient + n_cycle].copy()
+        self.logger.info("CPG cache built: period = " + "{0:0.4f}".format(self.period) + " s")
+
+    def get(self, n_):
+        """Return the brain output (n_osc, 1) array of time-step n_. During the transient, outputs are the
+        integrated ones. Then the phase on the limit cycle is advanced and the output linearly interpolated"""
+
+        if n_ < len(self.transient):
+            return self.transient[n_][:, np.newaxis]
+        if len(self.cycle) == 1:
+            return self.cycle[0][:, np.newaxis]
+
+        t = ((n_ - len(self.transient)) * self.dt) % self.period
+        i = int(t / self.dt)
+        frac = t / self.dt - i
+        if i + 1 >= len(self.cycle):
+            return self.cycle[-1][:, np.newaxis]
+
+        return ((1. - frac) * self.cycle[i] + frac * self.cycle[i + 1])[:, np.newaxis]
 
 
 class Brain:
@@ -67,16 +557,101 @@ class Brain:
         self.logger = config_.logger
         self.name = self.config.brain["name"]
         self.n_osc = self.config.brain["n_osc"]
-        self.osc = Matsuoka(self.scene, self.config)
         self.state = np.zeros((self.n_osc, 1))
 
-    def update(self):
-        """Update control signals and forces"""
+        # Use the limit cycle cache or integrate the oscillators or the reservoir
+        self.type = self.config.brain.get("type", "matsuoka")
+        if self.type not in BRAIN_TYPES:
+            self.logger.error("Unknown brain type " + str(self.type) + ". A Matsuoka oscillator is used instead")
+            self.type = "matsuoka"
+        self.cache = None
+        self.osc = None
+        if self.type == "reservoir":
+            self.osc = Reservoir(self.scene, self.config)
+        elif self.config.brain.get("cache", False):
+            dirname = self.config.brain.get("cache_dir",
+                                            os.path.join(os.path.dirname(os.path.abspath(self.config.save_path)),
+                                                         "cpg"))
+            self.cache = CpgCache(self.config, dirname)
+            if not self.cache.load():
+                self.cache.build()
+                self.cache.save()
+        else:
+            self.osc = Matsuoka(self.scene, self.config)
+
+        # Output before the first update: the initial state of the oscillators
+        if self.osc is not None:
+            self.state = self.osc.y.copy()
+        else:
+            self.state = Matsuoka(None, self.config).y.copy()
+
+    def update(self, n_ticks_=1):
+        """Update control signals for the next n_ticks_ time-steps"""
 
         # Write control signals into y
-        self.osc.update()
-        self.state = self.osc.y
+        if self.cache is not None:
+            self.state = self.cache.get(self.n_iter + n_ticks_ - 1)
+        else:
+            self.osc.update(n_ticks_)
+            self.state = self.osc.y
+
+        self.n_iter += n_ticks_
+
+
+# Testing functions ###
+
+def benchmark_integrators(n_ticks=2000, config_name="DogVertDefConfig", euler_iter=10):
+    """Compare the per-tick cost of the integrators at matched accuracy. The reference trajectory is computed
+    with RK4 and a very small step. Explicit Euler runs euler_iter inner iterations per tick, as a stiff parameter
+    set would require. For each other integrator, the largest step reaching the accuracy of Euler is selected
+    and its per-tick cost is compared to Euler one"""
+
+    import config
+
+    def run(brain_):
+        conf = getattr(config, config_name)()
+        conf.brain.update(brain_)
+        osc = Matsuoka(None, conf)
+        ys = np.zeros((n_ticks, osc.n_osc))
+        t_init = time.time()
+        for i in range(n_ticks):
+            osc.update()
+            ys[i] = osc.y[:, 0]
+        return ys, (time.time() - t_init) / n_ticks, osc.n_eval / float(n_ticks)
+
+    conf = getattr(config, config_name)()
+    interval = conf.brain["time_interval"]
+    ref, t_ref, n_ref = run({"integrator": "rk4", "h": interval / 100})
+    euler, t_euler, n_euler = run({"integrator": "euler", "h": interval / euler_iter})
+    target = np.max(np.abs(euler - ref))
+    logging.info("euler with h = " + str(interval / euler_iter) + ": max error = " + "{0:0.3e}".format(target) +
+                 ", " + "{0:0.2f}".format(t_euler * 1e6) + " us/tick")
+
+    steps = [interval / n for n in range(1, euler_iter + 1)]
+    for integrator in ["semi_implicit", "rk4"]:
+        for h in steps:
+            ys, t, n = run({"integrator": integrator, "h": h})
+            if np.max(np.abs(ys - ref)) <= target:
+                logging.info(integrator + " with h = " + str(h) + ": max error = " +
+                             "{0:0.3e}".format(np.max(np.abs(ys - ref))) + ", " + "{0:0.2f}".format(t * 1e6) +
+                             " us/tick (x" + "{0:0.2f}".format(t_euler / t) + " vs Euler)")
+                break
+        else:
+            logging.info(integrator + ": accuracy of Euler not reached with the tested steps")
+
+    for rtol in [1e-2, 1e-3, 1e-4, 1e-5]:
+        ys, t, n = run({"integrator": "adaptive", "rtol": rtol, "atol": rtol * 1e-2})
+        if np.max(np.abs(ys - ref)) <= target:
+            logging.info("adaptive with rtol = " + str(rtol) + ": max error = " +
+                         "{0:0.3e}".format(np.max(np.abs(ys - ref))) + ", " + "{0:0.2f}".format(t * 1e6) +
+                         " us/tick (x" + "{0:0.2f}".format(t_euler / t) + " vs Euler), " +
+                         "{0:0.2f}".format(n) + " evaluations/tick")
+            break
+    else:
+        logging.info("adaptive: accuracy of Euler not reached with the tested tolerances")
+
+
+if __name__ == '__main__':
 
-        self.n_iter += 1
-        self.logger.debug("Brain " + self.name + " iteration " + str(self.n_iter) + ": State vector: " +
-            str(np.transpose(self.state)))
+    logging.basicConfig(level=logging.INFO)
+    benchmark_integrators()
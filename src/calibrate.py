@@ -0,0 +1,245 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import time
+
+from config import build_config
+
+CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etc",
+                                "calibration.json")
+
+
+class Calibration:
+    """
+    Sweep the logic tic rate and the physics substeps of a config on the reduced-order PlanarModel of the
+    prescreen and recommend the fastest stable setting. Each setting is simulated for sim_time_ seconds and is
+    unstable if a value is not finite, if the mechanical energy grows by more than max_energy_ J per kg of the
+    model (50 J/kg is the kinetic energy of a 10 m/s speed), if a body sinks deeper than max_depth_ in the ground
+    or if a joint opens wider than max_gap_. The cost of a setting is the number of logic ticks per simulated
+    second, each physics substep costing substep_cost_ tick (the physics share of the tick profile divided by
+    the substeps number). As the settings are found without Bullet, they are only applied to the configs which
+    opt in with physics_calibration.
+    Usage:
+            cal = Calibration(root + "/mdl/dog_vert.blend")
+            calibration = cal.sweep("DogVertDefConfig")
+            save_calibration(CALIBRATION_PATH, "DogVertDefConfig", calibration)
+    """
+
+    def __init__(self, model_path_, tic_rates_=(30, 40, 60, 90, 120), substeps_=(1, 2, 4, 8, 16, 32), sim_time_=5.,
+                 max_energy_=50., max_depth_=0.1, max_gap_=0.01, substep_cost_=0.1):
+        """Read the model morphology"""
+
+        from blendfile import get_morphology
+
+        self.model_path = model_path_
+        self.morphology = get_morphology(model_path_)
+        self.tic_rates = sorted(tic_rates_)
+        self.substeps = sorted(substeps_)
+        self.sim_time = sim_time_
+        self.max_energy = max_energy_
+        self.max_depth = max_depth_
+        self.max_gap = max_gap_
+        self.substep_cost = substep_cost_
+
+    def get_cost(self, tic_rate_, substeps_):
+        """Return the relative cost of a simulated second"""
+
+        return tic_rate_ * (1. + self.substep_cost * substeps_)
+
+    def run(self, name_, overrides_, tic_rate_, substeps_):
+        """Simulate a config with a physics setting and return the dict of its stability measures"""
+
+        import numpy as np
+        from prescreen import GRAVITY, PlanarModel, ProxyScene, get_object_names
+        import bge
+        from body import Body
+
+        # The muscles and the body read the tic rate of the game engine when they are created
+        conf = build_config(name_, overrides_)
+        conf.set_physics(tic_rate_, substeps_)
+        conf.logger = logging.getLogger(conf.logger_name)
+        model = PlanarModel(self.morphology, get_object_names(conf), 1, substeps_, tic_rate_)
+        tic_rate = bge.logic.getLogicTicRate()
+        bge.logic.setLogicTicRate(tic_rate_)
+        body = Body(ProxyScene(model, 0), conf)
+        bge.logic.setLogicTicRate(tic_rate)
+
+        # Specific mechanical energy, in J/kg
+        def get_energy():
+            return float(np.sum(0.5 * model.mass * np.sum(model.vel[0] ** 2, axis=1) +
+                                0.5 * model.inertia * model.w[0] ** 2 + model.mass * GRAVITY * model.pos[0, :, 1]) /
+                         np.sum(model.mass))
+
+        t_init = time.time()
+        e_0 = get_energy()
+        measures = {"tic_rate": tic_rate_, "substeps": substeps_, "cost": self.get_cost(tic_rate_, substeps_),
+                    "finite": True, "energy": 0., "depth": 0., "gap": 0., "dist": 0., "n_ticks": 0}
+        for t in range(int(round(self.sim_time * tic_rate_))):
+            body.update()
+            model.step()
+            measures["n_ticks"] += 1
+            if not (np.all(np.isfinite(model.pos)) and np.all(np.isfinite(model.vel)) and
+                    np.all(np.isfinite(model.w))):
+                measures["finite"] = False
+                break
+
+            # Energy growth, depth of the meshes corners in the ground and gap of the joints pivots
+            r = model.rotate(model.th[0, :, np.newaxis], model.corners)
+            measures["energy"] = max(measures["energy"], get_energy() - e_0)
+            measures["depth"] = max(measures["depth"], float(np.max(model.ground - model.pos[0, :, np.newaxis, 1] -
+                                                                    r[..., 1])))
+            if len(model.ja):
+                gap = model.pos[0, model.jb] + model.rotate(model.th[0, model.jb], model.pb) - \
+                    model.pos[0, model.ja] - model.rotate(model.th[0, model.ja], model.pa)
+                measures["gap"] = max(measures["gap"], float(np.max(np.sqrt(np.sum(gap ** 2, axis=1)))))
+
+            # A diverging setting is not simulated further
+            if measures["depth"] > 10 * self.max_depth or measures["gap"] > 10 * self.max_gap:
+                break
+        if measures["finite"]:
+            measures["dist"] = float(body.get_stats()["dist"])
+        measures["time"] = time.time() - t_init
+
+        return measures
+
+    def check(self, measures_):
+        """Return the list of the instability criteria met by the measures of a setting"""
+
+        failed = []
+        if not measures_["finite"]:
+            return ["nan"]
+        if measures_["energy"] > self.max_energy:
+            failed.append("energy")
+        if measures_["depth"] > self.max_depth:
+            failed.append("depth")
+        if measures_["gap"] > self.max_gap:
+            failed.append("gap")
+
+        return failed
+
+    def sweep(self, name_, overrides_=None, full_=False):
+        """Simulate the reference setting, then the other settings by increasing cost until the first stable one.
+        With full_, all the settings are simulated. Return the calibration dict of the config"""
+
+        t_init = time.time()
+        settings = sorted([(r, n) for r in self.tic_rates for n in self.substeps], key=lambda s: self.get_cost(*s))
+        reference = self.run(name_, overrides_, settings[-1][0], settings[-1][1])
+        reference["failed"] = self.check(reference)
+        if reference["failed"]:
+            logging.warning("The reference setting of " + name_ + " is unstable: " + str(reference["failed"]))
+
+        runs = []
+        best = None
+        for tic_rate, substeps in settings[:-1]:
+            measures = self.run(name_, overrides_, tic_rate, substeps)
+            measures["failed"] = self.check(measures)
+            runs.append(measures)
+            logging.info(name_ + " at " + str(tic_rate) + " Hz, " + str(substeps) + " substeps: " +
+                         (", ".join(measures["failed"]) if measures["failed"] else "stable") + " (energy " +
+                         "{0:0.2f}".format(measures["energy"]) + " J/kg, depth " +
+                         "{0:0.3f}".format(measures["depth"]) + " m, gap " + "{0:0.4f}".format(measures["gap"]) +
+                         " m)")
+            if best is None and not measures["failed"]:
+                best = measures
+                if not full_:
+                    break
+        runs.append(reference)
+        if best is None:
+            best = reference
+
+        logging.info("Calibration of " + name_ + " in " + "{0:0.1f}".format(time.time() - t_init) + " sec: " +
+                     str(best["tic_rate"]) + " Hz, " + str(best["substeps"]) + " substeps (x" +
+                     "{0:0.2f}".format(reference["cost"] / best["cost"]) + " faster than the reference)")
+
+        return {"tic_rate": best["tic_rate"], "substeps": best["substeps"], "stable": not best["failed"],
+                "engine": "planar", "model": os.path.basename(self.model_path), "overrides": overrides_ or dict(),
+                "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "runs": runs}
+
+
+def load_calibration(path_=CALIBRATION_PATH):
+    """Return the dict of the calibrations stored in a file, by config name"""
+
+    if not os.path.isfile(path_):
+        return dict()
+    f = open(path_, 'r')
+    calibrations = json.load(f)
+    f.close()
+
+    return calibrations
+
+
+def save_calibration(path_, name_, calibration_):
+    """Store the calibration of a config in a file, with the calibrations of the other configs"""
+
+    calibrations = load_calibration(path_)
+    calibrations[name_] = calibration_
+    f = open(path_, 'w')
+    json.dump(calibrations, f, indent=2, sort_keys=True)
+    f.close()
+
+
+def apply_calibration(config_, name_, path_=CALIBRATION_PATH):
+    """Set the calibrated physics setting of a config when the config opts in with physics_calibration, the
+    calibration is stable and the config does not give its own values. Return the physics dict of the config"""
+
+    if not config_.physics_calibration:
+        return config_.physics
+
+    calibration = load_calibration(path_).get(name_)
+    if calibration is None or not calibration["stable"]:
+        config_.logger.warning("No stable calibration of " + name_ + " in " + path_ + ": physics setting kept")
+    elif calibration.get("engine") != "planar":
+        config_.logger.warning("Calibration of " + name_ + " in " + path_ + " from an unknown engine: physics "
+                               "setting kept")
+    else:
+        config_.logger.warning("Physics setting of " + name_ + " calibrated on the planar model and not on Bullet")
+        config_.set_physics(calibration["tic_rate"] if config_.physics["tic_rate"] is None else None,
+                            calibration["substeps"] if config_.physics["substeps"] is None else None)
+
+    return config_.physics
+
+
+if __name__ == '__main__':
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Sweep the logic tic rate and physics substeps of configs on the "
+                                                 "prescreen model and recommend the fastest stable setting")
+    parser.add_argument("configs", nargs="+", help="Config names")
+    parser.add_argument("-m", "--model", default=root + "/mdl/dog_vert.blend", help="Blender model")
+    parser.add_argument("-r", "--rates", type=float, nargs="+", default=[30, 40, 60, 90, 120],
+                        help="Logic tic rates")
+    parser.add_argument("-s", "--substeps", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                        help="Physics substeps per logic tick")
+    parser.add_argument("-t", "--time", type=float, default=5., help="Simulated time of each setting")
+    parser.add_argument("-e", "--energy", type=float, default=50., help="Maximal energy growth, in J/kg")
+    parser.add_argument("--full", action="store_true", help="Simulate all the settings")
+    parser.add_argument("--save", action="store_true", help="Store the recommended settings in " +
+                        CALIBRATION_PATH + " for the configs which set physics_calibration")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    cal = Calibration(args.model, args.rates, args.substeps, args.time, args.energy)
+    for name in args.configs:
+        calibration = cal.sweep(name, full_=args.full)
+        if args.save:
+            save_calibration(CALIBRATION_PATH, name, calibration)
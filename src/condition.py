@@ -0,0 +1,108 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+class ExitCondition:
+    """
+    Stop condition of a simulation, built once at init from config.exit_condition. The condition is either a
+    python expression of owner, compiled once, or a dict of declarative predicates which are checked without
+    any expression evaluation in the tick loop. Expressions can also use the bge, math and time modules. The
+    simulation stops as soon as one of the predicates is true:
+        - "n_iter": maximum number of iterations
+        - "sim_time": maximum simulated time in seconds
+        - "height": (object name, minimal height), e.g. to stop when the body falls
+        - "dist": maximum traveled distance of the body
+    The object of the height predicate is checked once at init when the scene is given.
+    Usage:
+            exit_cond = ExitCondition({"n_iter": 2500, "height": ("obj_body", -1.8)}, tic_rate, scene, name)
+            # or: exit_cond = ExitCondition("owner['n_iter'] > 500")
+            if exit_cond.check(owner):
+                save()
+    """
+
+    def __init__(self, condition_, tic_rate_=60., scene_=None, name_=""):
+        """Compile the condition and check its objects in the scene of the config name_"""
+
+        self.condition = condition_
+        self.tic_rate = tic_rate_
+        self.code = None
+        self.namespace = None
+        self.tests = []
+
+        if isinstance(condition_, dict):
+            if "n_iter" in condition_:
+                self.max_iter = condition_["n_iter"]
+                self.tests.append(self.check_iter)
+            if "sim_time" in condition_:
+                self.max_iter_time = condition_["sim_time"] * self.tic_rate
+                self.tests.append(self.check_time)
+            if "height" in condition_:
+                self.height_obj, self.min_height = condition_["height"]
+                if scene_ is not None and self.height_obj not in scene_.objects:
+                    raise ValueError("Exit condition of " + str(name_) + ": no object " + str(self.height_obj) +
+                                     " in the scene")
+                self.tests.append(self.check_height)
+            if "dist" in condition_:
+                self.max_dist = condition_["dist"]
+                self.tests.append(self.check_dist)
+            unknown = [k for k in condition_ if k not in ["n_iter", "sim_time", "height", "dist"]]
+            if unknown:
+                raise ValueError("Unknown exit condition predicates: " + str(unknown))
+        else:
+            # Legacy string conditions were evaluated in the scope of main.py: keep its usual modules available
+            import bge
+            import math
+            import time
+            self.code = compile(condition_, "<exit_condition>", "eval")
+            self.namespace = {"bge": bge, "math": math, "time": time}
+
+    def check_iter(self, owner_):
+        """Iteration number predicate"""
+
+        return owner_["n_iter"] > self.max_iter
+
+    def check_time(self, owner_):
+        """Simulated time predicate"""
+
+        return owner_["n_iter"] > self.max_iter_time
+
+    def check_height(self, owner_):
+        """Object height predicate"""
+
+        return owner_["state"].get_position(self.height_obj).z < self.min_height
+
+    def check_dist(self, owner_):
+        """Traveled distance predicate"""
+
+        return owner_["cheesy"].dist > self.max_dist
+
+    def check(self, owner_):
+        """Return True if the simulation has to stop"""
+
+        if self.code is not None:
+            self.namespace["owner"] = owner_
+            return bool(eval(self.code, self.namespace))
+
+        for test in self.tests:
+            if test(owner_):
+                return True
+
+        return False
+
+    def __str__(self):
+
+        return str(self.condition)
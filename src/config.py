@@ -28,20 +28,113 @@ class Config:
         self.sim_speed = 1.0
         self.logger_name = "INFO"
         self.logger = logging.Logger(self.logger_name)
-        self.exit_condition = "owner['n_iter'] > 500"
+        self.exit_condition = {"n_iter": 500}  # dict of predicates or python expression, see ExitCondition
         self.timeout = 10
         self.save_path = "default"
+        self.telemetry = {"level": 0, "size": 10000, "decimation": 1}  # 1: body and brain, 2: also muscles
+        self.trace = {"mode": None, "path": None}  # "record" or "replay" the control signals in a .qct file
+        self.update_periods = {"brain": 1, "power": 1}  # in ticks; muscles are updated at each tick
+        self.brain_output = "hold"  # "hold" the end-of-period brain output or "interpolate" it between two updates
+        self.profile = False  # Per-tick histograms of the game loop phases, summary saved with the results
+        self.cost_report = False  # Time of the brain, muscles and power updates, saved with the results
+        self.physics = {"tic_rate": None, "substeps": None}  # None: calibrated value if opted in, else the .blend one
+        self.physics_calibration = False  # Opt in to the etc/calibration.json setting, found on the planar model
+        self.physics_ref_rate = 60.  # Logic tic rate for which the per-tick parameters are tuned
 
         # Physical parameters
         self.muscle_type = "DampedSpringReducedTorqueMuscle"
+        self.muscle_bank = False  # Use a vectorized bank of all the muscles, with the model of muscle_type
+        self.muscle_tables = False  # Use lookup tables for the force curves of a HillMuscleBank
+        self.force_accumulation = False  # Apply one combined force and torque per object instead of muscle impulses
         self.back_leg_L_muscles = []
         self.back_leg_R_muscles = []
         self.front_leg_L_muscles = []
         self.front_leg_R_muscles = []
+        self.limbs = None  # list of {"name", "muscles"} dicts; by default, the four legs lists and the body muscles
         self.brain = dict()
         self.body = dict()
         self.dist_ref = 20
         self.power_ref = 1000
+        self.genome = None
+        self.genome_params = ["brain.tau", "brain.T", "brain.b", "brain.c", "brain.aa", "muscles.k", "muscles.c",
+                              "muscles.kc", "muscles.kl0"]  # parameter scaled by each gene
+
+    def apply_overrides(self, overrides_):
+        """Overwrite config parameters with the values given in a dict. Dict parameters such as brain or body
+        are merged key by key so that a single entry can be changed without repeating the others. Physics
+        settings are applied with set_physics()"""
+
+        for key in overrides_:
+            value = overrides_[key]
+            if key == "physics":
+                continue
+            if isinstance(value, dict) and isinstance(getattr(self, key, None), dict):
+                getattr(self, key).update(value)
+            else:
+                setattr(self, key, value)
+
+        # Physics last, as it rescales the per-tick parameters
+        if "physics" in overrides_:
+            self.set_physics(overrides_["physics"].get("tic_rate"), overrides_["physics"].get("substeps"))
+
+    def set_physics(self, tic_rate_=None, substeps_=None):
+        """Set the logic tic rate and the physics substeps. The brain time interval and the iterations number of the
+        exit condition are per tick: they are rescaled from the current tic rate so that the simulated time of the
+        brain and of the simulation stay the same"""
+
+        if tic_rate_ is not None:
+            ratio = float(tic_rate_) / (self.physics["tic_rate"] or self.physics_ref_rate)
+            if "time_interval" in self.brain:
+                self.brain["time_interval"] /= ratio
+            if isinstance(self.exit_condition, dict) and "n_iter" in self.exit_condition:
+                self.exit_condition["n_iter"] = int(round(self.exit_condition["n_iter"] * ratio))
+            self.physics["tic_rate"] = float(tic_rate_)
+        if substeps_ is not None:
+            self.physics["substeps"] = int(substeps_)
+
+    def apply_genome(self, genome_):
+        """Scale the parameters of genome_params by the genes of a genome. A gene g in [0, 1] multiplies its brain
+        parameter, or this parameter of all the muscles, by 2 ** (2 g - 1): from 1/2 to 2, a gene of 0.5 keeping
+        the config value"""
+
+        if len(genome_) != len(self.genome_params):
+            raise ValueError("The genome has " + str(len(genome_)) + " genes but " + str(len(self.genome_params)) +
+                             " are expected: " + str(self.genome_params))
+
+        for gene, name in zip(genome_, self.genome_params):
+            factor = 2.0 ** (2 * float(gene) - 1)
+            group, key = name.split(".")
+            if group == "brain":
+                self.brain[key] = self.brain[key] * factor
+            elif group == "muscles":
+                for m in self.get_muscles_config():
+                    if key in m:
+                        m[key] = m[key] * factor
+            else:
+                raise ValueError("Unknown genome parameter " + name)
+        self.genome = genome_
+
+    def get_limbs(self):
+        """Return the limb graph of the body: a list of limbs, each one being a dict with a name and a list of
+        muscles parameters dicts. Muscles with a brain_sig key are driven by this brain channel"""
+
+        if self.limbs is not None:
+            return self.limbs
+
+        return [{"name": "back_leg_L", "muscles": self.back_leg_L_muscles},
+                {"name": "back_leg_R", "muscles": self.back_leg_R_muscles},
+                {"name": "front_leg_L", "muscles": self.front_leg_L_muscles},
+                {"name": "front_leg_R", "muscles": self.front_leg_R_muscles},
+                {"name": "body", "muscles": self.body.get("muscles", [])}]
+
+    def get_muscles_config(self):
+        """Return the list of the parameters dicts of the muscles of all limbs"""
+
+        muscles = []
+        for limb in self.get_limbs():
+            muscles += limb["muscles"]
+
+        return muscles
 
     def get_params_list(self):
         """Return a list including all the parameters that can be changed to tune the controller model"""
@@ -85,7 +178,7 @@ class DogDefConfig(Config):
         self.muscle_type = "DampedSpringMuscle"
         self.name = "default_dog_simulation_config"
         self.sim_speed = 1.0
-        self.exit_condition = "bge.logic.getCurrentScene().objects['obj_body'].worldPosition.z < -1.8"
+        self.exit_condition = {"height": ("obj_body", -1.8)}
 
         # Back legs
         BL_biceps = {"name": "B_biceps.L", "logger": "INFO", "obj_1": "obj_body", "obj_2": "obj_shin.L",
@@ -133,7 +226,8 @@ class DogDefConfig(Config):
 
         # Brain
         self.brain = {"name": "default_dog_matsuoka_brain", "n_osc": 4, "h": 1e-3, "tau": 1e-2,
-                      "T": 5e-2, "a": 10.5, "b": 20.5, "c": 0.08, "aa": 3, "time_interval": 1e-3}
+                      "T": 5e-2, "a": 10.5, "b": 20.5, "c": 0.08, "aa": 3, "time_interval": 1e-3,
+                      "integrator": "euler", "cache": False}
 
         # Body
         neck1 = {"name": "muscle_neck1", "logger": "INFO", "obj_1": "obj_body", "obj_2": "obj_head",
@@ -178,7 +272,7 @@ class DogVertDefConfig(Config):
         self.muscle_type = "DampedSpringMuscle"
         self.name = "default_dog_vert_simulation_config"
         self.sim_speed = 1.0
-        self.exit_condition = "owner['n_iter'] > 2500"  # "bge.logic.getCurrentScene().objects['obj_body.B'].worldPosition.z < -1.8"
+        self.exit_condition = {"n_iter": 2500}  # {"height": ("obj_body.B", -1.8)}
 
         # Back legs
         BL_biceps = {"name": "B_biceps.L", "logger": "INFO", "obj_1": "obj_body.B", "obj_2": "obj_shin.L",
@@ -226,7 +320,8 @@ class DogVertDefConfig(Config):
 
         # Brain
         self.brain = {"name": "default_dog_matsuoka_brain", "n_osc": 4, "h": 1e-3, "tau": 1e-2,
-                      "T": 5e-2, "a": 10.5, "b": 20.5, "c": 0.08, "aa": 3, "time_interval": 1e-3}
+                      "T": 5e-2, "a": 10.5, "b": 20.5, "c": 0.08, "aa": 3, "time_interval": 1e-3,
+                      "integrator": "euler", "cache": False}
 
         # Body
         neck1 = {"name": "muscle_neck1", "logger": "INFO", "obj_1": "obj_body", "obj_2": "obj_head",
@@ -316,7 +411,7 @@ class MouseDefConfig(Config):
         Config.__init__(self)
         self.name = "default_cheesy_simulation_config"
         self.sim_speed = 1.0
-        self.exit_condition = "bge.logic.getCurrentScene().objects['obj_spine'].worldPosition.z < -1.8"
+        self.exit_condition = {"height": ("obj_spine", -1.8)}
 
         # Back legs muscles
         BL_biceps = {"name": "B_biceps.L", "logger": "INFO", "obj_1": "obj_hips", "obj_2": "obj_shin.L",
@@ -370,7 +465,8 @@ class MouseDefConfig(Config):
 
         # Brain
         self.brain = {"name": "default_dog_matsuoka_brain", "n_osc": 4, "h": 1e-3, "tau": 1e-2,
-                      "T": 5e-2, "a": 10.5, "b": 20.5, "c": 0.08, "aa": 3, "time_interval": 1e-3}
+                      "T": 5e-2, "a": 10.5, "b": 20.5, "c": 0.08, "aa": 3, "time_interval": 1e-3,
+                      "integrator": "euler", "cache": False}
 
         # Body
         neck1 = {"name": "muscle_neck1", "logger": "INFO", "obj_1": "obj_body", "obj_2": "obj_head",
@@ -401,4 +497,16 @@ class MouseDefConfig(Config):
         liste += [self.brain["n_osc"], self.brain["h"], self.brain["tau"], self.brain["T"], self.brain["a"],
                   self.brain["b"], self.brain["c"], self.brain["aa"], self.brain["time_interval"]]
 
-        return liste
\ No newline at end of file
+        return liste
+
+
+def build_config(name_, overrides_=None, genome_=None):
+    """Create a config given its class name, with optional parameters overrides and genome"""
+
+    configuration = globals()[name_]()
+    if overrides_:
+        configuration.apply_overrides(overrides_)
+    if genome_ is not None:
+        configuration.apply_genome(genome_)
+
+    return configuration
@@ -0,0 +1,115 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+import numpy as np
+from mathutils import Vector as vec
+
+
+class ForceAccumulator:
+    """
+    Per rigid body accumulation of the muscle actions of a time-step. Muscles add their forces at their world
+    application points (or at the center of mass) and their torques; each object then receives one combined
+    force and one combined torque about its center of mass with a single applyForce() and applyTorque() call.
+    Impulses are converted to the force applied during one logic tick. Objects are the ones of a SceneState and
+    lever arms are taken from its snapshot.
+    Usage:
+            forces = ForceAccumulator(state, bge.logic.getLogicTicRate())
+            forces.add_force(i, force, point)
+
+            # Once all muscles are updated
+            forces.apply()
+    """
+
+    def __init__(self, state_, tic_rate_):
+        """Class initialization"""
+
+        self.state = state_
+        self.tic_rate = float(tic_rate_)
+        self.forces = []
+        self.torques = []
+        self.touched = []
+        self.n_objects = 0
+        self.n_applied = 0
+
+    def resize(self):
+        """Add the accumulators of the objects registered in the scene state since the last call"""
+
+        while self.n_objects < self.state.n_objects:
+            self.forces.append(vec((0.0, 0.0, 0.0)))
+            self.torques.append(vec((0.0, 0.0, 0.0)))
+            self.touched.append(False)
+            self.n_objects += 1
+
+    def add_force(self, i_, force_, point_=None):
+        """Add a force applied on object i_ during the time-step, at a world point or at the center of mass"""
+
+        if i_ >= self.n_objects:
+            self.resize()
+        self.forces[i_] += force_
+        if point_ is not None:
+            self.torques[i_] += (point_ - self.state.positions[i_]).cross(force_)
+        self.touched[i_] = True
+
+    def add_impulse(self, i_, impulse_, point_=None):
+        """Add an impulse applied on object i_, as the force which gives it during the time-step"""
+
+        self.add_force(i_, impulse_ * self.tic_rate, point_)
+
+    def add_torque(self, i_, torque_):
+        """Add a torque applied on object i_ during the time-step"""
+
+        if i_ >= self.n_objects:
+            self.resize()
+        self.torques[i_] += torque_
+        self.touched[i_] = True
+
+    def add_forces(self, index_, forces_, points_=None, torques_=None):
+        """Add the (m, 3) forces applied at the (m, 3) world points (or at the center of mass) of the objects
+        index_ (m), and optional (m, 3) torques. Contributions are summed per object with NumPy before being added
+        to the accumulators"""
+
+        if len(index_) == 0:
+            return
+
+        self.resize()
+        torques = np.zeros(forces_.shape)
+        if points_ is not None:
+            rot, pos, lin_vel, ang_vel = self.state.get_arrays()
+            torques += np.cross(points_ - pos[index_], forces_)
+        if torques_ is not None:
+            torques += torques_
+        force_sum = np.array([np.bincount(index_, forces_[:, k], self.n_objects) for k in range(3)]).T
+        torque_sum = np.array([np.bincount(index_, torques[:, k], self.n_objects) for k in range(3)]).T
+        for i in np.unique(index_).tolist():
+            self.forces[i] += vec(force_sum[i].tolist())
+            self.torques[i] += vec(torque_sum[i].tolist())
+            self.touched[i] = True
+
+    def apply(self):
+        """Apply the combined force and torque of each object which received muscle actions and reset the
+        accumulators"""
+
+        for i in range(self.n_objects):
+            if self.touched[i]:
+                obj = self.state.objects[i]
+                obj.applyForce(self.forces[i], False)
+                obj.applyTorque(self.torques[i], False)
+                self.forces[i].zero()
+                self.torques[i].zero()
+                self.touched[i] = False
+                self.n_applied += 1
@@ -23,37 +23,57 @@ import time
 
 import bge
 
+# Time reference of the Blender side phase timings
+t_start = time.time()
+
 root = os.path.dirname(os.path.dirname(bge.logic.expandPath("//")))
 src = root + "/src/"
 sys.path.append(src)
 
 from body import *
+from calibrate import apply_calibration
+from condition import ExitCondition
 from config import *
+from payload import read_payload
+from profiler import PhaseTimer
+
+# Profile the startup phases before the first tick
+startup = PhaseTimer(t_start)
+startup.lap("imports")
 
 
 # Get BGE handles
 scene = bge.logic.getCurrentScene()
 
 if sys.argv[len(sys.argv) - 1] == "FROM_START.PY":
-    # Catch command-line config when started from another script
+    # Catch the payload file written by the script which started the simulation
     argv = sys.argv
-    argv = eval(argv[argv.index("-") + 1])
-    CONFIG_NAME = argv["config_name"]
-    LOG_FILE = argv["logfile"]
-    SAVE_NAME = argv["filename"]
+    payload = read_payload(argv[argv.index("-") + 1])
+    CONFIG_NAME = payload["config_name"]
+    CONFIG_OVERRIDES = payload["config"]
+    GENOME = payload["genome"]
+    LOG_FILE = payload["logfile"]
+    SAVE_NAME = payload["filename"]
+    T_SPAWN = payload["t_spawn"]
 else:
     # Default config when started directly from Blender
-    CONFIG_NAME = "DogVertDefConfig()"
+    CONFIG_NAME = "DogVertDefConfig"
+    CONFIG_OVERRIDES = dict()
+    GENOME = None
+    T_SPAWN = None
     LOG_FILE = os.getenv("HOME") + "/.log/qSim.log"
     dirname = root + "/save"
     filename = "sim_" + datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S") + ".qsm"
     if not os.path.exists(dirname):
         os.makedirs(dirname)
     SAVE_NAME = dirname + "/" + filename
+startup.lap("payload")
 
 # Create python controller
 global owner
-owner = {"n_iter": 0, "t_init": time.time()}
+owner = {"n_iter": 0, "t_init": time.time(), "timings": dict()}
+if T_SPAWN is not None:
+    owner["timings"]["load"] = t_start - T_SPAWN
 
 # Create Logger and configuration
 if not os.path.exists(os.path.dirname(LOG_FILE)):
@@ -62,15 +82,29 @@ if not os.path.exists(LOG_FILE):
     f = open(LOG_FILE, 'w')
     f.close()
 
-configuration = eval(CONFIG_NAME)
+configuration = build_config(CONFIG_NAME, CONFIG_OVERRIDES, GENOME)
+startup.lap("config")
 logging.config.fileConfig(root + "/etc/logging.conf",
                           defaults={'logfilename': LOG_FILE, 'simLevel': "DEBUG"})
 logger = logging.getLogger(configuration.logger_name)
 configuration.logger = logger
 configuration.save_path = SAVE_NAME
+startup.lap("logging")
+
+# Apply the physics setting of the config, or of its calibration if opted in, before the muscles read the tic rate
+physics = apply_calibration(configuration, CONFIG_NAME, root + "/etc/calibration.json")
+if physics["tic_rate"] is not None:
+    bge.logic.setLogicTicRate(physics["tic_rate"])
+    bge.logic.setPhysicsTicRate(physics["tic_rate"])
+if physics["substeps"] is not None:
+    bge.constraints.setNumTimeSubSteps(physics["substeps"])
+logger.debug("Physics setting: " + str(physics))
 
 owner["config"] = configuration
 owner["cheesy"] = Body(scene, configuration)
+owner["state"] = owner["cheesy"].state
+owner["exit"] = ExitCondition(configuration.exit_condition, bge.logic.getLogicTicRate(), scene, CONFIG_NAME)
+startup.lap("body")
 
 # Advertise simulation has begun
 logger.info("####################################")
@@ -82,3 +116,10 @@ logger.info("####################################\n")
 
 # Set simulation parameters
 bge.logic.setTimeScale(configuration.sim_speed)
+startup.lap("setup")
+
+# Init phase is over: the ticks phase starts now
+owner["timings"]["init"] = startup.get_total()
+owner["timings"]["startup"] = startup.get_phases()
+logger.info("Startup phases: " + str(startup))
+owner["t_ticks"] = time.time()
@@ -16,6 +16,7 @@
 
 
 import logging
+import os
 import time
 import pickle
 import bge
@@ -30,27 +31,55 @@ def save():
     global pickle
     """Save te simulation results"""
 
+    t_save = time.time()
+    owner["timings"]["ticks"] = t_save - owner["t_ticks"]
+    owner["timings"]["n_ticks"] = owner["n_iter"]
+
+    telemetry = owner["cheesy"].save_telemetry(os.path.splitext(owner["config"].save_path)[0] + "_telemetry.npz")
+    trace = owner["cheesy"].save_trace()
+
+    profile = None
+    if owner["cheesy"].profiler is not None:
+        profile = owner["cheesy"].profiler.get_summary()
+        owner["config"].logger.info("Tick profile: " + str(owner["cheesy"].profiler))
+
+    # The results file dump itself is accounted in the shutdown phase by BlenderSim
+    owner["timings"]["save"] = time.time() - t_save
     f = open(owner["config"].save_path, 'wb')
-    pickle.dump([owner["config"], time.time()], f)
+    pickle.dump({"config": owner["config"], "t_end": time.time(), "timings": owner["timings"],
+                 "stats": owner["cheesy"].get_stats(), "telemetry": telemetry,
+                 "trace": trace, "costs": owner["cheesy"].get_costs(), "profile": profile}, f)
     f.close()
 
 
 # Time-step update instructions
+profiler = owner["cheesy"].profiler
+if profiler is not None:
+    profiler.start_tick(time.time())
 owner["cheesy"].update()
 
 # DEBUG control and display
 owner["n_iter"] += 1
-owner["config"].logger.debug("Main iteration " + str(owner["n_iter"]) + ": stop state = " +
-          str(eval(owner["config"].exit_condition)))
-owner["config"].logger.debug("[Interruption: exit = " + str(eval(owner["config"].exit_condition)) +
-          " sim time = " + str(time.time() - owner["t_init"]) + " timeout = " + str(owner["config"].timeout))
+if profiler is not None:
+    t_exit = time.time()
+    stop = owner["exit"].check(owner)
+    profiler.add("exit", time.time() - t_exit)
+else:
+    stop = owner["exit"].check(owner)
+if owner["config"].logger.isEnabledFor(logging.DEBUG):
+    owner["config"].logger.debug("Main iteration " + str(owner["n_iter"]) + ": stop state = " + str(stop))
+    owner["config"].logger.debug("[Interruption: exit = " + str(stop) + " sim time = " +
+                                 str(time.time() - owner["t_init"]) + " timeout = " + str(owner["config"].timeout))
 
 # Simulation interruption
-if eval(owner["config"].exit_condition) \
+if stop \
         or bge.logic.KX_INPUT_ACTIVE == keyboard.events[bge.events.SPACEKEY] \
         or time.time() - owner["t_init"] > owner["config"].timeout:
     # save config
     save()
 
     # exit
-    controller.activate(exit_actuator)
\ No newline at end of file
+    controller.activate(exit_actuator)
+
+if profiler is not None:
+    profiler.end_tick(time.time())
@@ -0,0 +1,208 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+import math
+import types
+
+from mathutils import Matrix, Vector
+
+
+class GameObject:
+    """
+    Stand-in for a KX_GameObject of the Blender Game Engine. It is a point mass with a fixed orientation:
+    impulses change its linear and angular velocities at once, forces and torques are accumulated and applied at
+    the next step of the scene, as in the game engine. This is enough to exercise and time the controller code,
+    not to reproduce Bullet dynamics.
+    Usage:
+            obj = GameObject("obj_body", (0, 0, 1))
+            obj.applyImpulse(obj.worldPosition, (0, 0, 1))
+            obj.step(1 / 60.)
+    """
+
+    def __init__(self, name_, position_=(0.0, 0.0, 0.0), mass_=1.0, orientation_=None):
+        """Class initialization"""
+
+        self.name = name_
+        self.mass = mass_
+        self.worldPosition = Vector(position_)
+        self.worldLinearVelocity = Vector((0.0, 0.0, 0.0))
+        self.worldAngularVelocity = Vector((0.0, 0.0, 0.0))
+        if orientation_ is None:
+            orientation_ = ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0))
+        self.rot = [list(row) for row in orientation_]
+        self.force = Vector((0.0, 0.0, 0.0))
+        self.torque = Vector((0.0, 0.0, 0.0))
+
+    @property
+    def worldOrientation(self):
+
+        return Matrix(self.rot)
+
+    @property
+    def worldTransform(self):
+
+        p = self.worldPosition
+
+        return Matrix([self.rot[0] + [p[0]], self.rot[1] + [p[1]], self.rot[2] + [p[2]], [0.0, 0.0, 0.0, 1.0]])
+
+    def getVelocity(self, point_=(0.0, 0.0, 0.0)):
+        """Return the world velocity of a point given in local coordinates"""
+
+        return self.worldLinearVelocity + self.worldAngularVelocity.cross(self.worldOrientation * Vector(point_))
+
+    def applyImpulse(self, point_, impulse_, local_=False):
+        """Apply an impulse on a point given in world coordinates"""
+
+        impulse = Vector(impulse_)
+        self.worldLinearVelocity = self.worldLinearVelocity + impulse / self.mass
+        self.worldAngularVelocity = self.worldAngularVelocity + \
+            (Vector(point_) - self.worldPosition).cross(impulse) / self.mass
+
+    def applyForce(self, force_, local_=False):
+        """Add a force applied in the center of mass until the next step"""
+
+        self.force = self.force + Vector(force_)
+
+    def applyTorque(self, torque_, local_=False):
+        """Add a torque until the next step"""
+
+        self.torque = self.torque + Vector(torque_)
+
+    def step(self, dt_, gravity_=(0.0, 0.0, -9.81)):
+        """Integrate the motion during dt_ and clear the accumulated force and torque"""
+
+        self.worldLinearVelocity = self.worldLinearVelocity + (self.force / self.mass + Vector(gravity_)) * dt_
+        self.worldAngularVelocity = self.worldAngularVelocity + self.torque / self.mass * dt_
+        self.worldPosition = self.worldPosition + self.worldLinearVelocity * dt_
+        self.force = Vector((0.0, 0.0, 0.0))
+        self.torque = Vector((0.0, 0.0, 0.0))
+
+
+class ObjectList(list):
+    """List of game objects which can also be indexed by name, as KX_Scene.objects"""
+
+    def __contains__(self, name_):
+
+        for obj in list.__iter__(self):
+            if obj.name == name_:
+                return True
+
+        return False
+
+    def __getitem__(self, key_):
+
+        if isinstance(key_, str):
+            for obj in list.__iter__(self):
+                if obj.name == key_:
+                    return obj
+            raise KeyError(key_)
+
+        return list.__getitem__(self, key_)
+
+
+class Scene:
+    """
+    Stand-in for a KX_Scene. step() advances all the objects by one logic tick and keeps them above a ground plane
+    Usage:
+            scene = make_scene(config)
+            body.update()
+            scene.step()
+    """
+
+    def __init__(self, objects_, ground_=-2.0):
+        """Class initialization"""
+
+        self.name = "Scene"
+        self.objects = ObjectList(objects_)
+        self.ground = ground_
+
+    def step(self, dt_=None):
+        """Advance the scene by dt_ seconds or one logic tick"""
+
+        if dt_ is None:
+            dt_ = 1.0 / logic.getLogicTicRate()
+        for obj in self.objects:
+            obj.step(dt_)
+            if obj.worldPosition[2] < self.ground:
+                obj.worldPosition[2] = self.ground
+                obj.worldLinearVelocity[2] = max(0.0, obj.worldLinearVelocity[2])
+
+
+class Controller:
+    """Stand-in for the python controller of the simulation with its quit actuator"""
+
+    def __init__(self):
+        """Class initialization"""
+
+        self.actuators = {"quit_game": "quit_game"}
+        self.activated = []
+
+    def activate(self, actuator_):
+
+        self.activated.append(actuator_)
+
+
+def make_scene(config_, spacing_=0.3, mass_=20.0):
+    """Create and set as current a scene with one game object per object name used by the body and the muscles
+    of a config. Objects are spread on a line, one unit above the origin, so that all muscles have a non null
+    length. The default mass keeps the explicit integration of the stiffest shipped muscles stable"""
+
+    names = set([config_.body["obj"]])
+    for m in config_.get_muscles_config():
+        names.add(m["obj_1"])
+        names.add(m["obj_2"])
+    objects = [GameObject(name, (i * spacing_, 0.1 * (i % 3), 1.0 + 0.05 * i), mass_)
+               for i, name in enumerate(sorted(names))]
+    scene = Scene(objects)
+    logic.scene = scene
+
+    return scene
+
+
+# bge.logic
+logic = types.ModuleType("logic")
+logic.KX_INPUT_ACTIVE = 2
+logic.tic_rate = 60.0
+logic.physics_tic_rate = 60.0
+logic.time_scale = 1.0
+logic.scene = None
+logic.controller = Controller()
+logic.keyboard = types.ModuleType("keyboard")
+logic.keyboard.events = {32: 0}
+logic.getLogicTicRate = lambda: logic.tic_rate
+logic.setLogicTicRate = lambda rate_: setattr(logic, "tic_rate", float(rate_))
+logic.getPhysicsTicRate = lambda: logic.physics_tic_rate
+logic.setPhysicsTicRate = lambda rate_: setattr(logic, "physics_tic_rate", float(rate_))
+logic.setTimeScale = lambda scale_: setattr(logic, "time_scale", scale_)
+logic.getCurrentScene = lambda: logic.scene
+logic.getCurrentController = lambda: logic.controller
+logic.expandPath = lambda path_: path_
+
+# bge.constraints
+constraints = types.ModuleType("constraints")
+constraints.substeps = 1
+constraints.getNumTimeSubSteps = lambda: constraints.substeps
+constraints.setNumTimeSubSteps = lambda substeps_: setattr(constraints, "substeps", int(substeps_))
+
+# bge.render
+render = types.ModuleType("render")
+render.drawLine = lambda from_, to_, color_: None
+
+# bge.events
+events = types.ModuleType("events")
+events.SPACEKEY = 32
@@ -0,0 +1,207 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+import math
+
+
+class Vector:
+    """
+    Pure python stand-in for the mathutils.Vector of Blender 2.77, used to run the controller outside Blender.
+    As in Blender 2.77, the product of two vectors is their dot product.
+    Usage:
+            v = Vector((1, 0, 0))
+            l = (v - Vector((0, 1, 0))).length
+    """
+
+    __slots__ = ["v"]
+
+    def __init__(self, seq_=(0.0, 0.0, 0.0)):
+        """Class initialization"""
+
+        self.v = [float(x) for x in seq_]
+
+    def __len__(self):
+
+        return len(self.v)
+
+    def __iter__(self):
+
+        return iter(self.v)
+
+    def __getitem__(self, i_):
+
+        return self.v[i_]
+
+    def __setitem__(self, i_, value_):
+
+        self.v[i_] = float(value_)
+
+    def __repr__(self):
+
+        return "Vector(" + str(tuple(self.v)) + ")"
+
+    def __eq__(self, other_):
+
+        return list(self) == list(other_)
+
+    def __ne__(self, other_):
+
+        return not self.__eq__(other_)
+
+    @property
+    def x(self):
+
+        return self.v[0]
+
+    @property
+    def y(self):
+
+        return self.v[1]
+
+    @property
+    def z(self):
+
+        return self.v[2]
+
+    @property
+    def length(self):
+
+        return math.sqrt(self.dot(self))
+
+    def __add__(self, other_):
+
+        return Vector([a + b for a, b in zip(self.v, other_)])
+
+    def __sub__(self, other_):
+
+        return Vector([a - b for a, b in zip(self.v, other_)])
+
+    def __neg__(self):
+
+        return Vector([- a for a in self.v])
+
+    def __mul__(self, other_):
+
+        if isinstance(other_, Vector):
+            return self.dot(other_)
+
+        return Vector([a * other_ for a in self.v])
+
+    def __rmul__(self, other_):
+
+        return self.__mul__(other_)
+
+    def __truediv__(self, other_):
+
+        return Vector([a / other_ for a in self.v])
+
+    __div__ = __truediv__
+
+    def dot(self, other_):
+        """Return the dot product with another vector"""
+
+        return sum([a * b for a, b in zip(self.v, other_)])
+
+    def cross(self, other_):
+        """Return the cross product with another 3D vector"""
+
+        a = self.v
+        b = list(other_)
+
+        return Vector((a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]))
+
+    def zero(self):
+        """Set all values to zero in place"""
+
+        self.v = [0.0] * len(self.v)
+
+    def normalized(self):
+        """Return a unit vector with the same direction, or a copy of a null vector"""
+
+        length = self.length
+        if length == 0.0:
+            return Vector(self.v)
+
+        return Vector([a / length for a in self.v])
+
+    def copy(self):
+        """Return a copy of the vector"""
+
+        return Vector(self.v)
+
+
+class Matrix:
+    """
+    Pure python stand-in for the mathutils.Matrix of Blender 2.77. A 4x4 matrix multiplied by a 3D vector applies
+    the affine transformation, as worldTransform * point does in Blender.
+    Usage:
+            m = Matrix(((1, 0, 0, 1), (0, 1, 0, 0), (0, 0, 1, 0), (0, 0, 0, 1)))
+            p = m * Vector((0, 0, 0))
+    """
+
+    __slots__ = ["rows"]
+
+    def __init__(self, rows_=None):
+        """Class initialization. The identity 4x4 matrix is created by default"""
+
+        if rows_ is None:
+            rows_ = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+        self.rows = [[float(x) for x in row] for row in rows_]
+
+    def __len__(self):
+
+        return len(self.rows)
+
+    def __iter__(self):
+
+        return iter([Vector(row) for row in self.rows])
+
+    def __getitem__(self, i_):
+
+        return Vector(self.rows[i_])
+
+    def __repr__(self):
+
+        return "Matrix(" + str(tuple([tuple(row) for row in self.rows])) + ")"
+
+    def __mul__(self, other_):
+
+        if isinstance(other_, Matrix):
+            cols = list(zip(*other_.rows))
+            return Matrix([[sum([a * b for a, b in zip(row, col)]) for col in cols] for row in self.rows])
+
+        p = list(other_)
+        if len(self.rows) == 4 and len(p) == 3:
+            return Vector([row[0] * p[0] + row[1] * p[1] + row[2] * p[2] + row[3] for row in self.rows[:3]])
+
+        return Vector([sum([a * b for a, b in zip(row, p)]) for row in self.rows])
+
+    def to_3x3(self):
+        """Return the upper left 3x3 part of the matrix"""
+
+        return Matrix([row[:3] for row in self.rows[:3]])
+
+    def copy(self):
+        """Return a copy of the matrix"""
+
+        return Matrix(self.rows)
+
+    def transposed(self):
+        """Return the transposed matrix"""
+
+        return Matrix([list(col) for col in zip(*self.rows)])
@@ -17,35 +17,43 @@
 
 import logging
 import math
+import numpy as np
 from mathutils import Vector as vec
 
 import bge
+from state import SceneState
 
 
 class Muscle:
-    def __init__(self, scene_, params_):
-        """Class initialization"""
+    def __init__(self, scene_, params_, state_=None):
+        """Class initialization. If a SceneState is given, the extremity objects are read from its per time-step
+        snapshot"""
         self.n_iter = 0
         self.scene = scene_
         self.params = params_
         self.name = self.params["name"]
         self.active = True
+        self.state = None
+        self.forces = None
+        self.live_velocities = False
+        self.tic_rate = bge.logic.getLogicTicRate()
+        objects = self.scene.objects
 
         self.logger = logging.getLogger(params_["logger"])
 
         # Check if onject exist
-        if not self.params["obj_1"] in self.scene.objects:
+        if not self.params["obj_1"] in objects:
             self.logger.error("Muscle " + self.name + " deactivated: first extremity object doesn't exit." +
                   " Check your configuration file!")
             self.active = False
         else:
-            self.obj1 = self.scene.objects[self.params["obj_1"]]
-        if not self.params["obj_2"] in self.scene.objects:
+            self.obj1 = objects[self.params["obj_1"]]
+        if not self.params["obj_2"] in objects:
             self.logger.error("Muscle " + self.name + " deactivated: second extremity object doesn't exit." +
                 " Check your configuration file!")
             self.active = False
         else:
-            self.obj2 = self.scene.objects[self.params["obj_2"]]
+            self.obj2 = objects[self.params["obj_2"]]
 
         # Points of application in local coordinates
         if self.params["anch_1"] is None:
@@ -63,6 +71,40 @@ class Muscle:
             self.app_point_1_world = self.obj1.worldTransform * self.app_point_1  # global coordinates of app point 1 in m
             self.app_point_2_world = self.obj2.worldTransform * self.app_point_2  # global coordinates of app point 2 in m
 
+        # Register extremity objects in the scene state
+        if self.active and state_ is not None:
+            self.state = state_
+            self.state_1 = self.state.register(self.obj1)
+            self.state_2 = self.state.register(self.obj2)
+
+    def get_app_points(self):
+        """Return the world coordinates of the two application points"""
+
+        if self.state is not None:
+            return self.state.get_point(self.state_1, self.app_point_1), \
+                self.state.get_point(self.state_2, self.app_point_2)
+
+        return self.obj1.worldTransform * self.app_point_1, self.obj2.worldTransform * self.app_point_2
+
+    def get_app_velocities(self):
+        """Return the world velocities of the two application points. Muscles with live_velocities which apply
+        their impulses directly read them from the game engine, after the impulses of the muscles updated before
+        them in the time-step; otherwise they are read from the scene state snapshot"""
+
+        if self.state is not None and not (self.live_velocities and self.forces is None):
+            return self.state.get_velocity(self.state_1, self.app_point_1), \
+                self.state.get_velocity(self.state_2, self.app_point_2)
+
+        return self.obj1.getVelocity(self.app_point_1), self.obj2.getVelocity(self.app_point_2)
+
+    def get_positions(self):
+        """Return the world positions of the two extremity objects"""
+
+        if self.state is not None:
+            return self.state.positions[self.state_1], self.state.positions[self.state_2]
+
+        return self.obj1.worldPosition, self.obj2.worldPosition
+
     def get_power(self):
         """Return the power developped by the muscle on the two extremity objects"""
 
@@ -81,11 +123,11 @@ class Muscle:
 class HillMuscle(Muscle):
     """This class implements Hill Model for muscle force """
 
-    def __init__(self, scene_, params_):
+    def __init__(self, scene_, params_, state_=None):
         """Class initialization. Parameters can be found in D.F.B. Haeufle, M. Günther, A. Bayer, S. Schmitt (2014) \
         Hill-type muscle model with serial damping and eccentric force-velocity relation. Journal of Biomechanics"""
 
-        Muscle.__init__(self, scene_, params_)
+        Muscle.__init__(self, scene_, params_, state_)
 
         # Contractile Element (CE)
         self.CE_F_max = 1420  # F_max in [N] for Extensor (Kistemaker et al., 2006)
@@ -243,10 +285,11 @@ class HillMuscle(Muscle):
 class DampedSpringMuscle(Muscle):
     """This class implements a simple muscle composed by a spring and a damping in parallel"""
 
-    def __init__(self, scene_, params_):
+    def __init__(self, scene_, params_, state_=None):
         """Class initialization. Requires scene, controller as well as two object and the local point of application \
         of the spring forces"""
-        Muscle.__init__(self, scene_, params_)
+        Muscle.__init__(self, scene_, params_, state_)
+        self.live_velocities = True
 
         # Model constants and variables
         self.k = self.params["k"]  # scalar in N/m??
@@ -272,11 +315,6 @@ class DampedSpringMuscle(Muscle):
             power_2 = self.force * self.v_2
             power = power_2 + power_1
 
-            self.logger.debug("v_1 = " + str(self.v_1.length) + " m/s; v_2 = " + str(self.v_2.length) + \
-                " m/s; F = " + str(self.force.length) + " N")
-            self.logger.debug("power obj1 = " + str(power_1) + " ; power obj2 = " + str(power_2) + \
-                " ; power tot = " + str(power))
-
         return power
 
     def update(self, **kwargs):
@@ -298,33 +336,33 @@ class DampedSpringMuscle(Muscle):
                 self.l_cont = self.l0 * (1 + self.k_cont * self.ctrl_sig)
 
             # get length and velocity
-            self.app_point_1_world = self.obj1.worldTransform * self.app_point_1
-            self.app_point_2_world = self.obj2.worldTransform * self.app_point_2
+            self.app_point_1_world, self.app_point_2_world = self.get_app_points()
             self.l = self.app_point_2_world - self.app_point_1_world
 
             # Damping must be in spring axis direction
-            self.v_1 = self.obj1.getVelocity(self.app_point_1)
-            self.v_2 = self.obj2.getVelocity(self.app_point_2)
+            self.v_1, self.v_2 = self.get_app_velocities()
             v = self.v_2 - self.v_1
-            self.v_norm = v.dot(self.l.normalized()) * self.l.normalized()
-            # print("l: " + str(self.l) + " norm: " + str(self.l.normalized()) + " v = " +  str(v) + "vdot" + str(v.dot(self.l.normalized())) +" vnorm: " + str(self.v_norm))
+            direction = self.l.normalized()
+            self.v_norm = v.dot(direction) * direction
 
             # compute spring force
-            force_s = - (self.k * (self.l.length - self.l_cont)) * self.l.normalized()
+            force_s = - (self.k * (self.l.length - self.l_cont)) * direction
 
             # compute damping force
             force_d = - self.c * self.v_norm
 
             # compute total force
             self.force = force_s + force_d
-            impulse = self.force / bge.logic.getLogicTicRate()
 
-            # apply impusle on an object point only in traction
-            f_type = "Push"
-            if float((self.force * self.l.normalized())) < 0.0:
-                f_type = "Pull"
-                self.obj1.applyImpulse(self.app_point_1_world, - impulse)
-                self.obj2.applyImpulse(self.app_point_2_world, impulse)
+            # apply impusle on an object point only in traction, or add its force to the per-object accumulator
+            if self.force.dot(direction) < 0.0:
+                if self.forces is not None:
+                    self.forces.add_force(self.state_1, - self.force, self.app_point_1_world)
+                    self.forces.add_force(self.state_2, self.force, self.app_point_2_world)
+                else:
+                    impulse = self.force / self.tic_rate
+                    self.obj1.applyImpulse(self.app_point_1_world, - impulse)
+                    self.obj2.applyImpulse(self.app_point_2_world, impulse)
 
             # DEBUG data
             self.draw_muscle()
@@ -332,7 +370,6 @@ class DampedSpringMuscle(Muscle):
 
             #self.logger.debug("Muscle " + self.name + ":" + str(self.n_iter) + ": Ft = " + str(
             #    self.force) + " - " + str(self.force * self.l.normalized()) + "N")
-            #self.logger.debug("  Type = " + f_type)
             #self.logger.debug("  Fs = " + str(force_s) + " ;  Fd = " + str(force_d))
             #self.logger.debug("  l = " + str(self.l) + " ; l0 = " + str(self.l0))
             #self.logger.debug("  L P1 = " + str(self.app_point_1) + " ; L P2 = " + str(self.app_point_2))
@@ -349,11 +386,11 @@ class DampedSpringReducedTorqueMuscle(Muscle):
     Forces and torques applied in the center of gravity are computed separately and a reduction\
     factor is added to torque to stabilise the process"""
 
-    def __init__(self, scene_, params_):
+    def __init__(self, scene_, params_, state_=None):
         """Class initialization. Requires scene, controller as well as two object and the local point of application \
         of the spring forces"""
 
-        Muscle.__init__(self, scene_, params_)
+        Muscle.__init__(self, scene_, params_, state_)
         # Model constants and variables
         if "k" in self.params:
             self.k = self.params["k"]  # scalar in N/m
@@ -378,6 +415,8 @@ class DampedSpringReducedTorqueMuscle(Muscle):
             self.v_norm = v.dot(self.l.normalized()) * self.l.normalized()  # normal velocity vector in m/s
             self.l0 = self.params["kl0"] * self.l.length  # scalar in m
             self.l_cont = self.l0  # scalar in m
+            self.ctrl_sig = None
+            self.force = vec((0, 0, 0))  # vector in N
 
     def update(self, **kwargs):
         """Update and apply forces on the objects connected to the spring. The spring can be controlled in length by \
@@ -387,6 +426,7 @@ class DampedSpringReducedTorqueMuscle(Muscle):
             ctrl_sig = kwargs["ctrl_sig"]
         else:
             ctrl_sig = None
+        self.ctrl_sig = ctrl_sig
 
         # If muscle has not been deactivated
         if self.active:
@@ -397,23 +437,22 @@ class DampedSpringReducedTorqueMuscle(Muscle):
                 self.l_cont = self.l0 * (1 + self.k_cont * ctrl_sig)
 
             # get length and velocity
-            self.app_point_1_world = self.obj1.worldTransform * self.app_point_1
-            self.app_point_2_world = self.obj2.worldTransform * self.app_point_2
+            self.app_point_1_world, self.app_point_2_world = self.get_app_points()
             self.l = self.app_point_2_world - self.app_point_1_world
 
             # Center of gravity and lever arm
-            cg_1 = self.obj1.worldPosition
-            cg_2 = self.obj2.worldPosition
+            cg_1, cg_2 = self.get_positions()
             lever_1_vect = self.app_point_1_world - cg_1
             lever_2_vect = self.app_point_2_world - cg_2
 
             # Damping must be in spring axis direction.
-            v = self.obj2.getVelocity(self.app_point_2) - self.obj1.getVelocity(self.app_point_1)
-            self.v_norm = v.dot(self.l.normalized()) * self.l.normalized()
-            # print("l: " + str(self.l) + " norm: " + str(self.l.normalized()) + " v = " +  str(v) + "vdot" + str(v.dot(self.l.normalized())) +" vnorm: " + str(self.v_norm))
+            v_1, v_2 = self.get_app_velocities()
+            v = v_2 - v_1
+            direction = self.l.normalized()
+            self.v_norm = v.dot(direction) * direction
 
             # compute spring force
-            force_s = - (self.k * (self.l.length - self.l_cont)) * self.l.normalized()
+            force_s = - (self.k * (self.l.length - self.l_cont)) * direction
 
             # compute damping force
             force_d = - self.c * self.v_norm
@@ -425,28 +464,444 @@ class DampedSpringReducedTorqueMuscle(Muscle):
             torque_1 = self.damp_torque_fact * lever_1_vect.cross(-force)
             torque_2 = self.damp_torque_fact * lever_2_vect.cross(force)
 
-            # apply impusle on an object point only in traction
-            f_type = "Push"
-            if float((force * self.l.normalized())) < 0.0:
-                f_type = "Pull"
-                self.obj1.applyForce(- force)
-                self.obj2.applyForce(force)
-                self.obj1.applyTorque(torque_1)
-                self.obj2.applyTorque(torque_2)
+            # apply forces and torques only in traction, or add them to the per-object accumulator
+            if force.dot(direction) < 0.0:
+                if self.forces is not None:
+                    self.forces.add_force(self.state_1, - force)
+                    self.forces.add_force(self.state_2, force)
+                    self.forces.add_torque(self.state_1, torque_1)
+                    self.forces.add_torque(self.state_2, torque_2)
+                else:
+                    self.obj1.applyForce(- force)
+                    self.obj2.applyForce(force)
+                    self.obj1.applyTorque(torque_1)
+                    self.obj2.applyTorque(torque_2)
+
+            # Keep the force for power and telemetry
+            self.force = force
 
             # DEBUG data
             self.draw_muscle()
             self.n_iter += 1
-
-            self.logger.debug("Muscle " + self.name + ":" + str(self.n_iter) + ": Ft = " + str(
-                force) + " - " + str(force * self.l.normalized()) + "N")
-            self.logger.debug("  Type = " + f_type)
-            self.logger.debug("  Fs = " + str(force_s) + " ;  Fd = " + str(force_d))
-            self.logger.debug("  l = " + str(self.l) + " ; l0 = " + str(self.l0))
-            self.logger.debug("  L P1 = " + str(self.app_point_1) + " ; L P2 = " + str(self.app_point_2))
-            self.logger.debug("  G P1 = " + str(self.app_point_1_world) + " ; G P2 = " + str(self.app_point_2_world))
-            self.logger.debug("  G O1 = " + str(cg_1) + " ; G O2 = " + str(cg_1))
-            self.logger.debug("  G OP 1 = " + str(lever_1_vect) + " ; G CG 2 = " + str(lever_2_vect))
-            self.logger.debug("  T1 = " + str(torque_1) + " ; T2 = " + str(torque_2))
         else:
             self.logger.warning("Muscle " + self.name + " has been deactivated.")
+
+
+class MuscleBank:
+    """This class implements all the damped spring muscles of a body at once. Muscle parameters are stored in
+    contiguous NumPy arrays, the state of each distinct extremity object is gathered once per time-step and the
+    spring-damper forces of all muscles are computed in a single vectorized pass. The model is the one of
+    DampedSpringMuscle: an impulse is applied on both extremities only when the muscle pulls"""
+
+    def __init__(self, scene_, params_list_, logger_=None, state_=None):
+        """Class initialization. Requires the scene and a list of muscle parameters dicts as defined in the config
+        file. A muscle with a brain_sig key is controlled by the brain (None meaning a null control signal), a
+        muscle without this key keeps its reference length. The extremity objects are read from the given
+        SceneState snapshot, or from a snapshot owned and updated by the bank"""
+
+        self.n_iter = 0
+        self.scene = scene_
+        self.logger = logger_ if logger_ is not None else logging.getLogger("INFO")
+        self.tic_rate = bge.logic.getLogicTicRate()
+        self.forces = None
+        self.own_state = state_ is None
+        self.state = SceneState(scene_) if state_ is None else state_
+
+        # Keep active muscles and register the extremity objects in the scene state
+        self.names = []
+        obj_1 = []
+        obj_2 = []
+        params = []
+        for p in params_list_:
+            if p["obj_1"] not in self.scene.objects or p["obj_2"] not in self.scene.objects:
+                self.logger.error("Muscle " + p["name"] + " deactivated: an extremity object doesn't exit." +
+                                  " Check your configuration file!")
+                continue
+            obj_1.append(self.state.register(self.scene.objects[p["obj_1"]]))
+            obj_2.append(self.state.register(self.scene.objects[p["obj_2"]]))
+            self.names.append(p["name"])
+            params.append(p)
+        self.n_muscles = len(params)
+
+        # Geometry and control arrays
+        self.obj_1 = np.array(obj_1, dtype=int)
+        self.obj_2 = np.array(obj_2, dtype=int)
+        self.anch_1 = np.array([p["anch_1"] if p["anch_1"] is not None else [0.0, 0.0, 0.0] for p in params],
+                               dtype=float).reshape((self.n_muscles, 3))
+        self.anch_2 = np.array([p["anch_2"] if p["anch_2"] is not None else [0.0, 0.0, 0.0] for p in params],
+                               dtype=float).reshape((self.n_muscles, 3))
+        self.controlled = np.array(["brain_sig" in p for p in params], dtype=bool)
+        self.brain_sig = np.array([p["brain_sig"] if "brain_sig" in p and p["brain_sig"] is not None else -1
+                                   for p in params], dtype=int)
+        self.has_sig = self.brain_sig >= 0
+
+        # Muscles state buffers
+        self.ctrl_sig = np.zeros(self.n_muscles)
+        self.force = np.zeros((self.n_muscles, 3))
+        self.v = np.zeros((self.n_muscles, 3))
+        self.compute_geometry()
+        self.init_params(params)
+
+    def init_params(self, params_):
+        """Build the model parameters arrays from the muscles parameters dicts"""
+
+        self.k = np.array([p["k"] for p in params_], dtype=float)
+        self.c = np.array([p["c"] for p in params_], dtype=float)
+        self.k_cont = np.array([p["kc"] for p in params_], dtype=float)
+        self.l0 = np.array([p["kl0"] for p in params_], dtype=float) * self.length
+
+    def compute_geometry(self):
+        """Compute the world anchors, muscle vectors, lengths, directions and anchors velocities from the scene
+        state. The anchor velocity is v + w x (R.a), i.e. the velocity of the local point a as given by
+        getVelocity()"""
+
+        rot, pos, lin_vel, ang_vel = self.state.get_arrays()
+        self.lever_1 = np.einsum("nij,nj->ni", rot[self.obj_1], self.anch_1)
+        self.lever_2 = np.einsum("nij,nj->ni", rot[self.obj_2], self.anch_2)
+        self.app_point_1_world = pos[self.obj_1] + self.lever_1
+        self.app_point_2_world = pos[self.obj_2] + self.lever_2
+        self.l = self.app_point_2_world - self.app_point_1_world
+        self.length = np.sqrt(np.einsum("ni,ni->n", self.l, self.l))
+        self.dir = self.l / np.maximum(self.length, 1e-12)[:, np.newaxis]
+        self.v_1 = lin_vel[self.obj_1] + np.cross(ang_vel[self.obj_1], self.lever_1)
+        self.v_2 = lin_vel[self.obj_2] + np.cross(ang_vel[self.obj_2], self.lever_2)
+
+    def get_power(self):
+        """Return the time-step power developped by all the muscles on their extremity objects. As for
+        DampedSpringMuscle, muscles with a null control signal are not taken into account"""
+
+        counted = np.logical_or(np.logical_not(self.controlled), self.ctrl_sig != 0.0)
+
+        return float(np.einsum("ni,ni->n", self.force, self.v)[counted].sum())
+
+    def draw_muscles(self, color_=[256, 0, 0]):
+        """Draw a line for each muscle in the blender simulation"""
+
+        for i in range(self.n_muscles):
+            bge.render.drawLine(self.app_point_1_world[i].tolist(), self.app_point_2_world[i].tolist(), color_)
+
+    def set_ctrl_sig(self, ctrl_sig_):
+        """Gather the control signal of each muscle from the brain state vector"""
+
+        self.ctrl_sig[:] = 0.0
+        if ctrl_sig_ is not None:
+            self.ctrl_sig[self.has_sig] = np.asarray(ctrl_sig_, dtype=float).ravel()[self.brain_sig[self.has_sig]]
+
+    def apply_impulses(self, f_norm_):
+        """Apply the time-step impulses of the muscles in traction (negative f_norm_) on their extremities, or add
+        their forces to the per-object accumulator"""
+
+        if self.forces is not None:
+            pulling = np.nonzero(f_norm_ < 0.0)[0]
+            self.forces.add_forces(np.concatenate([self.obj_1[pulling], self.obj_2[pulling]]),
+                                   np.concatenate([- self.force[pulling], self.force[pulling]]),
+                                   np.concatenate([self.app_point_1_world[pulling], self.app_point_2_world[pulling]]))
+            return
+
+        impulse = self.force / self.tic_rate
+        for i in np.nonzero(f_norm_ < 0.0)[0]:
+            self.state.objects[self.obj_1[i]].applyImpulse(self.app_point_1_world[i].tolist(),
+                                                           (- impulse[i]).tolist())
+            self.state.objects[self.obj_2[i]].applyImpulse(self.app_point_2_world[i].tolist(), impulse[i].tolist())
+
+    def update(self, ctrl_sig_=None):
+        """Update and apply forces on all the muscles given the brain state vector"""
+
+        # Control signals and lengths
+        self.set_ctrl_sig(ctrl_sig_)
+        l_cont = self.l0 * (1 + self.k_cont * self.ctrl_sig)
+
+        # Geometry and velocities
+        if self.own_state:
+            self.state.update()
+        self.compute_geometry()
+        self.v = self.v_2 - self.v_1
+        v_norm = np.einsum("ni,ni->n", self.v, self.dir)
+
+        # Spring and damping forces along the muscle axis
+        f_norm = - self.k * (self.length - l_cont) - self.c * v_norm
+        self.force = f_norm[:, np.newaxis] * self.dir
+
+        # Apply impulses only in traction
+        self.apply_impulses(f_norm)
+
+        # DEBUG data
+        self.draw_muscles()
+        self.n_iter += 1
+
+
+class ReducedTorqueMuscleBank(MuscleBank):
+    """This class implements all the damped spring muscles of a body at once with the model of
+    DampedSpringReducedTorqueMuscle: the spring-damper force of a muscle in traction is applied in the center of
+    mass of its extremity objects, with the torque of its lever arm reduced by the kt factor of the muscle. As
+    for DampedSpringReducedTorqueMuscle, no power is reported
+    Usage:
+            bank = ReducedTorqueMuscleBank(scene, config.get_muscles_config())
+            bank.update(ctrl_sig)
+    """
+
+    def init_params(self, params_):
+        """Build the model parameters arrays from the muscles parameters dicts"""
+
+        MuscleBank.init_params(self, params_)
+        self.k_torque = np.array([p.get("kt", 0.1) for p in params_], dtype=float)
+
+    def get_power(self):
+        """Return the time-step power developped by all the muscles, which is not computed for this model"""
+
+        return 0.0
+
+    def apply_impulses(self, f_norm_):
+        """Apply the forces and reduced torques of the muscles in traction (negative f_norm_) during the
+        time-step, or add them to the per-object accumulator"""
+
+        pulling = np.nonzero(f_norm_ < 0.0)[0]
+        force = self.force[pulling]
+        k_torque = self.k_torque[pulling][:, np.newaxis]
+        torque_1 = k_torque * np.cross(self.lever_1[pulling], - force)
+        torque_2 = k_torque * np.cross(self.lever_2[pulling], force)
+
+        if self.forces is not None:
+            self.forces.add_forces(np.concatenate([self.obj_1[pulling], self.obj_2[pulling]]),
+                                   np.concatenate([- force, force]), None, np.concatenate([torque_1, torque_2]))
+            return
+
+        for j, i in enumerate(pulling.tolist()):
+            obj_1 = self.state.objects[self.obj_1[i]]
+            obj_2 = self.state.objects[self.obj_2[i]]
+            obj_1.applyForce((- force[j]).tolist())
+            obj_2.applyForce(force[j].tolist())
+            obj_1.applyTorque(torque_1[j].tolist())
+            obj_2.applyTorque(torque_2[j].tolist())
+
+
+class HillMuscleBank(MuscleBank):
+    """This class implements all the Hill muscles of a body at once, with the model of HillMuscle (Haeufle et al.,
+    2014). Force-length, force-velocity, PEE, SEE and SDE relations are evaluated for all muscles in a single
+    NumPy pass and the contractile element length l_CE is integrated from one time-step to the next. The
+    exponential and power curves can be replaced by precomputed lookup tables. A muscle parameters dict can set
+    F_max, l_CEopt and l_SEE0; by default, l_CEopt and l_SEE0 keep the ratio of the reference extensor of
+    Kistemaker et al. (2006) and sum to the initial muscle length. The brain signal is the activation q, clipped
+    in [q0, 1]. The SEE and SDE make l_CE dynamics stiff: it is integrated with several explicit Euler substeps
+    per time-step, the muscle length and lengthening velocity being held constant during the time-step, and the
+    CE velocity of each substep being bounded so that the state stays finite
+    Usage:
+            bank = HillMuscleBank(scene, config.back_leg_L_muscles + config.back_leg_R_muscles, tables_=True)
+            bank.update(ctrl_sig)
+    """
+
+    # Contractile Element (CE)
+    CE_F_max = 1420  # F_max in [N] for Extensor (Kistemaker et al., 2006)
+    CE_l_CEopt = 0.092  # optimal length of CE in [m] for Extensor (Kistemaker et al., 2006)
+    CE_DeltaW_limb_des = 0.35  # width of normalized bell curve in descending branch (Moerl et al., 2012)
+    CE_DeltaW_limb_asc = 0.35  # width of normalized bell curve in ascending branch (Moerl et al., 2012)
+    CE_v_CElimb_des = 1.5  # exponent for descending branch (Moerl et al., 2012)
+    CE_v_CElimb_asc = 3.0  # exponent for ascending branch (Moerl et al., 2012)
+    CE_A_rel0 = 0.25  # parameter for contraction dynamics: maximum value of A_rel (Guenther, 1997, S. 82)
+    CE_B_rel0 = 2.25  # parameter for contraction dynmacis: maximum value of B_rel (Guenther, 1997, S. 82)
+    CE_S_eccentric = 2  # relation between F(v) slopes at v_CE=0 (van Soest & Bobbert, 1993)
+    CE_F_eccentric = 1.5  # factor by which the force can exceed F_isom for large eccentric velocities
+
+    # Parallel Elastic Element (PEE)
+    PEE_L_PEE0 = 0.9  # rest length of PEE normalized to optimal lenght of CE (Guenther et al., 2007)
+    PEE_v_PEE = 2.5  # exponent of F_PEE (Moerl et al., 2012)
+    PEE_F_PEE = 2.0  # force of PEE if l_CE is stretched to deltaWlimb_des (Moerl et al., 2012)
+
+    # Serial Damping Element (SDE)
+    SDE_D_SE = 0.3  # dimensionless factor to scale d_SEmax (Moerl et al., 2012)
+    SDE_R_SE = 0.01  # minimum value of d_SE normalised to d_SEmax (Moerl et al., 2012)
+
+    # Serial Elastic Element (SEE)
+    SEE_l_SEE0 = 0.172  # rest length of SEE in [m] (Kistemaker et al., 2006)
+    SEE_DeltaU_SEEnll = 0.0425  # relativ stretch at non-linear linear transition (Moerl et al., 2012)
+    SEE_DeltaU_SEEl = 0.017  # relativ additional stretch in the linear part providing a force increase of deltaF_SEE0
+    SEE_DeltaF_SEE0 = 568  # both force at the transition and force increase in the linear part in [N]
+
+    # Lookup tables range and size. Normalized lengths out of the range are clamped
+    TABLE_L_CE_MAX = 3.0
+    TABLE_SIZE = 4096
+
+    def __init__(self, scene_, params_list_, logger_=None, state_=None, tables_=False, q0_=0.005, substeps_=5):
+        """Class initialization. Set tables_ to evaluate the force curves with lookup tables"""
+
+        self.tables = tables_
+        self.q0 = q0_
+        self.substeps = substeps_
+        MuscleBank.__init__(self, scene_, params_list_, logger_, state_)
+
+    def init_params(self, params_):
+        """Build the Hill parameters arrays, the contractile element state and the lookup tables"""
+
+        l_init = self.length
+        ratio = l_init / (self.CE_l_CEopt + self.SEE_l_SEE0)
+        self.F_max = np.array([p.get("F_max", self.CE_F_max) for p in params_], dtype=float)
+        self.l_CEopt = np.array([p["l_CEopt"] if "l_CEopt" in p else r * self.CE_l_CEopt
+                                 for p, r in zip(params_, ratio)], dtype=float)
+        self.l_SEE0 = np.array([p["l_SEE0"] if "l_SEE0" in p else r * self.SEE_l_SEE0
+                                for p, r in zip(params_, ratio)], dtype=float)
+        self.DeltaF_SEE0 = self.SEE_DeltaF_SEE0 * self.F_max / self.CE_F_max
+        self.d_SEmax = self.SDE_D_SE * (self.F_max * self.CE_A_rel0) / (self.l_CEopt * self.CE_B_rel0)
+        self.v_max = self.l_CEopt * self.CE_B_rel0 / self.CE_A_rel0  # Highest concentric velocity of the CE
+
+        # Contractile element length, starting with a SEE at rest length
+        self.l_CE = np.maximum(l_init - self.l_SEE0, 0.1 * self.l_CEopt)
+        self.dot_l_CE = np.zeros(self.n_muscles)
+        self.F_MTC = np.zeros(self.n_muscles)
+
+        # Lookup tables of the normalized force curves
+        if self.tables:
+            self.L_table = np.linspace(0., self.TABLE_L_CE_MAX, self.TABLE_SIZE)
+            self.F_isom_table = self.get_F_isom(self.L_table)
+            self.F_PEE_table = self.get_F_PEE(self.L_table)
+            self.U_table = np.linspace(0., self.SEE_DeltaU_SEEnll, self.TABLE_SIZE)
+            self.F_SEEnl_table = (self.U_table / self.SEE_DeltaU_SEEnll) ** (self.SEE_DeltaU_SEEnll /
+                                                                             self.SEE_DeltaU_SEEl)
+
+    def get_F_isom(self, L_):
+        """Return the normalized isometric force for normalized CE lengths L_ = l_CE / l_CEopt"""
+
+        asc = L_ < 1.
+        width = np.where(asc, self.CE_DeltaW_limb_asc, self.CE_DeltaW_limb_des)
+        expo = np.where(asc, self.CE_v_CElimb_asc, self.CE_v_CElimb_des)
+
+        return np.exp(- (np.abs(L_ - 1.) / width) ** expo)
+
+    def get_F_PEE(self, L_):
+        """Return the PEE force normalized by F_max for normalized CE lengths L_"""
+
+        stretch = np.maximum(L_ - self.PEE_L_PEE0, 0.) / (self.CE_DeltaW_limb_des + 1 - self.PEE_L_PEE0)
+
+        return self.PEE_F_PEE * stretch ** self.PEE_v_PEE
+
+    def get_F_SEE(self, l_SEE_):
+        """Return the SEE force for SEE lengths l_SEE_: null under the rest length, non-linear up to the
+        transition stretch and linear beyond"""
+
+        u = l_SEE_ / self.l_SEE0 - 1.
+        u_nl = np.clip(u, 0., self.SEE_DeltaU_SEEnll)
+        if self.tables:
+            f_nl = np.interp(u_nl, self.U_table, self.F_SEEnl_table)
+        else:
+            f_nl = (u_nl / self.SEE_DeltaU_SEEnll) ** (self.SEE_DeltaU_SEEnll / self.SEE_DeltaU_SEEl)
+        f_l = np.maximum(u - self.SEE_DeltaU_SEEnll, 0.) / self.SEE_DeltaU_SEEl
+
+        return self.DeltaF_SEE0 * (f_nl + f_l)
+
+    def solve_dot_l_CE(self, q_, F_isom_, F_PEE_, F_SEE_, A_rel_, B_rel_, dot_l_MTC_, sign_):
+        """Solve the quadratic force equilibrium of the CE, SEE, SDE and PEE for the CE velocity. sign_ selects
+        the root: -1 for concentric and +1 for eccentric contractions. Complex solutions give a null velocity"""
+
+        R = self.SDE_R_SE
+        D0 = self.l_CEopt * B_rel_ * self.d_SEmax * (R + (1 - R) * (q_ * F_isom_ + F_PEE_ / self.F_max))
+        C2 = self.d_SEmax * (R - (A_rel_ - F_PEE_ / self.F_max) * (1 - R))
+        C1 = - C2 * dot_l_MTC_ - D0 - F_SEE_ + F_PEE_ - self.F_max * A_rel_
+        C0 = D0 * dot_l_MTC_ + self.l_CEopt * B_rel_ * (F_SEE_ - F_PEE_ - self.F_max * q_ * F_isom_)
+
+        disc = C1 ** 2 - 4 * C2 * C0
+        sqrt_disc = np.sqrt(np.maximum(disc, 0.))
+        linear = np.abs(C2) < 1e-12
+        root = np.where(linear, - C0 / np.where(C1 == 0., 1., C1),
+                        (- C1 + sign_ * sqrt_disc) / (2 * np.where(linear, 1., C2)))
+
+        return np.where(np.logical_and(disc < 0, np.logical_not(linear)), 0., root)
+
+    def compute_forces(self, q_, l_MTC_, dot_l_MTC_):
+        """Return the muscle-tendon complex forces and the CE velocities for given activations, lengths and
+        lengthening velocities"""
+
+        L = self.l_CE / self.l_CEopt
+        if self.tables:
+            F_isom = np.interp(L, self.L_table, self.F_isom_table)
+            F_PEE = self.F_max * np.interp(L, self.L_table, self.F_PEE_table)
+        else:
+            F_isom = self.get_F_isom(L)
+            F_PEE = self.F_max * self.get_F_PEE(L)
+        F_SEE = self.get_F_SEE(np.abs(l_MTC_ - self.l_CE))
+
+        # Hill parameters and CE velocity for a concentric contraction
+        A_rel = np.where(L < 1., 1., F_isom) * self.CE_A_rel0 * 0.25 * (1 + 3 * q_)
+        B_rel = self.CE_B_rel0 / 7. * (3 + 4 * q_)
+        dot_l_CE = self.solve_dot_l_CE(q_, F_isom, F_PEE, F_SEE, A_rel, B_rel, dot_l_MTC_, -1.)
+
+        # Asymptotes of the hyperbola and CE velocity for an eccentric contraction
+        ecc = dot_l_CE > 0
+        if np.any(ecc):
+            # q F_isom and A_rel both underflow to 0 for very long CEs: B_ecc is then null, as its numerator
+            den = q_ * F_isom + A_rel
+            den_safe = np.where(den < 1e-12, 1., den)
+            B_ecc = np.where(den < 1e-12, 0., q_ * F_isom * (1 - self.CE_F_eccentric) / den_safe * B_rel /
+                             self.CE_S_eccentric)
+            A_ecc = - self.CE_F_eccentric * q_ * F_isom
+            A_rel = np.where(ecc, A_ecc, A_rel)
+            B_rel = np.where(ecc, B_ecc, B_rel)
+            dot_l_CE = np.where(ecc, self.solve_dot_l_CE(q_, F_isom, F_PEE, F_SEE, A_rel, B_rel, dot_l_MTC_, 1.),
+                                dot_l_CE)
+
+        # Contractile and serial damping elements forces
+        B_safe = np.where(np.abs(B_rel) < 1e-12, 1e-12, B_rel)
+        F_CE = self.F_max * (((q_ * F_isom + A_rel) / (1 - dot_l_CE / (self.l_CEopt * B_safe))) - A_rel)
+        F_SDE = self.d_SEmax * ((1 - self.SDE_R_SE) * ((F_CE + F_PEE) / self.F_max) + self.SDE_R_SE) * \
+            (dot_l_MTC_ - dot_l_CE)
+
+        return F_SEE + F_SDE, dot_l_CE
+
+    def get_power(self):
+        """Return the time-step power developped by all the muscles on their extremity objects"""
+
+        return float(np.einsum("ni,ni->n", self.force, self.v).sum())
+
+    def update(self, ctrl_sig_=None):
+        """Update the contractile elements and apply forces on all the muscles given the brain state vector"""
+
+        # Activations
+        self.set_ctrl_sig(ctrl_sig_)
+        q = np.clip(self.ctrl_sig, self.q0, 1.)
+
+        # Geometry and lengthening velocities
+        if self.own_state:
+            self.state.update()
+        self.compute_geometry()
+        self.v = self.v_2 - self.v_1
+        dot_l_MTC = np.einsum("ni,ni->n", self.v, self.dir)
+
+        # Integration of the contractile element length and Hill model forces. Far from the equilibrium of the SEE,
+        # the explicit steps overshoot: they are bounded by the highest concentric velocity of the CE
+        h = 1. / (self.tic_rate * self.substeps)
+        for i in range(self.substeps):
+            self.F_MTC, self.dot_l_CE = self.compute_forces(q, self.length, dot_l_MTC)
+            self.l_CE = np.clip(self.l_CE + np.clip(self.dot_l_CE, - self.v_max, self.v_max) * h,
+                                0.1 * self.l_CEopt, self.length)
+
+        # A muscle can only pull its extremities together
+        f_norm = - self.F_MTC
+        self.force = f_norm[:, np.newaxis] * self.dir
+        self.apply_impulses(f_norm)
+
+        # DEBUG data
+        self.draw_muscles()
+        self.n_iter += 1
+
+
+# Muscle classes which can be selected with config.muscle_type
+MUSCLE_TYPES = {"HillMuscle": HillMuscle, "DampedSpringMuscle": DampedSpringMuscle,
+                "DampedSpringReducedTorqueMuscle": DampedSpringReducedTorqueMuscle}
+
+# Vectorized banks implementing the same model as each muscle class
+BANK_TYPES = {"HillMuscle": HillMuscleBank, "DampedSpringMuscle": MuscleBank,
+              "DampedSpringReducedTorqueMuscle": ReducedTorqueMuscleBank}
+
+
+def get_muscle_class(muscle_type_):
+    """Return the muscle class given its name in the config"""
+
+    if muscle_type_ not in MUSCLE_TYPES:
+        raise ValueError("Unknown muscle type " + str(muscle_type_) + ". Available types are " +
+                         str(sorted(MUSCLE_TYPES.keys())))
+
+    return MUSCLE_TYPES[muscle_type_]
+
+
+def get_bank_class(muscle_type_):
+    """Return the muscle bank class of a muscle type, or None if this type has no vectorized bank"""
+
+    return BANK_TYPES.get(muscle_type_, None)
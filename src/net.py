@@ -62,6 +62,7 @@ class SimManager(Thread):
         self.cloud_state = dict()  # dictionnary of server state on the cloud. Entries are server hashes
         self.server_list = []  # list of active servers
         self.conn_list = []  # list of active RPYC connections
+        self.stats = dict()  # resources accounting. Entries are (host, config name) tuples
 
         # Simulation manager parameter
         self.rqt_n = 0
@@ -81,6 +82,7 @@ class SimManager(Thread):
         self.mutex_conn_list = Lock()
         self.mutex_rsp = Lock()
         self.mutex_rqt = Lock()
+        self.mutex_stats = Lock()
         threading.Thread.__init__(self)
 
         logging.debug("Sim Manager initialization achieved. Number of active threads = " +
@@ -160,6 +162,7 @@ class SimManager(Thread):
         self.mutex_rsp.acquire()
         if not rsp.error:
             self.rsp.appendleft(rsp.value)
+            self.__account_resources(rsp.value)
         else:
             logging.error('SimManager.response_sim() : The server return an exception\n')
         self.mutex_rsp.release()
@@ -201,6 +204,46 @@ class SimManager(Thread):
 
         return
 
+    def __account_resources(self, rsp_value):
+        """Add the resources and phase timings of a finished simulation to the per host and per config stats"""
+
+        try:
+            meta = rsp_value["meta"]
+            key = (str(meta["host"]), str(meta["config_name"]))
+            resources = dict(meta["resources"])
+            timings = dict(meta["timings"])
+        except (KeyError, TypeError) as e:
+            logging.warning("No resources accounting in simulation response: " + str(e))
+            return
+
+        self.mutex_stats.acquire()
+        if key not in self.stats:
+            self.stats[key] = {"n_sim": 0, "max_rss": 0, "sums": dict()}
+        entry = self.stats[key]
+        entry["n_sim"] += 1
+        entry["max_rss"] = max(entry["max_rss"], resources.get("max_rss", 0))
+        for name in ["wall_time", "user_time", "sys_time"]:
+            if name in resources:
+                entry["sums"][name] = entry["sums"].get(name, 0.0) + resources[name]
+        for name in timings:
+            if isinstance(timings[name], (int, float)):
+                entry["sums"][name] = entry["sums"].get(name, 0.0) + timings[name]
+        self.mutex_stats.release()
+
+    def get_stats(self):
+        """Return a dict of the averaged resources and phase timings with (host, config name) tuples as keys"""
+
+        self.mutex_stats.acquire()
+        stats = dict()
+        for key in self.stats:
+            entry = self.stats[key]
+            stats[key] = {"n_sim": entry["n_sim"], "max_rss": entry["max_rss"]}
+            for name in entry["sums"]:
+                stats[key]["av_" + name] = entry["sums"][name] / entry["n_sim"]
+        self.mutex_stats.release()
+
+        return stats
+
     def simulate(self, sim_list):
         """Perform synchronous simulation with the given list and return response list"""
 
@@ -365,6 +408,9 @@ class SimService(rpyc.Service):
 
     ALIASES = ["BLENDERSIM", "BLENDER", "BLENDERPLAYER"]
 
+    # CpuSlots map shared by all connections. None disables process placement
+    slots = None
+
     def on_connect(self):
         self.a = 4
         pass
@@ -376,7 +422,7 @@ class SimService(rpyc.Service):
 
         # Perform simulation
         logging.info("Processing simulation request")
-        s = sim.BlenderSim(opt_)
+        s = sim.BlenderSim(opt_, SimService.slots)
         s.start_blenderplayer()
         logging.info("Simulation request processed")
 
@@ -0,0 +1,71 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+import json
+import os
+import pickle
+import tempfile
+
+# Protocol 2 is the highest one understood by both qSim (python2) and blenderplayer (python3)
+PAYLOAD_PROTOCOL = 2
+PAYLOAD_PREFIX = "qsim_"
+PAYLOAD_SUFFIX = ".pld"
+
+
+def get_plain(value_):
+    """Return a deep copy of a value made of plain dicts, lists and scalars only. Dicts and lists received as
+    rpyc remote references, at any depth, are copied too so that the copy can be pickled"""
+
+    def copy_remote(obj_):
+        if hasattr(obj_, "items"):
+            return dict(obj_.items())
+        return list(obj_)
+
+    return json.loads(json.dumps(value_, default=copy_remote))
+
+
+def write_payload(params_, dirname_=None):
+    """Dump the simulation parameters (config name, config overrides, genome, paths...) in a binary
+    temporary file and return its path. The path is the only thing given to blenderplayer on the command line"""
+
+    fd, path = tempfile.mkstemp(prefix=PAYLOAD_PREFIX, suffix=PAYLOAD_SUFFIX, dir=dirname_)
+    f = os.fdopen(fd, 'wb')
+    try:
+        pickle.dump(params_, f, PAYLOAD_PROTOCOL)
+    finally:
+        f.close()
+
+    return path
+
+
+def read_payload(path_):
+    """Load the simulation parameters written by write_payload()"""
+
+    f = open(path_, 'rb')
+    try:
+        params = pickle.load(f)
+    finally:
+        f.close()
+
+    return params
+
+
+def remove_payload(path_):
+    """Remove a payload file once the simulation that used it has finished"""
+
+    if path_ is not None and os.path.isfile(path_):
+        os.remove(path_)
@@ -0,0 +1,188 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+import glob
+import logging
+import multiprocessing
+import os
+import re
+import subprocess
+from threading import Lock
+
+NODE_PATH = "/sys/devices/system/node/node*"
+
+
+def parse_cpu_list(cpulist_):
+    """Transform a kernel cpu list string like '0-3,8,10-11' into a list of integers"""
+
+    cpus = []
+    for item in cpulist_.strip().split(","):
+        if not item:
+            continue
+        if "-" in item:
+            first, last = item.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(item))
+
+    return cpus
+
+
+def get_numa_topology():
+    """Return a dict with NUMA node indexes as keys and the list of their cpus as values. Hosts without NUMA
+    information in sysfs are seen as a single node owning all the cpus"""
+
+    topology = dict()
+    for path in glob.glob(NODE_PATH):
+        match = re.search(r"node(\d+)$", path)
+        if match is None or not os.path.isfile(path + "/cpulist"):
+            continue
+        f = open(path + "/cpulist", 'r')
+        cpus = parse_cpu_list(f.read())
+        f.close()
+        if cpus:
+            topology[int(match.group(1))] = cpus
+
+    if not topology:
+        topology[0] = list(range(multiprocessing.cpu_count()))
+
+    return topology
+
+
+def find_executable(name_):
+    """Return the full path of an executable found in PATH or None"""
+
+    for dirname in os.getenv("PATH", "").split(os.pathsep):
+        path = os.path.join(dirname, name_)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+
+    return None
+
+
+def pin_process(pid_, cpus_):
+    """Restrict a running process to a set of cpus"""
+
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(pid_, cpus_)
+    elif find_executable("taskset") is not None:
+        subprocess.call(["taskset", "-pc", ",".join([str(c) for c in cpus_]), str(pid_)])
+    else:
+        logging.warning("Can't pin process " + str(pid_) + ": no affinity tool available on this host")
+
+
+class CpuSlots:
+    """
+    Slot map of the host cpus used by a simulation service. Each slot is a set of cores taken from a
+    single NUMA node so that a blenderplayer process never migrates between cores or sockets.
+    Usage:
+            # Create the map with 1 core per simulation and 1 core kept for the service
+            slots = CpuSlots(slot_size_=1, reserved_=1)
+
+            # Get a placement, prefix the command line with it and release it when done
+            placement = slots.acquire()
+            args = slots.get_prefix(placement) + args
+            slots.release(placement)
+    """
+
+    def __init__(self, slot_size_=1, reserved_=0):
+        """Split the NUMA nodes of the host in slots of slot_size_ cores. The reserved_ first cores are kept
+        for the service process itself"""
+
+        self.slot_size = max(1, slot_size_)
+        self.topology = get_numa_topology()
+        self.numactl = find_executable("numactl") is not None
+        self.taskset = find_executable("taskset") is not None
+        self.mutex = Lock()
+
+        # Reserve the first cores of the first node
+        self.reserved = []
+        first_node = sorted(self.topology.keys())[0]
+        if reserved_ > 0:
+            self.reserved = self.topology[first_node][:reserved_]
+
+        # Build the slots node by node
+        self.slots = []
+        for node in sorted(self.topology.keys()):
+            cpus = [c for c in self.topology[node] if c not in self.reserved]
+            for i in range(0, len(cpus) - self.slot_size + 1, self.slot_size):
+                self.slots.append({"slot": len(self.slots), "node": node, "cpus": cpus[i:i + self.slot_size]})
+        self.free = [True] * len(self.slots)
+
+        logging.info("CPU slot map: " + str(len(self.slots)) + " slots of " + str(self.slot_size) +
+                     " core(s) on " + str(len(self.topology)) + " NUMA node(s); reserved cores: " +
+                     str(self.reserved))
+        if not self.numactl and not self.taskset:
+            logging.warning("Neither numactl nor taskset found: the simulations will run without placement")
+
+    def reserve_service(self, pid_=None):
+        """Pin the service process on the reserved cores"""
+
+        if self.reserved:
+            if pid_ is None:
+                pid_ = os.getpid()
+            pin_process(pid_, self.reserved)
+
+    def acquire(self):
+        """Return a free slot placement taken from the NUMA node with the most free slots, or None if
+        every slot is used"""
+
+        self.mutex.acquire()
+        placement = None
+        free_per_node = dict()
+        for i, slot in enumerate(self.slots):
+            if self.free[i]:
+                free_per_node[slot["node"]] = free_per_node.get(slot["node"], 0) + 1
+        if free_per_node:
+            node = max(sorted(free_per_node.keys()), key=lambda n: free_per_node[n])
+            for i, slot in enumerate(self.slots):
+                if self.free[i] and slot["node"] == node:
+                    self.free[i] = False
+                    placement = dict(slot)
+                    break
+        self.mutex.release()
+
+        if placement is None:
+            logging.warning("No free CPU slot: the simulation will run without placement")
+
+        return placement
+
+    def release(self, placement_):
+        """Give a slot back to the map"""
+
+        if placement_ is None:
+            return
+        self.mutex.acquire()
+        self.free[placement_["slot"]] = True
+        self.mutex.release()
+
+    def get_prefix(self, placement_):
+        """Return the command line prefix which runs a process inside a placement. It is empty if the host has
+        no tool to apply it"""
+
+        if placement_ is None:
+            return []
+
+        cpus = ",".join([str(c) for c in placement_["cpus"]])
+        if self.numactl and len(self.topology) > 1:
+            return ["numactl", "--physcpubind=" + cpus, "--membind=" + str(placement_["node"])]
+        elif self.taskset:
+            return ["taskset", "-c", cpus]
+        elif self.numactl:
+            return ["numactl", "--physcpubind=" + cpus]
+        else:
+            return []
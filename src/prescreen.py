@@ -0,0 +1,479 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+import argparse
+import logging
+import math
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+# Use the mock game engine when running outside Blender
+try:
+    import bge
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock"))
+    import bge
+from mathutils import Matrix, Vector
+
+from blendfile import CONSTRAINT_RB_HINGE, get_morphology
+from body import Body
+from condition import ExitCondition
+from config import build_config
+
+GRAVITY = 9.81
+
+
+class PlanarModel:
+    """
+    Reduced-order rigid body model of a .blend morphology, restricted to the sagittal x-z plane and integrated
+    for n_batch_ individuals at once with NumPy. Each rigid body keeps its mass, inertia, damping and lateral
+    position; hinge joints are velocity constraints solved exactly at each substep, other joint types are
+    rejected, and the ground is a penalty contact with friction on the corners of the mesh bounds. As in the game engine, impulses change the
+    velocities at once and forces are applied until the end of the logic tick, which is integrated in
+    n_substeps_ semi-implicit Euler steps.
+    Usage:
+            model = PlanarModel(get_morphology("mdl/dog_vert.blend"), ["obj_body"], 20)
+            model.step()
+    """
+
+    def __init__(self, morphology_, names_, n_batch_, n_substeps_=16, tic_rate_=60.):
+        """Build the model with the dynamic bodies connected by joints to the objects of names_"""
+
+        self.n_batch = n_batch_
+        self.n_substeps = n_substeps_
+        self.dt = 1. / (tic_rate_ * n_substeps_)
+        self.names = self.get_segments(morphology_, names_)
+        self.n = len(self.names)
+        self.index = dict([(name, i) for i, name in enumerate(self.names)])
+        bodies = [morphology_[name] for name in self.names]
+
+        # Segments constants: the planar angle is the rotation around y, inertia is the one of the mesh box
+        self.mass = np.array([b["mass"] for b in bodies])
+        self.scale = np.array([b["scale"] for b in bodies])
+        self.y = np.array([b["loc"][1] for b in bodies])
+        low = np.array([b["bounds"][0] for b in bodies]) * self.scale
+        high = np.array([b["bounds"][1] for b in bodies]) * self.scale
+        self.inertia = self.mass * ((high[:, 0] - low[:, 0]) ** 2 + (high[:, 2] - low[:, 2]) ** 2) / 12.
+        self.corners = np.array([[[low[i, 0], low[i, 2]], [high[i, 0], low[i, 2]], [low[i, 0], high[i, 2]],
+                                  [high[i, 0], high[i, 2]]] for i in range(self.n)])
+        self.lin_damping = np.array([b["damping"] for b in bodies])
+        self.ang_damping = np.array([b["rdamping"] for b in bodies])
+
+        # Ground: top of the highest static body
+        self.ground = max([b["loc"][2] + b["bounds"][1][2] * b["scale"][2] for b in morphology_.values()
+                           if not b["dynamic"]] + [-1e9])
+        self.k_ground = 1e5
+        self.c_ground = 500.
+        self.c_friction = 200.
+        self.mu = 0.8
+
+        # State
+        self.pos = np.tile(np.array([[b["loc"][0], b["loc"][2]] for b in bodies]), (self.n_batch, 1, 1))
+        self.th = np.tile(np.array([b["rot"][1] for b in bodies]), (self.n_batch, 1))
+        self.vel = np.zeros((self.n_batch, self.n, 2))
+        self.w = np.zeros((self.n_batch, self.n))
+        self.impulse = np.zeros((self.n_batch, self.n, 2))
+        self.ang_impulse = np.zeros((self.n_batch, self.n))
+        self.force = np.zeros((self.n_batch, self.n, 2))
+        self.torque = np.zeros((self.n_batch, self.n))
+
+        # Joints between the owner b and its target a, with pivots in both local frames
+        ja = []
+        jb = []
+        pivots = []
+        for i, body in enumerate(bodies):
+            for joint in body["joints"]:
+                if joint["target"] in self.index:
+                    if joint["type"] != CONSTRAINT_RB_HINGE:
+                        raise ValueError("Joint of " + self.names[i] + " to " + joint["target"] + " is of type " +
+                                         str(joint["type"]) + ": the planar model only solves hinge joints")
+                    ja.append(self.index[joint["target"]])
+                    jb.append(i)
+                    pivots.append([joint["pivot"][0] * self.scale[i, 0], joint["pivot"][2] * self.scale[i, 2]])
+        self.ja = np.array(ja, dtype=int)
+        self.jb = np.array(jb, dtype=int)
+        self.pb = np.array(pivots).reshape((len(jb), 2))
+        world = self.pos[0, self.jb] + self.rotate(self.th[0, self.jb], self.pb)
+        self.pa = self.rotate(- self.th[0, self.ja], world - self.pos[0, self.ja])
+        self.baumgarte = 0.2
+        self.inv_mass = np.repeat(1. / self.mass, 3).reshape((self.n, 3))
+        self.inv_mass[:, 2] = 1. / self.inertia
+        self.inv_mass = self.inv_mass.reshape(3 * self.n)
+
+    def get_segments(self, morphology_, names_):
+        """Return the sorted names of the dynamic bodies connected by joints to the given objects"""
+
+        links = dict([(name, set()) for name in morphology_])
+        for name in morphology_:
+            for joint in morphology_[name]["joints"]:
+                if joint["target"] in links:
+                    links[name].add(joint["target"])
+                    links[joint["target"]].add(name)
+        found = set()
+        stack = [name for name in names_ if name in morphology_]
+        while stack:
+            name = stack.pop()
+            if name not in found and morphology_[name]["dynamic"]:
+                found.add(name)
+                stack.extend(links[name])
+
+        return sorted(found)
+
+    def rotate(self, th_, p_):
+        """Rotate planar points p_ (..., 2) in the x-z plane by angles th_ around the y axis"""
+
+        c = np.cos(th_)
+        s = np.sin(th_)
+
+        return np.stack([c * p_[..., 0] + s * p_[..., 1], - s * p_[..., 0] + c * p_[..., 1]], axis=-1)
+
+    def point_velocity(self, vel_, w_, r_):
+        """Return the velocity of points at lever arms r_ of bodies with velocities vel_ and w_"""
+
+        return vel_ + w_[..., np.newaxis] * np.stack([r_[..., 1], - r_[..., 0]], axis=-1)
+
+    def solve_joints(self, bias_=0.):
+        """Project the velocities on the hinge joints constraints, with a bias_ feedback of the pivots gaps. The
+        constraint impulses are solved exactly for all the joints of each individual"""
+
+        if not len(self.ja):
+            return
+
+        n_j = len(self.ja)
+        ra = self.rotate(self.th[:, self.ja], self.pa)
+        rb = self.rotate(self.th[:, self.jb], self.pb)
+
+        # Jacobian of the pivots relative velocities with respect to the (v_x, v_z, w) velocities of the bodies
+        jac = np.zeros((self.n_batch, n_j, 2, self.n, 3))
+        rows = np.arange(n_j)
+        for k in range(2):
+            jac[:, rows, k, self.jb, k] = 1.
+            jac[:, rows, k, self.ja, k] = -1.
+        jac[:, rows, 0, self.jb, 2] = rb[..., 1]
+        jac[:, rows, 1, self.jb, 2] = - rb[..., 0]
+        jac[:, rows, 0, self.ja, 2] = - ra[..., 1]
+        jac[:, rows, 1, self.ja, 2] = ra[..., 0]
+        jac = jac.reshape((self.n_batch, 2 * n_j, 3 * self.n))
+
+        vel = np.concatenate([self.vel, self.w[..., np.newaxis]], axis=2).reshape((self.n_batch, 3 * self.n))
+        rhs = - np.einsum("bij,bj->bi", jac, vel)
+        if bias_:
+            gap = self.pos[:, self.jb] + rb - self.pos[:, self.ja] - ra
+            rhs -= bias_ * gap.reshape((self.n_batch, 2 * n_j))
+        jac_m = jac * self.inv_mass
+        lam = np.linalg.solve(np.einsum("bij,bkj->bik", jac_m, jac), rhs[..., np.newaxis])[..., 0]
+        vel += np.einsum("bij,bi->bj", jac_m, lam)
+        vel = vel.reshape((self.n_batch, self.n, 3))
+        self.vel = vel[..., :2].copy()
+        self.w = vel[..., 2].copy()
+
+    def substep(self):
+        """Integrate one substep"""
+
+        force = self.force.copy()
+        force[:, :, 1] -= self.mass * GRAVITY
+        torque = self.torque.copy()
+
+        # Ground contacts
+        r = self.rotate(self.th[:, :, np.newaxis], self.corners[np.newaxis])
+        depth = self.ground - (self.pos[:, :, np.newaxis, 1] + r[..., 1])
+        contact = depth > 0.
+        if np.any(contact):
+            v = self.point_velocity(self.vel[:, :, np.newaxis], self.w[:, :, np.newaxis], r)
+            f_n = np.where(contact, np.maximum(self.k_ground * depth - self.c_ground * v[..., 1], 0.), 0.)
+            f_t = np.clip(- self.c_friction * v[..., 0], - self.mu * f_n, self.mu * f_n)
+            force[..., 0] += f_t.sum(axis=2)
+            force[..., 1] += f_n.sum(axis=2)
+            torque += (r[..., 1] * f_t - r[..., 0] * f_n).sum(axis=2)
+
+        # Semi-implicit Euler with the damping of the game engine
+        self.vel += force / self.mass[:, np.newaxis] * self.dt
+        self.w += torque / self.inertia * self.dt
+        self.vel *= ((1. - self.lin_damping) ** self.dt)[:, np.newaxis]
+        self.w *= (1. - self.ang_damping) ** self.dt
+        self.solve_joints(self.baumgarte / self.dt)
+        self.pos += self.vel * self.dt
+        self.th += self.w * self.dt
+
+    def step(self):
+        """Apply the impulses of the tick, integrate the tick and clear the applied forces"""
+
+        self.vel += self.impulse / self.mass[:, np.newaxis]
+        self.w += self.ang_impulse / self.inertia
+        self.impulse[:] = 0.
+        self.ang_impulse[:] = 0.
+        self.solve_joints()
+        for i in range(self.n_substeps):
+            self.substep()
+        self.force[:] = 0.
+        self.torque[:] = 0.
+
+
+class ProxyObject:
+    """Game object interface of one rigid body of one individual of a PlanarModel, so that the muscle, brain and
+    body classes run unchanged on the reduced model"""
+
+    def __init__(self, model_, b_, i_):
+        """Class initialization"""
+
+        self.model = model_
+        self.b = b_
+        self.i = i_
+        self.name = model_.names[i_]
+        self.mass = float(model_.mass[i_])
+
+    @property
+    def worldPosition(self):
+
+        p = self.model.pos[self.b, self.i]
+
+        return Vector((p[0], self.model.y[self.i], p[1]))
+
+    @property
+    def worldOrientation(self):
+
+        th = self.model.th[self.b, self.i]
+        c = math.cos(th)
+        s = math.sin(th)
+
+        return Matrix(((c, 0., s), (0., 1., 0.), (- s, 0., c)))
+
+    @property
+    def worldTransform(self):
+
+        p = self.model.pos[self.b, self.i]
+        sx, sy, sz = self.model.scale[self.i]
+        th = self.model.th[self.b, self.i]
+        c = math.cos(th)
+        s = math.sin(th)
+
+        return Matrix(((c * sx, 0., s * sz, p[0]), (0., sy, 0., self.model.y[self.i]), (- s * sx, 0., c * sz, p[1]),
+                       (0., 0., 0., 1.)))
+
+    @property
+    def worldLinearVelocity(self):
+
+        v = self.model.vel[self.b, self.i]
+
+        return Vector((v[0], 0., v[1]))
+
+    @property
+    def worldAngularVelocity(self):
+
+        return Vector((0., self.model.w[self.b, self.i], 0.))
+
+    def getVelocity(self, point_=(0., 0., 0.)):
+        """Return the world velocity of a point given in local coordinates"""
+
+        return self.worldLinearVelocity + self.worldAngularVelocity.cross(self.worldOrientation * Vector(point_))
+
+    def applyImpulse(self, point_, impulse_, local_=False):
+        """Apply an impulse on a point given in world coordinates"""
+
+        p = self.model.pos[self.b, self.i]
+        self.model.impulse[self.b, self.i, 0] += impulse_[0]
+        self.model.impulse[self.b, self.i, 1] += impulse_[2]
+        self.model.ang_impulse[self.b, self.i] += (point_[2] - p[1]) * impulse_[0] - (point_[0] - p[0]) * impulse_[2]
+
+    def applyForce(self, force_, local_=False):
+        """Apply a force in the center of mass until the end of the tick"""
+
+        self.model.force[self.b, self.i, 0] += force_[0]
+        self.model.force[self.b, self.i, 1] += force_[2]
+
+    def applyTorque(self, torque_, local_=False):
+        """Apply a torque until the end of the tick"""
+
+        self.model.torque[self.b, self.i] += torque_[1]
+
+
+class ProxyScene:
+    """Scene of one individual of a PlanarModel. Objects can be iterated or indexed by name"""
+
+    def __init__(self, model_, b_):
+        """Class initialization"""
+
+        self.name = "Scene"
+        self.objects = ProxyList([ProxyObject(model_, b_, i) for i in range(model_.n)])
+
+
+class ProxyList(list):
+    """List of proxy objects which can also be indexed by name"""
+
+    def __contains__(self, name_):
+
+        return name_ in [obj.name for obj in list.__iter__(self)]
+
+    def __getitem__(self, key_):
+
+        if isinstance(key_, str):
+            for obj in list.__iter__(self):
+                if obj.name == key_:
+                    return obj
+            raise KeyError(key_)
+
+        return list.__getitem__(self, key_)
+
+
+class Prescreen:
+    """
+    Blender-free evaluation of a list of configs on the reduced-order PlanarModel of a .blend model, with the
+    Body, muscle and brain classes of the simulation. All individuals are integrated together; each one stops at
+    its exit condition or after n_ticks_ ticks (by default, the config timeout). It is used to send only the most
+    promising candidates to Blender.
+    Usage:
+            ps = Prescreen(root + "/mdl/dog_vert.blend")
+            stats = ps.evaluate([config_1, config_2])
+            kept = ps.select([config_1, config_2], 0.5)
+    """
+
+    def __init__(self, model_path_, n_substeps_=16, n_ticks_=None):
+        """Read the model morphology"""
+
+        self.model_path = model_path_
+        self.morphology = get_morphology(model_path_)
+        self.n_substeps = n_substeps_
+        self.n_ticks = n_ticks_
+        self.tic_rate = bge.logic.getLogicTicRate()
+
+    def evaluate(self, configs_):
+        """Simulate all configs and return the list of their Body.get_stats() dicts"""
+
+        t_init = time.time()
+        names = set()
+        for conf in configs_:
+            names |= get_object_names(conf)
+        model = PlanarModel(self.morphology, names, len(configs_), self.n_substeps, self.tic_rate)
+        n_ticks = self.n_ticks
+        if n_ticks is None:
+            n_ticks = int(max([conf.timeout for conf in configs_]) * self.tic_rate)
+
+        owners = []
+        for b, conf in enumerate(configs_):
+            if conf.logger is None or conf.logger.name != conf.logger_name:
+                conf.logger = logging.getLogger(conf.logger_name)
+            scene = ProxyScene(model, b)
+            body = Body(scene, conf)
+            owners.append({"n_iter": 0, "config": conf, "cheesy": body, "state": body.state,
+                           "exit": ExitCondition(conf.exit_condition, self.tic_rate, scene, conf.__class__.__name__),
+                           "stats": None})
+
+        for t in range(n_ticks):
+            running = [owner for owner in owners if owner["stats"] is None]
+            if not running:
+                break
+            for owner in running:
+                owner["cheesy"].update()
+                owner["n_iter"] += 1
+                if owner["exit"].check(owner):
+                    owner["stats"] = owner["cheesy"].get_stats()
+            model.step()
+
+        for owner in owners:
+            if owner["stats"] is None:
+                owner["stats"] = owner["cheesy"].get_stats()
+        logging.info("Prescreen of " + str(len(configs_)) + " configs in " +
+                     "{0:0.2f}".format(time.time() - t_init) + " sec")
+
+        return [owner["stats"] for owner in owners]
+
+    def select(self, configs_, keep_):
+        """Return the indexes of the keep_ best fraction of the configs, ranked by prescreen loss function"""
+
+        losses = [s["loss"] for s in self.evaluate(configs_)]
+        n_keep = max(1, int(math.ceil(keep_ * len(configs_))))
+
+        return sorted(sorted(range(len(configs_)), key=lambda i: - losses[i])[:n_keep])
+
+
+def get_object_names(config_):
+    """Return the names of the body, muscles and exit condition objects of a config"""
+
+    names = set([config_.body["obj"]])
+    for p in config_.get_muscles_config():
+        names.add(p["obj_1"])
+        names.add(p["obj_2"])
+    if isinstance(config_.exit_condition, dict) and "height" in config_.exit_condition:
+        names.add(config_.exit_condition["height"][0])
+
+    return names
+
+
+def get_correlation(x_, y_):
+    """Return the Pearson and Spearman correlation coefficients of two lists of values"""
+
+    x = np.asarray(x_, dtype=float)
+    y = np.asarray(y_, dtype=float)
+    if len(x) < 2 or np.std(x) == 0. or np.std(y) == 0.:
+        return {"n": len(x), "pearson": float("nan"), "spearman": float("nan")}
+    rank_x = np.argsort(np.argsort(x))
+    rank_y = np.argsort(np.argsort(y))
+
+    return {"n": len(x), "pearson": float(np.corrcoef(x, y)[0, 1]),
+            "spearman": float(np.corrcoef(rank_x, rank_y)[0, 1])}
+
+
+def compare_results(results_path_, model_path_, n_substeps_=16):
+    """Prescreen the configs of a combined results file of LocalSim and return the correlation between the
+    prescreen and the Blender loss functions"""
+
+    f = open(results_path_, 'rb')
+    res_list = pickle.load(f)
+    f.close()
+
+    configs = []
+    blender_losses = []
+    for res in res_list:
+        results = res["results"]
+        if isinstance(results, dict) and "stats" in results and "config" in results:
+            configs.append(results["config"])
+            blender_losses.append(results["stats"]["loss"])
+    if not configs:
+        logging.error("No config with a loss function in " + results_path_)
+        return None
+
+    ps = Prescreen(model_path_, n_substeps_)
+    losses = [s["loss"] for s in ps.evaluate(configs)]
+    corr = get_correlation(losses, blender_losses)
+    logging.info("Prescreen vs Blender loss on " + str(corr["n"]) + " simulations: Pearson = " +
+                 "{0:0.3f}".format(corr["pearson"]) + ", Spearman = " + "{0:0.3f}".format(corr["spearman"]))
+
+    return corr
+
+
+if __name__ == '__main__':
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Prescreen configs on a reduced-order model, or compare the "
+                                                 "prescreen with the Blender results of a .qsr file")
+    parser.add_argument("inputs", nargs="+", help="Config names or a combined results file (.qsr)")
+    parser.add_argument("-m", "--model", default=root + "/mdl/dog_vert.blend", help="Blender model")
+    parser.add_argument("-s", "--substeps", type=int, default=16, help="Physics substeps per logic tick")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.inputs[0].endswith(".qsr"):
+        compare_results(args.inputs[0], args.model, args.substeps)
+    else:
+        prescreen = Prescreen(args.model, args.substeps)
+        for name, stats in zip(args.inputs, prescreen.evaluate([build_config(n) for n in args.inputs])):
+            logging.info(name + ": " + str(stats))
@@ -0,0 +1,167 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+import collections
+import math
+import time
+
+
+class PhaseTimer:
+    """
+    Measure the duration of consecutive phases of a script, like the Blender startup before the first tick.
+    Usage:
+            timer = PhaseTimer()
+            load_things()
+            timer.lap("load")
+            build_things()
+            timer.lap("build")
+            phases = timer.get_phases()
+    """
+
+    def __init__(self, t_ref_=None):
+        """Start the first phase at t_ref_ or now"""
+
+        if t_ref_ is None:
+            t_ref_ = time.time()
+        self.t_ref = t_ref_
+        self.t_last = t_ref_
+        self.phases = collections.OrderedDict()
+
+    def lap(self, name_):
+        """Close the current phase under the given name and start the next one"""
+
+        t = time.time()
+        self.phases[name_] = self.phases.get(name_, 0.0) + t - self.t_last
+        self.t_last = t
+
+    def get_total(self):
+        """Return the time elapsed since the reference"""
+
+        return self.t_last - self.t_ref
+
+    def get_phases(self):
+        """Return a dict with phase names as keys and durations in seconds as values"""
+
+        return dict(self.phases)
+
+    def __str__(self):
+
+        return ", ".join([name + ": " + "{0:0.4f}".format(self.phases[name]) + " s" for name in self.phases]) + \
+            " (total: " + "{0:0.4f}".format(self.get_total()) + " s)"
+
+
+class TickProfiler:
+    """
+    Per-tick profiler of the game loop. The duration of each phase of a tick (brain, limbs, power, exit
+    condition, physics between two logic ticks...) is counted in a fixed-size histogram with logarithmic bins,
+    so that the memory and the cost per sample do not depend on the simulation length. The summary gives the
+    count, total, mean, max and percentiles of each phase and its share of the ticks time.
+    Usage:
+            profiler = TickProfiler()
+
+            # At each tick
+            profiler.start_tick(time.time())
+            profiler.add("brain", t_2 - t_1)
+            profiler.end_tick(time.time())
+
+            summary = profiler.get_summary()
+    """
+
+    def __init__(self, n_bins_=60, t_min_=1e-6, t_max_=1.0):
+        """Create the histograms bins from t_min_ to t_max_ seconds. Durations out of this range are counted in
+        the first or last bin"""
+
+        self.n_bins = n_bins_
+        self.log_min = math.log(t_min_)
+        self.scale = n_bins_ / (math.log(t_max_) - self.log_min)
+        self.edges = [math.exp(self.log_min + i / self.scale) for i in range(n_bins_ + 1)]
+        self.hists = collections.OrderedDict()
+        self.totals = dict()
+        self.maxs = dict()
+        self.n_ticks = 0
+        self.t_start = None
+        self.t_end = None
+
+    def add(self, name_, duration_):
+        """Count the duration in seconds of a phase of the current tick"""
+
+        if name_ not in self.hists:
+            self.hists[name_] = [0] * self.n_bins
+            self.totals[name_] = 0.0
+            self.maxs[name_] = 0.0
+        if duration_ > 0.0:
+            i = min(max(int((math.log(duration_) - self.log_min) * self.scale), 0), self.n_bins - 1)
+        else:
+            i = 0
+        self.hists[name_][i] += 1
+        self.totals[name_] += duration_
+        if duration_ > self.maxs[name_]:
+            self.maxs[name_] = duration_
+
+    def start_tick(self, t_):
+        """Start a tick. The time since the end of the previous one is counted as the physics phase: the game
+        engine physics step and everything run outside the logic script"""
+
+        if self.t_end is not None:
+            self.add("physics", t_ - self.t_end)
+        self.t_start = t_
+
+    def end_tick(self, t_):
+        """End a tick and count its total duration"""
+
+        if self.t_start is not None:
+            self.add("tick", t_ - self.t_start)
+        self.t_end = t_
+        self.n_ticks += 1
+
+    def get_percentile(self, name_, q_):
+        """Return an estimate of the q_ percentile of a phase durations: the geometric center of its bin"""
+
+        hist = self.hists[name_]
+        target = q_ / 100.0 * sum(hist)
+        count = 0
+        for i in range(self.n_bins):
+            count += hist[i]
+            if count >= target and count > 0:
+                return math.sqrt(self.edges[i] * self.edges[i + 1])
+
+        return 0.0
+
+    def get_summary(self):
+        """Return a dict with the statistics and the histogram of each phase. The share of a phase is its
+        total time divided by the sum of the ticks and physics times"""
+
+        total = self.totals.get("tick", 0.0) + self.totals.get("physics", 0.0)
+        phases = dict()
+        for name in self.hists:
+            n = sum(self.hists[name])
+            phases[name] = {"n": n, "total": self.totals[name], "mean": self.totals[name] / max(1, n),
+                            "max": self.maxs[name], "p50": self.get_percentile(name, 50),
+                            "p95": self.get_percentile(name, 95),
+                            "share": self.totals[name] / total if total > 0.0 else 0.0,
+                            "hist": list(self.hists[name])}
+
+        return {"n_ticks": self.n_ticks, "edges": list(self.edges), "phases": phases}
+
+    def __str__(self):
+
+        summary = self.get_summary()["phases"]
+
+        return ", ".join([name + ": " + "{0:0.1f}".format(summary[name]["mean"] * 1e6) + " us (p95 " +
+                          "{0:0.1f}".format(summary[name]["p95"] * 1e6) + " us, " +
+                          "{0:0.1f}".format(summary[name]["share"] * 100) + "%)" for name in self.hists])
+
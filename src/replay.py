@@ -0,0 +1,117 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+import struct
+
+import numpy as np
+
+TRACE_MAGIC = b"QCT1"
+TRACE_HEADER = "<4sII"  # magic, number of channels, number of ticks
+
+
+class ControlTrace:
+    """
+    Compact binary trace of the per-tick control signals of the brain. The file is a small header followed by
+    one row of float64 values per tick, so that a replay reproduces the recorded run exactly. A trace can be
+    replayed to drive the muscles without the brain, so that the same gait can be re-simulated with other muscle
+    parameters or fitness functions, and two runs can be compared tick by tick.
+    Usage:
+            trace = ControlTrace(4)
+            trace.write(ctrl_sig)  # at each time-step
+            trace.save("sim.qct")
+
+            trace = ControlTrace.load("sim.qct")
+            ctrl_sig = trace.read()  # at each time-step
+    """
+
+    def __init__(self, n_channels_, n_ticks_=1024):
+        """Create an empty trace of n_channels_ control signals"""
+
+        self.n_channels = n_channels_
+        self.data = np.zeros((max(1, n_ticks_), n_channels_), dtype=np.float64)
+        self.n_ticks = 0
+        self.n_read = 0
+
+    @classmethod
+    def load(cls, path_):
+        """Read a trace file"""
+
+        f = open(path_, 'rb')
+        magic, n_channels, n_ticks = struct.unpack(TRACE_HEADER, f.read(struct.calcsize(TRACE_HEADER)))
+        if magic != TRACE_MAGIC:
+            f.close()
+            raise ValueError(path_ + " is not a control trace file")
+        data = np.fromfile(f, dtype="<f8", count=n_channels * n_ticks)
+        f.close()
+
+        trace = cls(n_channels, 0)
+        trace.data = data.reshape((n_ticks, n_channels)).astype(np.float64)
+        trace.n_ticks = n_ticks
+
+        return trace
+
+    def write(self, ctrl_sig_):
+        """Append the control signals of a time-step. The buffer doubles when it is full"""
+
+        if self.n_ticks == self.data.shape[0]:
+            self.data = np.concatenate([self.data, np.zeros_like(self.data)])
+        self.data[self.n_ticks] = ctrl_sig_
+        self.n_ticks += 1
+
+    def read(self):
+        """Return the control signals of the next time-step as a list. The last ones are held after the end of
+        the trace"""
+
+        if self.n_ticks == 0:
+            return [0.0] * self.n_channels
+
+        i = min(self.n_read, self.n_ticks - 1)
+        self.n_read += 1
+
+        return self.data[i].tolist()
+
+    def get_signals(self):
+        """Return the recorded control signals as a (n_ticks, n_channels) array"""
+
+        return self.data[:self.n_ticks]
+
+    def save(self, path_):
+        """Write the trace file"""
+
+        f = open(path_, 'wb')
+        f.write(struct.pack(TRACE_HEADER, TRACE_MAGIC, self.n_channels, self.n_ticks))
+        self.get_signals().astype("<f8").tofile(f)
+        f.close()
+
+
+def diff_traces(path_1_, path_2_, tol_=0.0):
+    """Compare two trace files tick by tick. Return a dict with the first tick where they differ by more than
+    tol_ (None if they match on their common length), the maximal absolute difference and the lengths"""
+
+    s_1 = ControlTrace.load(path_1_).get_signals()
+    s_2 = ControlTrace.load(path_2_).get_signals()
+    if s_1.shape[1] != s_2.shape[1]:
+        raise ValueError("Traces have different numbers of channels: " + str(s_1.shape[1]) + " and " +
+                         str(s_2.shape[1]))
+
+    n = min(len(s_1), len(s_2))
+    diff = np.abs(s_1[:n] - s_2[:n]).max(axis=1) if s_1.shape[1] else np.zeros(n)
+    ticks = np.nonzero(diff > tol_)[0]
+
+    return {"first_tick": int(ticks[0]) if len(ticks) else None, "max_diff": float(diff.max()) if n else 0.0,
+            "n_ticks": (len(s_1), len(s_2))}
@@ -29,13 +29,35 @@ import socket
 import struct
 import subprocess
 import sys
+import threading
 import time
+import uuid
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 import net
+from payload import get_plain, write_payload, remove_payload
+from placement import CpuSlots
+from config import build_config
+from surrogate import Surrogate, get_config_key
 from rpyc.utils.registry import REGISTRY_PORT
 from rpyc.utils.server import ThreadedServer
 
 
+def get_returncode(status_):
+    """Decode a wait status as a Popen return code: the exit code, or the negative number of the signal which
+    killed the process"""
+
+    if os.WIFSIGNALED(status_):
+        return - os.WTERMSIG(status_)
+    if os.WIFEXITED(status_):
+        return os.WEXITSTATUS(status_)
+
+    return status_
+
+
 class Simulation:
     """
     Main class for high level simulation. It receives a set of simulation options as defined
@@ -67,6 +89,11 @@ class Simulation:
     def start_service(self):
         """Start a service server"""
 
+        # Create the cpu slot map shared by all the simulations of this service
+        if "pinning" in self.opt and self.opt["pinning"]:
+            net.SimService.slots = CpuSlots(self.opt["slot_size"], self.opt["reserved_cores"])
+            net.SimService.slots.reserve_service()
+
         logging.info("Start service server on address: " + str(self.ipaddr) + ":18861")
         self.t = ThreadedServer(net.SimService, port=18861, auto_register=True)
         self.t.start()
@@ -94,6 +121,11 @@ class Simulation:
         time.sleep(1)
         self.sim_time = time.time() - self.t_sim_init
 
+        # Display resources accounting
+        stats = self.sm.get_stats()
+        for key in sorted(stats.keys()):
+            logging.info("Resources on host " + key[0] + " for config " + key[1] + ": " + str(stats[key]))
+
     def run_sim(self):
         """Run a simple one shot simulation"""
 
@@ -117,8 +149,9 @@ class Simulation:
         """Creation and initialization function for the genome and the genetic algorithm. It fixes the
         parameters to use in the algorithm"""
 
-        # Algo parameters
-        self.genome_size = 10
+        # Algo parameters. Each gene scales one of the genome_params of the config
+        conf = build_config(self.opt["config_name"], self.opt.get("config", None))
+        self.genome_size = len(conf.genome_params)
         self.population_size = 20
         self.num_max_generation = 50
         self.mutation_rate = 0.2
@@ -133,6 +166,13 @@ class Simulation:
         self.stop_thresh = 0.01
         self.bf_list = []
 
+        # Create the surrogate of the fitness function, trained on the past simulations of the same config and model
+        self.surrogate = None
+        if "surrogate" in self.opt and self.opt["surrogate"]:
+            key = get_config_key(conf, os.path.basename(self.opt["blender_model"]))
+            self.surrogate = Surrogate(self.opt["root_dir"] + "/save/surrogate_" + self.opt["config_name"] + "_" +
+                                       key + ".pkl")
+
         # Create a genome instance and parametrize it
         genome = G1DList.G1DList(self.genome_size)
         genome.evaluator.set(self.__eval_fct)
@@ -159,6 +199,13 @@ class Simulation:
 
         score = 0.0
 
+        # Use the predicted score of the genomes which are neither promising nor uncertain
+        if self.surrogate is not None:
+            simulate, prediction = self.surrogate.screen(genome.getInternalList())
+            if not simulate:
+                logging.info("Simulation skipped by the surrogate. Predicted score: " + str(prediction))
+                return prediction
+
         # Create a config for the genome
         self.opt["genome"] = genome.getInternalList()
         logging.info(" ---------------- DEBUT SIM -----------")
@@ -168,7 +215,13 @@ class Simulation:
         res_list = self.sm.simulate(sim_list)
 
         # In the result list, we look for the score
-        score = 1
+        results = res_list[0]["results"] if res_list else None
+        if isinstance(results, dict) and "stats" in results:
+            score = results["stats"]["loss"]
+            if self.surrogate is not None:
+                self.surrogate.add(genome.getInternalList(), score)
+        else:
+            logging.error("No loss function in the simulation results. A null score is used")
         logging.info(" ---------------- FIN SIM -----------")
 
         # Return the score result
@@ -183,6 +236,13 @@ class Simulation:
         bi = pop.bestFitness()
         self.bf_list.append(bi.getFitnessScore())
 
+        # Report the simulations saved by the surrogate in this generation
+        if self.surrogate is not None:
+            n_simulated, n_skipped = self.surrogate.get_counts()
+            logging.info("Generation " + str(ga.getCurrentGeneration()) + ": " + str(n_simulated) +
+                         " simulations, " + str(n_skipped) + " saved by the surrogate")
+            self.surrogate.save()
+
         # Return the convergence
         if len(self.bf_list) > self.stop_num_av:
             av = sum(self.bf_list[-self.stop_num_av:]) / self.stop_num_av
@@ -217,20 +277,171 @@ class Simulation:
         logging.error("This simulation is not implemented yet! Exiting...")
 
 
+class LocalSim:
+    """
+    Class for parallel simulations on a single computer. It receives a set of simulation options as defined
+    in the DEF_OPT dict and keeps n_proc_ blenderplayer processes busy with a list of simulations, without
+    registry or service servers.
+    Usage:
+            ls = LocalSim(opt, 4)
+            sim_list = ls.create_sim_list(["DogVertDefConfig", "genome_1.txt", "genome_2.txt"])
+            sim_list = ls.prescreen(sim_list, 0.5)
+            res_list = ls.simulate(sim_list)
+    """
+
+    def __init__(self, opt_, n_proc_=1):
+        """Initialize with CLI options and the number of concurrent processes"""
+
+        self.opt = opt_
+        self.n_proc = max(1, n_proc_)
+        self.dirname = self.opt["root_dir"] + "/save"
+        if not os.path.exists(self.dirname):
+            os.makedirs(self.dirname)
+        self.slots = None
+        if "pinning" in self.opt and self.opt["pinning"]:
+            self.slots = CpuSlots(self.opt["slot_size"], self.opt["reserved_cores"])
+
+        self.rqt = queue.Queue()
+        self.rsp = []
+        self.n_done = 0
+        self.n_sim = 0
+        self.mutex_rsp = threading.Lock()
+
+    def create_sim_list(self, args_):
+        """Create a list of simulation options from config class names and genome files. A genome file
+        contains the genome values separated by spaces, commas or new lines"""
+
+        sim_list = []
+        for arg in args_:
+            opt = dict(self.opt)
+            if os.path.isfile(arg):
+                opt["genome"] = self.read_genome(arg)
+                opt["genome_file"] = arg
+            else:
+                opt["config_name"] = arg
+            sim_list.append(opt)
+
+        return sim_list
+
+    def read_genome(self, filename_):
+        """Read a genome file into a list of floats"""
+
+        f = open(filename_, 'r')
+        genome = [float(g) for g in f.read().replace(",", " ").split()]
+        f.close()
+
+        return genome
+
+    def prescreen(self, sim_list, keep_):
+        """Evaluate the simulations of the list on the reduced-order model of prescreen.py and return only the
+        keep_ best fraction of them, in the list order"""
+
+        if keep_ >= 1.0 or not sim_list:
+            return sim_list
+
+        from prescreen import Prescreen
+
+        configs = [build_config(opt["config_name"], opt.get("config", None), opt.get("genome", None))
+                   for opt in sim_list]
+        kept = Prescreen(self.opt["blender_model"]).select(configs, keep_)
+        logging.info("Prescreen kept " + str(len(kept)) + " of " + str(len(sim_list)) + " simulations")
+
+        return [sim_list[i] for i in kept]
+
+    def __worker(self):
+        """Simulation thread. Processes requests until the request queue is empty"""
+
+        while True:
+            try:
+                i, opt = self.rqt.get_nowait()
+            except queue.Empty:
+                return
+
+            sim = {"index": i, "config_name": opt["config_name"]}
+            if "genome_file" in opt:
+                sim["genome_file"] = opt["genome_file"]
+            res = None
+            try:
+                bs = BlenderSim(opt, self.slots)
+                bs.start_blenderplayer()
+                res = bs.get_results()
+                res["sim"] = sim
+            except Exception as e:
+                logging.exception("Simulation " + str(i) + " failed: " + str(sim))
+                res = {"results": "ERROR LocalSim: " + str(e), "meta": dict(), "sim": sim}
+            finally:
+                self.mutex_rsp.acquire()
+                if res is not None:
+                    self.rsp.append(res)
+                self.n_done += 1
+                logging.info("Simulation " + str(i) + " finished: " + str(sim) + " " +
+                             str(res["meta"] if res is not None else None))
+                self.__print_progress()
+                self.mutex_rsp.release()
+
+    def __print_progress(self):
+        """Display a progress bar on stdout"""
+
+        width = 40
+        n_bar = int(width * self.n_done / max(1, self.n_sim))
+        sys.stdout.write("\r[" + "#" * n_bar + "-" * (width - n_bar) + "] " + str(self.n_done) + "/" +
+                         str(self.n_sim) + " simulations")
+        if self.n_done == self.n_sim:
+            sys.stdout.write("\n")
+        sys.stdout.flush()
+
+    def simulate(self, sim_list):
+        """Perform the simulations of the list with n_proc concurrent processes, write the combined results
+        file and return the results sorted in the list order"""
+
+        self.rsp = []
+        self.n_done = 0
+        self.n_sim = len(sim_list)
+        for i, opt in enumerate(sim_list):
+            self.rqt.put((i, opt))
+
+        logging.info("Start " + str(self.n_sim) + " local simulations on " + str(self.n_proc) + " processes")
+        t_init = time.time()
+        self.__print_progress()
+        threads = []
+        for i in range(min(self.n_proc, self.n_sim)):
+            t = threading.Thread(target=self.__worker)
+            t.daemon = True
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+
+        res_list = sorted(self.rsp, key=lambda r: r["sim"]["index"])
+        filename = self.dirname + "/local_" + datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S") + ".qsr"
+        f = open(filename, 'wb')
+        pickle.dump(res_list, f)
+        f.close()
+        logging.info("Local simulations finished in " + "{0:0.2f}".format(time.time() - t_init) +
+                     " sec. Combined results saved in " + filename)
+
+        return res_list
+
+
 class BlenderSim:
     """
     Main class for low level simulation. It receives a set of simulation options as defined
     in the DEF_OPT dict. It can only start a simulation via a batch subprocess on localhost.
     """
 
-    def __init__(self, opt_):
-        """Initialize with  options"""
+    def __init__(self, opt_, slots_=None):
+        """Initialize with  options. If a CpuSlots map is given, blenderplayer is pinned on one of its slots"""
 
         self.opt = opt_
+        self.slots = slots_
         self.dirname = self.opt["root_dir"] + "/save"
         if not os.path.exists(self.dirname):
             os.makedirs(self.dirname)
 
+        # Per-run metadata sent back with the results
+        self.meta = {"host": socket.gethostname(), "config_name": str(self.opt["config_name"]),
+                     "placement": None, "resources": dict(), "timings": dict()}
+
     def start_blenderplayer(self):
         """Call blenderplayer via command line subprocess"""
 
@@ -247,22 +458,62 @@ class BlenderSim:
             "-d",
         ])
 
-        filename = "sim_" + datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S") + ".qsm"
+        filename = "sim_" + datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S") + "_" + \
+            uuid.uuid4().hex[:8] + ".qsm"
         self.opt["save_path"] = self.dirname + "/" + filename
 
         if self.opt["fullscreen"]:
             args.extend(["-f"])
         args.extend([self.opt["blender_model"]])
         args.extend(["-"])
-        params = {'config_name': self.opt["config_name"] + "()",
-                  'logfile': str(self.opt["logfile"]),
-                  'filename': str(self.opt["save_path"])}
-        args.extend([str(params)])
+        payload = write_payload(self.get_payload_params(), self.dirname)
+        args.extend([payload])
         args.extend(["FROM_START.PY"])
 
-        # Start batch process and quit
+        # Pin the process on a cpu slot
+        placement = None
+        if self.slots is not None:
+            placement = self.slots.acquire()
+            prefix = self.slots.get_prefix(placement)
+            args = prefix + args
+
+            # Only a placement actually applied is recorded
+            if prefix:
+                self.meta["placement"] = placement
+
+        # Start batch process, account its resources and quit
         logging.debug("Subprocess call: " + str(args))
-        subprocess.call(args)
+        try:
+            t_start = time.time()
+            process = subprocess.Popen(args)
+            pid, status, rusage = os.wait4(process.pid, 0)
+            process.returncode = get_returncode(status)
+            self.meta["resources"] = {"wall_time": time.time() - t_start,
+                                      "user_time": rusage.ru_utime,
+                                      "sys_time": rusage.ru_stime,
+                                      "max_rss": rusage.ru_maxrss,
+                                      "status": process.returncode}
+        finally:
+            remove_payload(payload)
+            if self.slots is not None:
+                self.slots.release(placement)
+
+    def get_payload_params(self):
+        """Return the parameters handed over to Blender through the payload file. Values are copied deeply so
+        that options received as remote references can be serialized"""
+
+        params = {"config_name": str(self.opt["config_name"]),
+                  "logfile": str(self.opt["logfile"]),
+                  "filename": str(self.opt["save_path"]),
+                  "config": dict(),
+                  "genome": None,
+                  "t_spawn": time.time()}
+        if "config" in self.opt and self.opt["config"]:
+            params["config"] = get_plain(self.opt["config"])
+        if "genome" in self.opt and self.opt["genome"] is not None:
+            params["genome"] = [float(g) for g in self.opt["genome"]]
+
+        return params
 
     def start_blender_with_player(self):
         """Call blender via command line subprocess and start the game engine simulation"""
@@ -295,6 +546,16 @@ class BlenderSim:
         logging.debug("Subprocess call: " + str(args))
         subprocess.call(args)
 
+    def __add_timings(self, timings_):
+        """Merge the phase timings measured in Blender with the process resources. The shutdown phase is the
+        part of the process wall time not covered by the Blender phases: it includes the results file dump and
+        the blenderplayer exit"""
+
+        self.meta["timings"] = dict(timings_)
+        if "wall_time" in self.meta["resources"]:
+            phases = [self.meta["timings"][p] for p in ["load", "init", "ticks", "save"] if p in self.meta["timings"]]
+            self.meta["timings"]["shutdown"] = max(0.0, self.meta["resources"]["wall_time"] - sum(phases))
+
     def get_results(self):
         """This function reads the file saved in Blender at the end of the simulation to retrieve results"""
 
@@ -305,7 +566,9 @@ class BlenderSim:
             f = open(self.opt["save_path"], 'rb')
             results = pickle.load(f)
             f.close()
+            if isinstance(results, dict) and "timings" in results:
+                self.__add_timings(results["timings"])
         else:
             results = "ERROR BlenderSim.get_results() : Can't open the file " + self.opt[
                 "save_path"] + ".\nThe file doesn't exist."
-        return results
+        return {"results": results, "meta": self.meta}
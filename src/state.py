@@ -0,0 +1,125 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+import numpy as np
+from mathutils import Vector as vec
+
+
+class SceneState:
+    """
+    Per time-step snapshot of the game objects used by the controller. The transform, linear velocity and
+    angular velocity of each registered object are read once per time-step by update(); muscles, power and
+    distance computations, exit conditions and telemetry then read this snapshot instead of calling the game
+    engine again. Values are available as mathutils objects and, on request, as NumPy arrays.
+    Usage:
+            state = SceneState(scene)
+            i = state.register(scene.objects["obj_body"])
+
+            # At the beginning of each time-step
+            state.update()
+            p = state.get_point(i, vec((0, 0, 1)))
+            v = state.get_velocity(i, vec((0, 0, 1)))
+    """
+
+    def __init__(self, scene_):
+        """Class initialization"""
+
+        self.n_iter = 0
+        self.scene = scene_
+        self.objects = []
+        self.index = dict()
+        self.n_objects = 0
+
+        # mathutils snapshot
+        self.transforms = []
+        self.orientations = []
+        self.positions = []
+        self.lin_vels = []
+        self.ang_vels = []
+
+        # NumPy snapshot, converted lazily
+        self.arrays_iter = -1
+        self.rot = np.zeros((0, 3, 3))
+        self.pos = np.zeros((0, 3))
+        self.lin_vel = np.zeros((0, 3))
+        self.ang_vel = np.zeros((0, 3))
+
+    def register(self, obj_):
+        """Add a game object to the snapshot if needed and return its index"""
+
+        if obj_.name not in self.index:
+            self.index[obj_.name] = self.n_objects
+            self.objects.append(obj_)
+            self.transforms.append(obj_.worldTransform.copy())
+            self.orientations.append(obj_.worldOrientation.copy())
+            self.positions.append(vec(obj_.worldPosition))
+            self.lin_vels.append(vec(obj_.worldLinearVelocity))
+            self.ang_vels.append(vec(obj_.worldAngularVelocity))
+            self.n_objects += 1
+            self.arrays_iter = -1
+
+        return self.index[obj_.name]
+
+    def update(self):
+        """Read the state of each registered object once"""
+
+        for i, obj in enumerate(self.objects):
+            self.transforms[i] = obj.worldTransform.copy()
+            self.orientations[i] = obj.worldOrientation.copy()
+            self.positions[i] = vec(obj.worldPosition)
+            self.lin_vels[i] = vec(obj.worldLinearVelocity)
+            self.ang_vels[i] = vec(obj.worldAngularVelocity)
+        self.n_iter += 1
+
+    def get_arrays(self):
+        """Return the snapshot as (rotations, positions, linear velocities, angular velocities) NumPy arrays of
+        shapes (n, 3, 3) and (n, 3). They are converted at most once per time-step"""
+
+        if self.arrays_iter != self.n_iter:
+            if self.rot.shape[0] != self.n_objects:
+                self.rot = np.zeros((self.n_objects, 3, 3))
+                self.pos = np.zeros((self.n_objects, 3))
+                self.lin_vel = np.zeros((self.n_objects, 3))
+                self.ang_vel = np.zeros((self.n_objects, 3))
+            for i in range(self.n_objects):
+                self.rot[i] = self.orientations[i]
+                self.pos[i] = self.positions[i]
+                self.lin_vel[i] = self.lin_vels[i]
+                self.ang_vel[i] = self.ang_vels[i]
+            self.arrays_iter = self.n_iter
+
+        return self.rot, self.pos, self.lin_vel, self.ang_vel
+
+    def get_position(self, name_):
+        """Return the world position of an object given its name. Objects which are not registered yet are
+        added to the snapshot"""
+
+        if name_ not in self.index:
+            self.register(self.scene.objects[name_])
+
+        return self.positions[self.index[name_]]
+
+    def get_point(self, i_, point_):
+        """Return the world coordinates of a point given in the local coordinates of object i_"""
+
+        return self.transforms[i_] * point_
+
+    def get_velocity(self, i_, point_):
+        """Return the world velocity of a point given in the local coordinates of object i_. It is derived from
+        the snapshot as v + w x (R.p), as getVelocity() would return it"""
+
+        return self.lin_vels[i_] + self.ang_vels[i_].cross(self.orientations[i_] * point_)
@@ -0,0 +1,204 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+import hashlib
+import logging
+import os
+import pickle
+
+import numpy as np
+
+
+class GaussianProcess:
+    """
+    Gaussian process regression with a squared exponential kernel. Targets are normalized, the length scale is
+    the median distance between the training inputs and the noise is a fraction of the targets variance.
+    Usage:
+            gp = GaussianProcess()
+            gp.fit(x, y)
+            mean, std = gp.predict(x_new)
+    """
+
+    def __init__(self, noise_=0.05):
+        """Class initialization"""
+
+        self.noise = noise_
+        self.x = None
+        self.alpha = None
+        self.chol = None
+        self.length = 1.0
+        self.y_mean = 0.0
+        self.y_std = 1.0
+
+    def kernel(self, a_, b_):
+        """Return the kernel matrix between the rows of a_ and b_"""
+
+        d2 = np.sum(a_ ** 2, axis=1)[:, np.newaxis] + np.sum(b_ ** 2, axis=1)[np.newaxis, :] - 2 * np.dot(a_, b_.T)
+
+        return np.exp(- np.maximum(d2, 0.) / (2 * self.length ** 2))
+
+    def fit(self, x_, y_):
+        """Train on the inputs x_ (n, d) and the targets y_ (n)"""
+
+        self.x = np.asarray(x_, dtype=float)
+        y = np.asarray(y_, dtype=float)
+        self.y_mean = np.mean(y)
+        self.y_std = np.std(y)
+        if self.y_std == 0.:
+            self.y_std = 1.0
+
+        d2 = np.sum((self.x[:, np.newaxis, :] - self.x[np.newaxis, :, :]) ** 2, axis=2)
+        d = np.sqrt(d2[np.triu_indices(len(self.x), 1)])
+        d = d[d > 0]
+        self.length = np.median(d) if len(d) else 1.0
+
+        k = self.kernel(self.x, self.x) + self.noise * np.eye(len(self.x))
+        self.chol = np.linalg.cholesky(k)
+        self.alpha = np.linalg.solve(self.chol.T, np.linalg.solve(self.chol, (y - self.y_mean) / self.y_std))
+
+    def predict(self, x_):
+        """Return the predicted mean and standard deviation at the inputs x_ (m, d)"""
+
+        k_s = self.kernel(np.asarray(x_, dtype=float), self.x)
+        mean = np.dot(k_s, self.alpha) * self.y_std + self.y_mean
+        v = np.linalg.solve(self.chol, k_s.T)
+        var = np.maximum(1. - np.sum(v ** 2, axis=0), 0.)
+
+        return mean, np.sqrt(var) * self.y_std
+
+
+class Surrogate:
+    """
+    Surrogate of the fitness function of the genetic algorithm. It trains a GaussianProcess on all the
+    simulated (genome, fitness) pairs, which can be stored in a file to be reused by the next optimizations of
+    the same config. A genome is simulated only if it is promising (its upper confidence bound is above the
+    quantile_ of the known fitnesses) or uncertain (its predicted std is above uncertainty_ times the std of the
+    known fitnesses); otherwise its predicted fitness is used.
+    Usage:
+            sg = Surrogate(root + "/save/surrogate_DogVertDefConfig_" + get_config_key(config) + ".pkl")
+            simulate, fitness = sg.screen(genome)
+            if simulate:
+                fitness = simulate_genome(genome)
+                sg.add(genome, fitness)
+            sg.save()
+    """
+
+    def __init__(self, path_=None, min_samples_=20, kappa_=1.0, quantile_=0.5, uncertainty_=0.5,
+                 max_samples_=500):
+        """Class initialization. Samples stored in path_ are loaded"""
+
+        self.path = path_
+        self.min_samples = min_samples_
+        self.kappa = kappa_
+        self.quantile = quantile_
+        self.uncertainty = uncertainty_
+        self.max_samples = max_samples_
+        self.x = []
+        self.y = []
+        self.gp = GaussianProcess()
+        self.trained = 0
+        self.n_simulated = 0
+        self.n_skipped = 0
+        self.load()
+
+    def load(self):
+        """Load the stored (genome, fitness) pairs, if any"""
+
+        if self.path is None or not os.path.isfile(self.path):
+            return
+
+        f = open(self.path, 'rb')
+        samples = pickle.load(f)
+        f.close()
+        self.x = [list(g) for g in samples["x"]]
+        self.y = list(samples["y"])
+        logging.info("Surrogate loaded " + str(len(self.y)) + " samples from " + self.path)
+
+    def save(self):
+        """Store the (genome, fitness) pairs. The file is renamed once written so that concurrent readers never see
+        a partial file"""
+
+        if self.path is None:
+            return
+
+        tmp_path = self.path + "." + str(os.getpid())
+        f = open(tmp_path, 'wb')
+        pickle.dump({"x": self.x, "y": self.y}, f)
+        f.close()
+        os.rename(tmp_path, self.path)
+
+    def add(self, genome_, fitness_):
+        """Add a simulated (genome, fitness) pair"""
+
+        self.x.append([float(g) for g in genome_])
+        self.y.append(float(fitness_))
+        self.n_simulated += 1
+
+    def predict(self, genome_):
+        """Return the predicted fitness mean and standard deviation of a genome, or None before the surrogate
+        has enough samples"""
+
+        n = len(self.y)
+        if n < self.min_samples:
+            return None
+
+        if self.trained != n:
+            start = max(0, n - self.max_samples)
+            self.gp.fit(self.x[start:], self.y[start:])
+            self.trained = n
+        mean, std = self.gp.predict([[float(g) for g in genome_]])
+
+        return float(mean[0]), float(std[0])
+
+    def screen(self, genome_):
+        """Return a (simulate, fitness) tuple. If simulate is False, fitness is the predicted fitness"""
+
+        pred = self.predict(genome_)
+        if pred is None:
+            return True, None
+
+        mean, std = pred
+        y = np.array(self.y[-self.max_samples:])
+        promising = mean + self.kappa * std >= np.percentile(y, 100 * self.quantile)
+        uncertain = std > self.uncertainty * np.std(y)
+        if promising or uncertain:
+            return True, mean
+
+        self.n_skipped += 1
+
+        return False, mean
+
+    def get_counts(self):
+        """Return the numbers of simulated and skipped genomes since the last call and reset them"""
+
+        counts = (self.n_simulated, self.n_skipped)
+        self.n_simulated = 0
+        self.n_skipped = 0
+
+        return counts
+
+
+def get_config_key(config_, model_=""):
+    """Hash the parameters of a config which the fitness of a genome depends on, before the genome is applied, and
+    the model name. Samples of a surrogate are only valid for one key"""
+
+    desc = [model_, config_.muscle_type, config_.genome_params, config_.get_muscles_config(),
+            [(k, config_.brain[k]) for k in sorted(config_.brain.keys()) if k != "name"], config_.body["obj"],
+            config_.physics, config_.update_periods, config_.brain_output, config_.exit_condition]
+
+    return hashlib.md5(repr(desc).encode("utf-8")).hexdigest()
@@ -0,0 +1,112 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+import collections
+import numpy as np
+
+
+class Telemetry:
+    """
+    Structured telemetry of the controller: per-tick numeric samples are written in preallocated ring buffers,
+    one per channel, instead of being formatted in log strings. Channels are only created up to the telemetry
+    level and samples are only taken every decimation_ ticks: with level 0, the whole cost in the tick loop is
+    the test of the on attribute. The last n_samples_ samples of each channel are written in a .npz file at the
+    end of the run.
+    Usage:
+            telemetry = Telemetry(level_=2, n_samples_=10000, decimation_=10)
+            telemetry.add_channel("ctrl_sig", 4)
+            telemetry.add_channel("muscle_force", n_muscles, 2)
+
+            # At the beginning of each time-step
+            telemetry.tick()
+            if telemetry.on:
+                telemetry.record("ctrl_sig", ctrl_sig)
+
+            # At the end of the run
+            telemetry.flush("sim_telemetry.npz")
+    """
+
+    def __init__(self, level_=0, n_samples_=10000, decimation_=1):
+        """Class initialization"""
+
+        self.level = level_
+        self.n_samples = max(1, n_samples_)
+        self.decimation = max(1, decimation_)
+        self.n_iter = 0
+        self.n_records = 0
+        self.index = 0
+        self.on = False
+        self.ticks = np.zeros(self.n_samples, dtype=int)
+        self.channels = collections.OrderedDict()
+        self.labels = dict()
+
+    def add_channel(self, name_, width_, level_=1, labels_=None):
+        """Allocate the ring buffer of a channel of width_ values per sample if the telemetry level is at least
+        level_. Return True if the channel has been created"""
+
+        if self.level < level_:
+            return False
+
+        self.channels[name_] = np.zeros((self.n_samples, width_))
+        if labels_ is not None:
+            self.labels[name_] = list(labels_)
+
+        return True
+
+    def has_channel(self, name_):
+        """Return True if the channel is recorded"""
+
+        return name_ in self.channels
+
+    def tick(self):
+        """Start a new time-step and decide if it is sampled"""
+
+        self.on = self.level > 0 and self.n_iter % self.decimation == 0
+        if self.on:
+            self.index = self.n_records % self.n_samples
+            self.ticks[self.index] = self.n_iter
+            self.n_records += 1
+        self.n_iter += 1
+
+    def record(self, name_, values_):
+        """Write the sample of a channel for the current time-step"""
+
+        self.channels[name_][self.index] = values_
+
+    def get_channel(self, name_):
+        """Return the samples of a channel in chronological order"""
+
+        return self.unroll(self.channels[name_])
+
+    def unroll(self, buffer_):
+        """Return the valid part of a ring buffer in chronological order"""
+
+        if self.n_records <= self.n_samples:
+            return buffer_[:self.n_records]
+
+        return np.roll(buffer_, - (self.n_records % self.n_samples), axis=0)
+
+    def flush(self, path_):
+        """Write the recorded samples of all channels and the corresponding ticks in a .npz file"""
+
+        arrays = {"tick": self.unroll(self.ticks)}
+        for name in self.channels:
+            arrays[name] = self.get_channel(name)
+        for name in self.labels:
+            arrays[name + "_labels"] = np.array(self.labels[name])
+        np.savez(path_, **arrays)
@@ -0,0 +1,75 @@
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "mock"))
+
+import numpy as np
+import bge
+
+from body import Body
+from config import build_config
+
+CONFIGS = ["DogVertDefConfig", "MouseDefConfig"]
+
+
+def run_body(config_name_, n_ticks_, overrides_=None):
+    """Simulate a config on the mock engine. Return the body and the final positions and velocities of the scene
+    objects"""
+
+    conf = build_config(config_name_, overrides_)
+    conf.logger = logging.getLogger("test")
+    scene = bge.make_scene(conf)
+    body = Body(scene, conf)
+    for i in range(n_ticks_):
+        body.update()
+        scene.step()
+
+    return body, np.array([list(o.worldPosition) + list(o.worldLinearVelocity) for o in scene.objects])
+
+
+class TestBody(unittest.TestCase):
+
+    def test_replay(self):
+        """A run driven by a recorded control trace reproduces the recorded run exactly"""
+
+        dirname = tempfile.mkdtemp()
+        try:
+            for name in CONFIGS:
+                path = os.path.join(dirname, name + ".qct")
+                body, recorded = run_body(name, 50, {"trace": {"mode": "record", "path": path}})
+                self.assertEqual(body.save_trace(), path)
+                replay, replayed = run_body(name, 50, {"trace": {"mode": "replay", "path": path}})
+                self.assertIsNone(replay.brain)
+                np.testing.assert_array_equal(replayed, recorded)
+                self.assertEqual(replay.get_stats(), body.get_stats())
+        finally:
+            shutil.rmtree(dirname)
+
+    def test_telemetry(self):
+        """Recording the telemetry does not change the run"""
+
+        for name in CONFIGS:
+            ref_body, ref = run_body(name, 50)
+            body, states = run_body(name, 50, {"telemetry": {"level": 2, "size": 16, "decimation": 3}})
+            np.testing.assert_array_equal(states, ref)
+            self.assertEqual(body.telemetry.get_channel("muscle_force").shape, (16, len(body.get_muscles())))
+
+    def test_muscle_bank(self):
+        """With force accumulation, the muscle bank gives the run of the muscle objects to round-off"""
+
+        for name in CONFIGS:
+            ref_body, ref = run_body(name, 5, {"force_accumulation": True})
+            body, states = run_body(name, 5, {"force_accumulation": True, "muscle_bank": True})
+            self.assertIsNotNone(body.bank)
+            np.testing.assert_allclose(states, ref, rtol=1e-12, atol=1e-12)
+            self.assertAlmostEqual(body.work, ref_body.work, 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
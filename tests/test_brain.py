@@ -0,0 +1,138 @@
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "mock"))
+
+import numpy as np
+
+from brain import DEFAULT_COUPLING, CpgCache, Matsuoka
+from config import build_config
+
+
+def get_outputs(osc_, n_ticks_):
+    """Return the (n_ticks_, n_osc) outputs of the first network of an oscillator updated n_ticks_ times"""
+
+    ys = np.zeros((n_ticks_, osc_.n_osc))
+    for i in range(n_ticks_):
+        osc_.update()
+        ys[i] = osc_.y[:, 0]
+
+    return ys
+
+
+def get_euler_outputs(config_, n_ticks_):
+    """Return the outputs of the explicit Euler loop of the 4 oscillators network, written as before the
+    vectorization of the Matsuoka class"""
+
+    b = config_.brain
+    A = b["aa"] * DEFAULT_COUPLING
+    x = np.array([[0.1], [0.1], [0.2], [0.2]])
+    v = x.copy()
+    y = x.copy()
+    ys = np.zeros((n_ticks_, 4))
+    for t in range(n_ticks_):
+        for i in range(int(b["time_interval"] / b["h"])):
+            x += b["h"] * (- x + b["c"] - A.dot(y) - b["b"] * v) / b["tau"]
+            v += b["h"] * (- v + y) / b["T"]
+            for k in range(4):
+                y[k] = max(0., x[k])
+        ys[t] = y[:, 0]
+
+    return ys
+
+
+class TestMatsuoka(unittest.TestCase):
+
+    def test_euler(self):
+        """The default integration follows the Euler reference loop to round-off. It is not bit-identical: the
+        in-place operations are ordered differently"""
+
+        conf = build_config("DogVertDefConfig")
+        ys = get_outputs(Matsuoka(None, conf), 2000)
+        np.testing.assert_allclose(ys, get_euler_outputs(conf, 2000), rtol=0, atol=1e-12)
+
+    def test_batch(self):
+        """Each network of a batch with per-network parameters follows the network integrated alone"""
+
+        params = {"tau": [0.01, 0.012, 0.008], "b": [20.5, 18., 22.], "aa": [3., 2.5, 3.5]}
+        conf = build_config("DogVertDefConfig", {"brain": params})
+        batch = Matsuoka(None, conf, 3)
+        for i in range(500):
+            batch.update()
+        for j in range(3):
+            single_params = dict([(k, params[k][j]) for k in params])
+            single = Matsuoka(None, build_config("DogVertDefConfig", {"brain": single_params}))
+            for i in range(500):
+                single.update()
+            np.testing.assert_allclose(batch.x[:, j], single.x[:, 0], rtol=1e-12, atol=1e-12)
+            np.testing.assert_allclose(batch.v[:, j], single.v[:, 0], rtol=1e-12, atol=1e-12)
+
+    def test_sparse_coupling(self):
+        """A coupling list of the default network gives the dense coupling results"""
+
+        coupling = [(i, j, DEFAULT_COUPLING[i, j]) for i in range(4) for j in range(4) if DEFAULT_COUPLING[i, j]]
+        conf = build_config("DogVertDefConfig", {"brain": {"coupling": coupling}})
+        dense = get_outputs(Matsuoka(None, build_config("DogVertDefConfig")), 2000)
+        sparse = get_outputs(Matsuoka(None, conf), 2000)
+        np.testing.assert_allclose(sparse, dense, rtol=0, atol=1e-12)
+
+    def test_integrators(self):
+        """Each integrator converges to an RK4 reference computed with a very small step"""
+
+        conf = build_config("DogVertDefConfig", {"brain": {"integrator": "rk4", "h": 2e-5}})
+        ref = get_outputs(Matsuoka(None, conf), 300)
+        for integrator in ["euler", "semi_implicit", "rk4"]:
+            errors = []
+            for h in [1e-3, 1e-4]:
+                conf = build_config("DogVertDefConfig", {"brain": {"integrator": integrator, "h": h}})
+                errors.append(np.max(np.abs(get_outputs(Matsuoka(None, conf), 300) - ref)))
+            self.assertLess(errors[1], errors[0], integrator)
+        conf = build_config("DogVertDefConfig", {"brain": {"integrator": "adaptive"}})
+        self.assertLess(np.max(np.abs(get_outputs(Matsuoka(None, conf), 300) - ref)), 1e-3)
+
+
+class TestCpgCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.dirname = tempfile.mkdtemp()
+        self.conf = build_config("DogVertDefConfig")
+        self.conf.logger = logging.getLogger("test")
+
+    def tearDown(self):
+
+        shutil.rmtree(self.dirname)
+
+    def test_outputs(self):
+        """The cache gives the integrated outputs exactly during the transient and within 3e-3 afterwards"""
+
+        cache = CpgCache(self.conf, self.dirname)
+        cache.build()
+        ys = get_outputs(Matsuoka(None, self.conf), 10000)
+        cached = np.array([cache.get(i)[:, 0] for i in range(10000)])
+        n = len(cache.transient)
+        np.testing.assert_array_equal(cached[:n], ys[:n])
+        self.assertLess(np.max(np.abs(cached[n:] - ys[n:])), 3e-3)
+
+    def test_save_load(self):
+        """The tables loaded from disk are the ones built"""
+
+        cache = CpgCache(self.conf, self.dirname)
+        self.assertFalse(cache.load())
+        cache.build()
+        cache.save()
+        loaded = CpgCache(self.conf, self.dirname)
+        self.assertTrue(loaded.load())
+        np.testing.assert_array_equal(loaded.transient, cache.transient)
+        np.testing.assert_array_equal(loaded.cycle, cache.cycle)
+        self.assertEqual(loaded.period, cache.period)
+
+
+if __name__ == '__main__':
+    unittest.main()
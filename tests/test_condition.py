@@ -0,0 +1,59 @@
+##
+# Mouse Locomotion Simulation
+#
+# Human Brain Project SP10
+#
+# This project provides the user with a framework based on Blender allowing:
+#  - Edition of a 3D model
+#  - Edition of a physical controller model (torque-based or muscle-based)
+#  - Edition of a brain controller model (oscillator-based or neural network-based)
+#  - Simulation of the model
+#  - Optimization of the parameters in distributed cloud simulations
+#
+# File created by: Gabriel Urbain <gabriel.urbain@ugent.be>. February 2016
+# Modified by: Dimitri Rodarie
+##
+
+
+
+import os
+import sys
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "mock"))
+
+import bge
+from bge import GameObject, Scene
+from mathutils import Vector
+
+from condition import ExitCondition
+
+
+class TestExitCondition(unittest.TestCase):
+
+    def test_legacy_bge_string(self):
+        """A string condition written for the scope of main.py can use bge"""
+
+        scene = Scene([GameObject("obj_body", (0.0, 0.0, 1.0))])
+        bge.logic.scene = scene
+        cond = ExitCondition("bge.logic.getCurrentScene().objects['obj_body'].worldPosition.z < -1.8")
+        owner = {"n_iter": 0}
+        self.assertFalse(cond.check(owner))
+        scene.objects["obj_body"].worldPosition = Vector((0.0, 0.0, -2.0))
+        self.assertTrue(cond.check(owner))
+
+    def test_missing_height_object(self):
+        """The object of a height predicate is checked once at init"""
+
+        scene = Scene([GameObject("obj_body", (0.0, 0.0, 1.0))])
+        ExitCondition({"height": ("obj_body", -1.8)}, 60., scene, "TestConfig")
+        with self.assertRaises(ValueError) as context:
+            ExitCondition({"height": ("obj_spine", -1.8)}, 60., scene, "TestConfig")
+        self.assertIn("TestConfig", str(context.exception))
+        self.assertIn("obj_spine", str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
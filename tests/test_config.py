@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "mock"))
+
+import numpy as np
+
+from brain import Matsuoka
+from config import build_config
+
+
+class TestGenome(unittest.TestCase):
+
+    def test_neutral_genome(self):
+        """A genome of 0.5 genes keeps the config values"""
+
+        ref = build_config("DogVertDefConfig")
+        conf = build_config("DogVertDefConfig", None, [0.5] * len(ref.genome_params))
+        self.assertEqual(conf.brain, ref.brain)
+        self.assertEqual(conf.get_muscles_config(), ref.get_muscles_config())
+
+    def test_genome_size(self):
+        """A genome of the wrong size is rejected"""
+
+        ref = build_config("DogVertDefConfig")
+        with self.assertRaises(ValueError):
+            build_config("DogVertDefConfig", None, [0.5] * (len(ref.genome_params) + 1))
+
+    def test_brain_genes(self):
+        """Each brain gene changes the oscillators state"""
+
+        ref = build_config("DogVertDefConfig")
+        osc = Matsuoka(None, ref)
+        for t in range(300):
+            osc.update()
+        for i, name in enumerate(ref.genome_params):
+            if not name.startswith("brain."):
+                continue
+            genome = [0.5] * len(ref.genome_params)
+            genome[i] = 1.
+            scaled = Matsuoka(None, build_config("DogVertDefConfig", None, genome))
+            for t in range(300):
+                scaled.update()
+            self.assertFalse(np.allclose(scaled.x, osc.x), name + " has no effect")
+
+
+if __name__ == '__main__':
+    unittest.main()
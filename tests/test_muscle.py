@@ -0,0 +1,162 @@
+import itertools
+import math
+import os
+import sys
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "mock"))
+
+import numpy as np
+import bge
+from bge import GameObject, Scene
+
+from mathutils import Vector
+
+from forces import ForceAccumulator
+from muscle import DampedSpringMuscle, DampedSpringReducedTorqueMuscle, HillMuscle, HillMuscleBank, MuscleBank, \
+    ReducedTorqueMuscleBank
+from state import SceneState
+
+
+def get_params(name_):
+    """Return the parameters dict of a muscle between the two objects of the test scene"""
+
+    return {"name": name_, "logger": "INFO", "obj_1": "obj_a", "obj_2": "obj_b", "anch_1": [0.0, 0.0, 0.0],
+            "anch_2": [0.0, 0.0, 0.0], "brain_sig": None}
+
+
+def get_spring_scene():
+    """Return a scene of four rotated and moving objects and the parameters of five damped spring muscles between
+    them: three controlled by the brain, one with a null control signal and one uncontrolled"""
+
+    objects = []
+    for i in range(4):
+        a = 0.3 * i
+        obj = GameObject("obj_" + str(i), (0.3 * i, 0.1 * i, 1.0 + 0.05 * i), 2.0 + i,
+                         ((math.cos(a), - math.sin(a), 0.0), (math.sin(a), math.cos(a), 0.0), (0.0, 0.0, 1.0)))
+        obj.worldLinearVelocity = Vector((0.1 * i, - 0.2, 0.05 * i))
+        obj.worldAngularVelocity = Vector((0.5, 0.1 * i, - 0.3))
+        objects.append(obj)
+    scene = Scene(objects)
+    bge.logic.scene = scene
+
+    params = []
+    for j, (a, b) in enumerate([(0, 1), (1, 2), (2, 3), (0, 2), (3, 1)]):
+        p = get_params("spring_" + str(j))
+        p.update({"obj_1": "obj_" + str(a), "obj_2": "obj_" + str(b), "anch_1": [0.01 * j, 0.02, - 0.01],
+                  "anch_2": [- 0.02, 0.01 * j, 0.03], "k": 100. + 10 * j, "c": 2. + j, "kc": 0.5,
+                  "kl0": [0.9, 1.1, 0.95, 1.05, 0.8][j], "kt": 0.1 * (j + 1), "brain_sig": j})
+        params.append(p)
+    params[3]["brain_sig"] = None
+    del params[4]["brain_sig"]
+
+    return scene, params
+
+
+class TestMuscleBank(unittest.TestCase):
+
+    muscle_class = DampedSpringMuscle
+    bank_class = MuscleBank
+
+    def test_forces(self):
+        """With deferred muscle actions, the bank gives the forces, accumulated object forces and torques and the
+        power of the muscle objects"""
+
+        scene, params = get_spring_scene()
+        ctrl_sig = [0.3, - 0.2, 0.5, 0.1]
+
+        state = SceneState(scene)
+        forces = ForceAccumulator(state, 60.)
+        muscles = [self.muscle_class(scene, dict(p), state) for p in params]
+        for m in muscles:
+            m.forces = forces
+        state.update()
+        for m, p in zip(muscles, params):
+            if "brain_sig" not in p:
+                m.update()
+            elif p["brain_sig"] is None:
+                m.update(ctrl_sig=0)
+            else:
+                m.update(ctrl_sig=ctrl_sig[p["brain_sig"]])
+
+        bank_state = SceneState(scene)
+        bank_forces = ForceAccumulator(bank_state, 60.)
+        bank = self.bank_class(scene, [dict(p) for p in params], None, bank_state)
+        bank.forces = bank_forces
+        bank_state.update()
+        bank.update(ctrl_sig)
+
+        np.testing.assert_allclose(bank.force, [list(m.force) for m in muscles], rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose([list(f) for f in bank_forces.forces], [list(f) for f in forces.forces],
+                                   rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose([list(t) for t in bank_forces.torques], [list(t) for t in forces.torques],
+                                   rtol=1e-12, atol=1e-12)
+        self.assertAlmostEqual(bank.get_power(), sum([m.get_power() for m in muscles]), 12)
+        self.assertEqual(bank_forces.touched, forces.touched)
+
+
+class TestReducedTorqueMuscleBank(TestMuscleBank):
+
+    muscle_class = DampedSpringReducedTorqueMuscle
+    bank_class = ReducedTorqueMuscleBank
+
+
+class TestHillMuscleBank(unittest.TestCase):
+
+    def setUp(self):
+
+        self.scene = Scene([GameObject("obj_a", (0.0, 0.0, 1.0)), GameObject("obj_b", (0.3, 0.0, 1.0))])
+        bge.logic.scene = self.scene
+        self.muscle = HillMuscle(self.scene, get_params("hill"))
+
+        # Inputs on both branches of the force-length curve, on the slack, non-linear and linear SEE parts and
+        # for concentric and eccentric contractions
+        cases = list(itertools.product([0.06, 0.08, 0.092, 0.1, 0.12], [0.17, 0.175, 0.18], [-0.2, 0., 0.2],
+                                       [0.05, 0.5, 1.]))
+        self.l_CE = np.array([c[0] for c in cases])
+        self.l_MTC = self.l_CE + np.array([c[1] for c in cases])
+        self.dot_l_MTC = np.array([c[2] for c in cases])
+        self.q = np.array([c[3] for c in cases])
+
+        # Parameters of the reference extensor of HillMuscle
+        params = []
+        for i in range(len(cases)):
+            p = get_params("hill_" + str(i))
+            p.update({"F_max": 1420., "l_CEopt": 0.092, "l_SEE0": 0.172})
+            params.append(p)
+        self.params = params
+
+    def check_bank(self, tables_, rtol_):
+
+        bank = HillMuscleBank(self.scene, self.params, tables_=tables_)
+        bank.l_CE = self.l_CE.copy()
+        f_bank, _ = bank.compute_forces(self.q, self.l_MTC, self.dot_l_MTC)
+        f_ref = np.array([self.muscle.update(l_CE=self.l_CE[i], l_MTC=self.l_MTC[i], dot_l_MTC=self.dot_l_MTC[i],
+                                             q=self.q[i]) for i in range(len(self.q))])
+
+        np.testing.assert_allclose(f_bank, f_ref, rtol=rtol_, atol=1e-9)
+
+    def test_forces(self):
+        """The bank gives the forces of HillMuscle on fixed inputs"""
+
+        self.check_bank(False, 1e-9)
+
+    def test_forces_tables(self):
+        """The lookup tables approximate the force curves"""
+
+        self.check_bank(True, 1e-3)
+
+    def test_long_contractile_element(self):
+        """Forces stay finite when the isometric force underflows, for an eccentric contraction"""
+
+        bank = HillMuscleBank(self.scene, self.params[:1])
+        bank.l_CE = np.array([60.])
+        f, dot_l_CE = bank.compute_forces(np.array([1.]), np.array([60.1]), np.array([5.]))
+        self.assertTrue(np.all(np.isfinite(f)))
+        self.assertTrue(np.all(np.isfinite(dot_l_CE)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+from payload import get_plain, read_payload, remove_payload, write_payload
+
+
+class RemoteDict:
+    """Stand-in for a dict received as an rpyc remote reference: it has items() but is not a dict and cannot be
+    pickled"""
+
+    def __init__(self, items_):
+
+        self.data = items_
+
+    def items(self):
+
+        return self.data.items()
+
+    def __reduce__(self):
+
+        raise TypeError("remote reference")
+
+
+class TestPayload(unittest.TestCase):
+
+    def test_plain_copy(self):
+        """Nested remote dicts and lists are copied into plain types"""
+
+        overrides = RemoteDict({"brain": RemoteDict({"T": 0.5, "sig": [1, 2]}), "muscle_bank": True})
+        plain = get_plain(overrides)
+        self.assertEqual(plain, {"brain": {"T": 0.5, "sig": [1, 2]}, "muscle_bank": True})
+        self.assertIs(type(plain["brain"]), dict)
+
+    def test_round_trip(self):
+        """The parameters read from a payload file are the ones written"""
+
+        params = {"config_name": "DogVertDefConfig", "config": get_plain(RemoteDict({"timeout": 5})),
+                  "genome": [0.25, 0.5], "logfile": "qSim.log", "filename": "default.qsm", "t_spawn": 1.5}
+        path = write_payload(params, tempfile.gettempdir())
+        try:
+            self.assertEqual(read_payload(path), params)
+        finally:
+            remove_payload(path)
+        self.assertFalse(os.path.isfile(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
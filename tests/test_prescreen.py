@@ -0,0 +1,34 @@
+import os
+import sys
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "mock"))
+
+from blendfile import CONSTRAINT_RB_HINGE, get_morphology
+from prescreen import PlanarModel
+
+MODEL = os.path.join(os.path.dirname(SRC), "mdl", "dog_vert.blend")
+
+
+class TestPlanarModel(unittest.TestCase):
+
+    def test_hinge_joints(self):
+        """The model is built on the hinge joints of the dog"""
+
+        model = PlanarModel(get_morphology(MODEL), ["obj_body"], 1)
+        self.assertGreater(len(model.ja), 0)
+
+    def test_other_joints(self):
+        """A joint that is not a hinge is rejected"""
+
+        morphology = get_morphology(MODEL)
+        joint = [j for b in morphology.values() for j in b["joints"] if j["type"] == CONSTRAINT_RB_HINGE][0]
+        joint["type"] = 1
+        with self.assertRaises(ValueError):
+            PlanarModel(morphology, ["obj_body"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+import numpy as np
+
+from replay import ControlTrace, diff_traces
+
+
+class TestControlTrace(unittest.TestCase):
+
+    def setUp(self):
+
+        self.dirname = tempfile.mkdtemp()
+        self.signals = np.random.RandomState(0).uniform(-1., 1., (3000, 4))
+
+    def tearDown(self):
+
+        shutil.rmtree(self.dirname)
+
+    def record(self, name_, signals_):
+
+        trace = ControlTrace(signals_.shape[1])
+        for row in signals_:
+            trace.write(row.tolist())
+        path = os.path.join(self.dirname, name_)
+        trace.save(path)
+
+        return path
+
+    def test_round_trip(self):
+        """A saved trace replays the recorded signals exactly, then holds the last ones"""
+
+        trace = ControlTrace.load(self.record("run.qct", self.signals))
+        replayed = np.array([trace.read() for i in range(len(self.signals) + 2)])
+        np.testing.assert_array_equal(replayed[:len(self.signals)], self.signals)
+        np.testing.assert_array_equal(replayed[-2:], self.signals[[-1, -1]])
+
+    def test_diff(self):
+        """diff_traces finds the first tick where two traces differ"""
+
+        other = self.signals.copy()
+        other[1234, 2] += 1e-9
+        path_1 = self.record("run_1.qct", self.signals)
+        path_2 = self.record("run_2.qct", other)
+        self.assertIsNone(diff_traces(path_1, path_1)["first_tick"])
+        diff = diff_traces(path_1, path_2)
+        self.assertEqual(diff["first_tick"], 1234)
+        self.assertIsNone(diff_traces(path_1, path_2, 1e-8)["first_tick"])
+
+    def test_bad_file(self):
+        """A file which is not a trace is rejected"""
+
+        path = os.path.join(self.dirname, "bad.qct")
+        f = open(path, 'wb')
+        f.write(b"\0" * 64)
+        f.close()
+        with self.assertRaises(ValueError):
+            ControlTrace.load(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, "mock"))
+
+import numpy as np
+
+from config import build_config
+from surrogate import GaussianProcess, Surrogate, get_config_key
+
+
+def get_fitness(genome_):
+    """Smooth test fitness with its maximum at the center of the genome space"""
+
+    return - float(np.sum((np.asarray(genome_) - 0.5) ** 2))
+
+
+class TestSurrogate(unittest.TestCase):
+
+    def setUp(self):
+
+        random = np.random.RandomState(0)
+        self.x = random.uniform(0., 1., (60, 3))
+        self.y = [get_fitness(g) for g in self.x]
+
+    def test_gaussian_process(self):
+        """The process follows the fitness near the training genomes and is less certain far from them"""
+
+        gp = GaussianProcess(1e-6)
+        gp.fit(self.x, self.y)
+        mean, std = gp.predict(self.x)
+        np.testing.assert_allclose(mean, self.y, atol=1e-3)
+        far_mean, far_std = gp.predict([[3., 3., 3.]])
+        self.assertGreater(far_std[0], 10 * np.max(std))
+
+    def test_screen(self):
+        """Every genome is simulated until enough samples are known. Then genomes far below the known fitnesses
+        are skipped and promising ones are simulated"""
+
+        sg = Surrogate(None, min_samples_=20)
+        self.assertEqual(sg.screen([0.5, 0.5, 0.5]), (True, None))
+        for g, f in zip(self.x, self.y):
+            sg.add(g, f)
+        self.assertTrue(sg.screen([0.5, 0.5, 0.5])[0])
+        simulate, fitness = sg.screen([0.02, 0.02, 0.98])
+        self.assertFalse(simulate)
+        self.assertLess(fitness, np.median(self.y))
+        self.assertEqual(sg.get_counts(), (60, 1))
+
+    def test_save_load(self):
+        """The stored samples are loaded by the next surrogate"""
+
+        dirname = tempfile.mkdtemp()
+        try:
+            path = os.path.join(dirname, "surrogate.pkl")
+            sg = Surrogate(path)
+            for g, f in zip(self.x, self.y):
+                sg.add(g, f)
+            sg.save()
+            loaded = Surrogate(path)
+            self.assertEqual(loaded.x, sg.x)
+            self.assertEqual(loaded.y, sg.y)
+            self.assertEqual(loaded.predict([0.3, 0.6, 0.9]), sg.predict([0.3, 0.6, 0.9]))
+        finally:
+            shutil.rmtree(dirname)
+
+    def test_config_key(self):
+        """Samples are keyed by the config parameters the fitness depends on, before the genome is applied"""
+
+        ref = get_config_key(build_config("DogVertDefConfig"), "dog_vert.blend")
+        self.assertEqual(get_config_key(build_config("DogVertDefConfig"), "dog_vert.blend"), ref)
+        self.assertNotEqual(get_config_key(build_config("DogVertDefConfig"), "dog.blend"), ref)
+        self.assertNotEqual(get_config_key(build_config("DogVertDefConfig", {"brain": {"tau": 0.02}}),
+                                           "dog_vert.blend"), ref)
+        self.assertNotEqual(get_config_key(build_config("DogVertDefConfig", {"genome_params": ["brain.tau"]}),
+                                           "dog_vert.blend"), ref)
+
+
+if __name__ == '__main__':
+    unittest.main()
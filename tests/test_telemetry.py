@@ -0,0 +1,73 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+import numpy as np
+
+from telemetry import Telemetry
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def run_ticks(self, telemetry_, n_ticks_):
+
+        for i in range(n_ticks_):
+            telemetry_.tick()
+            if telemetry_.on:
+                telemetry_.record("ctrl_sig", [i, - i])
+                if telemetry_.has_channel("muscle_force"):
+                    telemetry_.record("muscle_force", [2 * i])
+
+    def test_ring_buffer(self):
+        """The last samples of a decimated run are given in chronological order"""
+
+        telemetry = Telemetry(1, 16, 3)
+        telemetry.add_channel("ctrl_sig", 2)
+        self.assertFalse(telemetry.add_channel("muscle_force", 1, 2))
+        self.run_ticks(telemetry, 50)
+        ticks = np.arange(3, 50, 3)
+        np.testing.assert_array_equal(telemetry.unroll(telemetry.ticks), ticks)
+        np.testing.assert_array_equal(telemetry.get_channel("ctrl_sig"), np.array([ticks, - ticks]).T)
+
+    def test_short_run(self):
+        """A run shorter than the buffers gives only the recorded samples"""
+
+        telemetry = Telemetry(2, 100)
+        telemetry.add_channel("ctrl_sig", 2)
+        telemetry.add_channel("muscle_force", 1, 2)
+        self.run_ticks(telemetry, 10)
+        np.testing.assert_array_equal(telemetry.get_channel("muscle_force")[:, 0], 2 * np.arange(10))
+
+    def test_off(self):
+        """With level 0, no tick is sampled"""
+
+        telemetry = Telemetry(0)
+        self.assertFalse(telemetry.add_channel("ctrl_sig", 2))
+        self.run_ticks(telemetry, 10)
+        self.assertEqual(telemetry.n_records, 0)
+
+    def test_flush(self):
+        """The flushed file holds the samples, their ticks and the channel labels"""
+
+        telemetry = Telemetry(1, 8)
+        telemetry.add_channel("ctrl_sig", 2, 1, ["a", "b"])
+        self.run_ticks(telemetry, 20)
+        dirname = tempfile.mkdtemp()
+        try:
+            path = os.path.join(dirname, "sim_telemetry.npz")
+            telemetry.flush(path)
+            data = np.load(path)
+            np.testing.assert_array_equal(data["tick"], np.arange(12, 20))
+            np.testing.assert_array_equal(data["ctrl_sig"], telemetry.get_channel("ctrl_sig"))
+            self.assertEqual(data["ctrl_sig_labels"].tolist(), ["a", "b"])
+        finally:
+            shutil.rmtree(dirname)
+
+
+if __name__ == '__main__':
+    unittest.main()